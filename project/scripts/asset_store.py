@@ -0,0 +1,320 @@
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from PIL import Image
+import cache_gc
+from search_cache import cache_key
+
+# --- Global Asset Store ---
+# One copy of every image across all projects, named by the SHA-256 of its bytes:
+#
+#   <cache_dir>/assets/ab/abcdef....jpg
+#   <cache_dir>/assets/index.sqlite
+#       assets    sha256, phash, width, height, bytes, ext, source_url, added_at, last_used
+#       keywords  keyword -> sha256 (which asset a keyword resolved to)
+#
+# A 64-bit perceptual hash (DCT of a 32x32 grayscale copy) catches near-duplicates:
+# the same photo re-encoded or resized by another site is stored once (the larger
+# version wins). Project image folders hold hardlinks to the store (a copy if the
+# store is on another filesystem) under the usual <keyword>.jpg names, plus a
+# manifest.json with keyword -> sha256, dimensions and source URL.
+# Store files are read-only: a project image shares its bytes with the store and
+# every other project linked to it, so an edit has to replace the link (a new
+# file) instead of writing through it into everyone's copy.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+STORE_DIR = os.path.join(current_dir, config["paths"].get("cache_dir", "../cache"), "assets")
+PHASH_THRESHOLD = config.get("images", {}).get("phash_threshold", 6) # max differing bits of 64
+MANIFEST_NAME = "manifest.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    sha256 TEXT PRIMARY KEY,
+    phash INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    bytes INTEGER,
+    ext TEXT,
+    source_url TEXT,
+    added_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keywords (
+    keyword TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+"""
+
+_DCT_SIZE = 32
+# Orthonormal DCT-II basis, so the 2D DCT is two matrix products
+_k = np.arange(_DCT_SIZE)
+_DCT = np.cos(np.pi * (2 * _k[None, :] + 1) * _k[:, None] / (2 * _DCT_SIZE)) * np.sqrt(2.0 / _DCT_SIZE)
+_DCT[0] /= np.sqrt(2.0)
+_BIT_WEIGHTS = (1 << np.arange(63, -1, -1, dtype=np.uint64)).astype(np.uint64)
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def phash(img):
+    """64-bit DCT perceptual hash of a PIL image."""
+    img.draft("L", (_DCT_SIZE * 4, _DCT_SIZE * 4))
+    gray = np.asarray(img.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.BILINEAR), dtype=np.float64)
+    low = (_DCT @ gray @ _DCT.T)[:8, :8].flatten()
+    bits = low > np.median(low[1:]) # DC term excluded from the threshold
+    return int((bits.astype(np.uint64) * _BIT_WEIGHTS).sum())
+
+
+def hamming(a, hashes):
+    """Bit distance between hash a and an array of hashes."""
+    x = np.bitwise_xor(np.asarray(hashes, dtype=np.uint64), np.uint64(a))
+    return np.unpackbits(x.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def _to_signed(h):
+    # SQLite integers are signed 64-bit
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def _to_unsigned(h):
+    return h + (1 << 64) if h < 0 else h
+
+
+def link_or_copy(src, dest):
+    """Atomically places src at dest as a hardlink (or a copy across filesystems)."""
+    if os.path.exists(dest) and os.path.samefile(src, dest):
+        return # already linked (a rename onto the same file would leave the temporary name behind)
+    tmp = f"{dest}.{threading.get_ident()}.link"
+    if os.path.lexists(tmp):
+        os.remove(tmp) # never copy into a leftover link: it would write through to its target
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+
+
+def make_read_only(path):
+    os.chmod(path, 0o444)
+
+
+def same_file(path, stored_path):
+    """True if path is still the stored file: the same hardlink, or an unchanged copy of it."""
+    try:
+        a, b = os.stat(path), os.stat(stored_path)
+    except OSError:
+        return False
+    if (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino):
+        return True
+    return (a.st_size, a.st_mtime_ns) == (b.st_size, b.st_mtime_ns)
+
+
+class AssetStore:
+    def __init__(self, root=STORE_DIR, phash_threshold=PHASH_THRESHOLD):
+        self.root = root
+        self.phash_threshold = phash_threshold
+        if not os.path.exists(root):
+            os.makedirs(root)
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def path_for(self, sha, ext):
+        return os.path.join(self.root, sha[:2], f"{sha}{ext}")
+
+    def _entry(self, row):
+        sha, ph, w, h, size, ext, url = row
+        return {"sha256": sha, "phash": f"{_to_unsigned(ph):016x}", "width": w, "height": h,
+                "bytes": size, "source_url": url, "path": self.path_for(sha, ext)}
+
+    def get(self, sha):
+        with self._lock:
+            row = self._conn.execute("SELECT sha256, phash, width, height, bytes, ext, source_url FROM assets "
+                                     "WHERE sha256 = ?", (sha,)).fetchone()
+        return self._entry(row) if row else None
+
+    def find_similar(self, ph):
+        """Closest stored asset within the pHash threshold, or None."""
+        with self._lock:
+            rows = self._conn.execute("SELECT sha256, phash, width, height FROM assets").fetchall()
+        if not rows:
+            return None
+        dist = hamming(ph, [_to_unsigned(r[1]) for r in rows])
+        best = int(np.argmin(dist))
+        return (rows[best][0], int(dist[best]), rows[best][2] * rows[best][3]) if dist[best] <= self.phash_threshold else None
+
+    def add(self, path, source_url=None, keyword=None):
+        """
+        Stores the image at path (exact duplicates and near-duplicates are not stored twice)
+        and returns its entry. The entry may point to an existing, larger near-duplicate.
+        """
+        sha = sha256_file(path)
+        entry = self.get(sha)
+        if entry is None:
+            with Image.open(path) as img:
+                w, h = img.size
+                ph = phash(img)
+            similar = self.find_similar(ph)
+            if similar and similar[2] >= w * h:
+                print(f"Near-duplicate of stored asset {similar[0][:12]} (distance {similar[1]}), reusing it")
+                entry = self.get(similar[0])
+            else:
+                ext = os.path.splitext(path)[1].lower() or ".jpg"
+                dest = self.path_for(sha, ext)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                if not os.path.exists(dest):
+                    link_or_copy(path, dest)
+                make_read_only(dest)
+                now = time.time()
+                with self._lock:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO assets (sha256, phash, width, height, bytes, ext, source_url, added_at, last_used) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (sha, _to_signed(ph), w, h, os.path.getsize(dest), ext, source_url, now, now))
+                    if similar:
+                        # The new copy is larger: point keywords of the old one here
+                        self._conn.execute("UPDATE keywords SET sha256 = ? WHERE sha256 = ?", (sha, similar[0]))
+                    self._conn.commit()
+                entry = self.get(sha)
+        if keyword:
+            self.set_keyword(keyword, entry["sha256"])
+        return entry
+
+    def set_keyword(self, keyword, sha):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO keywords (keyword, sha256) VALUES (?, ?)", (cache_key(keyword), sha))
+            self._conn.commit()
+
+    def for_keyword(self, keyword):
+        """Entry a keyword resolved to in any project, or None (also if the file is gone)."""
+        with self._lock:
+            row = self._conn.execute("SELECT sha256 FROM keywords WHERE keyword = ?", (cache_key(keyword),)).fetchone()
+        entry = self.get(row[0]) if row else None
+        return entry if entry and os.path.exists(entry["path"]) else None
+
+    def entries(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT sha256, phash, width, height, bytes, ext, source_url, last_used FROM assets").fetchall()
+        return [dict(self._entry(r[:7]), last_used=r[7]) for r in rows]
+
+    def touch(self, sha):
+        entry = self.get(sha)
+        if entry and os.path.exists(entry["path"]):
+            cache_gc.touch(entry["path"])
+        with self._lock:
+            self._conn.execute("UPDATE assets SET last_used = ? WHERE sha256 = ?", (time.time(), sha))
+            self._conn.commit()
+
+    def link(self, entry, dest_path):
+        """Places the asset at dest_path (hardlink) and marks it used."""
+        make_read_only(entry["path"]) # stored before store files were read-only
+        link_or_copy(entry["path"], dest_path)
+        self.touch(entry["sha256"])
+        return dest_path
+
+    def remove(self, sha):
+        """Drops an asset from the index and deletes its file. Returns bytes freed."""
+        entry = self.get(sha)
+        if not entry:
+            return 0
+        with self._lock:
+            self._conn.execute("DELETE FROM assets WHERE sha256 = ?", (sha,))
+            self._conn.execute("DELETE FROM keywords WHERE sha256 = ?", (sha,))
+            self._conn.commit()
+        if os.path.exists(entry["path"]):
+            os.remove(entry["path"])
+            return entry["bytes"] or 0
+        return 0
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM assets").fetchone()
+            keywords = self._conn.execute("SELECT COUNT(*) FROM keywords").fetchone()[0]
+        return {"assets": count, "bytes": total, "keywords": keywords}
+
+
+def write_manifest(image_dir, entries):
+    """Writes <image_dir>/manifest.json: keyword -> {file, sha256, width, height, source_url}."""
+    manifest = {}
+    for keyword, (filename, entry) in sorted(entries.items()):
+        manifest[keyword] = {"file": filename, "sha256": entry["sha256"], "width": entry["width"],
+                             "height": entry["height"], "source_url": entry["source_url"]}
+    path = os.path.join(image_dir, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+    return path
+
+
+def load_manifest(image_dir):
+    path = os.path.join(image_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def import_dir(image_dir, store):
+    """Moves an existing project image folder into the store (files become hardlinks)."""
+    entries = {}
+    old = load_manifest(image_dir)
+    for name in sorted(os.listdir(image_dir)):
+        path = os.path.join(image_dir, name)
+        if name == MANIFEST_NAME or not os.path.isfile(path):
+            continue
+        keyword = os.path.splitext(name)[0].replace("_", " ")
+        for k, v in old.items():
+            if v.get("file") == name:
+                keyword = k
+        try:
+            entry = store.add(path, source_url=old.get(keyword, {}).get("source_url"), keyword=keyword)
+        except OSError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        store.link(entry, path)
+        entries[keyword] = (name, entry)
+    if entries:
+        write_manifest(image_dir, entries)
+    return entries
+
+
+if __name__ == "__main__":
+    with AssetStore() as store:
+        if len(sys.argv) > 2 and sys.argv[1] == "--import":
+            for d in sys.argv[2:]:
+                imported = import_dir(d, store)
+                print(f"{d}: {len(imported)} images linked to the store")
+        s = store.stats()
+        print(f"{STORE_DIR}")
+        print(f"Assets: {s['assets']} ({s['bytes'] / (1024 * 1024):.1f} MB), keywords: {s['keywords']}")
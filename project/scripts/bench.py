@@ -0,0 +1,279 @@
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+
+# --- Micro-benchmarks ---
+# One command for the hot paths of the pipeline:
+#   parse_script, normalize_text, apply_kinsoku, create_panel_image,
+#   get_image_clip, composited frames per second for one segment and
+#   fetch_news page extraction.
+# Synthetic scripts of 50 / 500 / 5000 lines are generated on the fly; news pages
+# come from the saved HTML in fixtures/news (no network access).
+# Results are saved as JSON so runs can be compared (--compare old.json).
+#
+# Usage: python3 bench.py [--sizes 50,500,5000] [--repeat 5] [--only parse,kinsoku]
+#                         [--output bench_results/xxx.json] [--compare previous.json]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(current_dir, "bench_results")
+NEWS_FIXTURES = os.path.join(current_dir, "fixtures", "news")
+
+CHARACTERS = ["青山龍星", "青山龍星", "青山龍星", "ずんだもん", "四国めたん", "春日部つむぎ", "ニュース"]
+KEYWORDS = ["国会議事堂 夕焼け", "高市早苗 首相 笑顔", "東京 夜景", "日本国旗 青空 はためく", "ロシア 核兵器 脅威"]
+PHRASES = [
+    "視聴者諸君、待たせたな。",
+    "「報道しない自由」を行使するテレビに騙されるな！",
+    "内閣支持率がいきなり59.9%。",
+    "GDPは12,500億円、APECの場で本日発表された。",
+    "『Nuclear Taboo {ニュークリア・タブー}』を守るためだ。",
+    "受賞の価値を貶（おとし）めようとした。",
+    "それって要するに、日本にとって得ってことなのだ？",
+    "高市総理と石破氏、そして習近平。",
+    "第2章に入る前に、2025 年の数字を確認しよう。",
+]
+
+GROUPS = ["parse", "normalize", "kinsoku", "panel", "image_clip", "composite", "news"]
+
+
+def make_script(n_lines, seed=0):
+    """Builds a synthetic script.md body with roughly n_lines lines."""
+    rng = random.Random(seed)
+    lines = ["```markdown"]
+    for i in range(n_lines):
+        if i % 100 == 99:
+            lines.append("[EYECATCH]")
+        elif i % 4 == 0:
+            lines.append(f"[IMG: {rng.choice(KEYWORDS)}]")
+        else:
+            text = "".join(rng.choice(PHRASES) for _ in range(rng.randint(1, 3)))
+            lines.append(f"{rng.choice(CHARACTERS)}, {text}")
+    lines.append("```")
+    return "\n".join(lines) + "\n"
+
+
+def measure(fn, repeat):
+    """Runs fn `repeat` times. Returns timing stats in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "mean_ms": round(statistics.mean(times), 3),
+        "repeat": repeat
+    }
+
+
+def bench_parse(tmp, sizes, repeat, results):
+    import script_compiler
+    for n in sizes:
+        path = os.path.join(tmp, f"script_{n}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_script(n))
+        results[f"parse_script/cold/{n}"] = measure(lambda: script_compiler.compile_script(path, use_cache=False), repeat)
+        script_compiler.compile_script(path) # prime cache
+        results[f"parse_script/cached/{n}"] = measure(lambda: script_compiler.compile_script(path), repeat)
+
+
+def dialogue(n):
+    import script_compiler
+    return [s for s in script_compiler.compile_text(make_script(n)) if s["type"] == "dialogue"]
+
+
+def bench_normalize(sizes, repeat, results):
+    import generate_audio
+    for n in sizes:
+        texts = [s["audio_text"] for s in dialogue(n)]
+        results[f"normalize_text/{n}"] = measure(lambda: [generate_audio.normalize_text(t) for t in texts], repeat)
+
+
+def bench_kinsoku(sizes, repeat, results):
+    from panels import apply_kinsoku
+    for n in sizes:
+        texts = [s["text"] for s in dialogue(n)]
+        results[f"apply_kinsoku/{n}"] = measure(lambda: [apply_kinsoku(t, 18) for t in texts], repeat)
+
+
+def bench_panel(repeat, results):
+    from panels import create_panel_image, CHARACTER_COLORS
+    segs = dialogue(50)[:10]
+    for name, seg in (("narrator", {"character": "青山龍星", "text": segs[0]["text"]}),
+                      ("guest", {"character": "ずんだもん", "text": segs[1]["text"]})):
+        color = CHARACTER_COLORS.get(seg["character"], CHARACTER_COLORS["default"])
+        results[f"create_panel_image/{name}"] = measure(
+            lambda: create_panel_image(seg["text"], seg["character"], color), repeat)
+
+
+def make_test_image(tmp, keyword):
+    from PIL import Image
+    import numpy as np
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 255, size=(720, 1280, 3), dtype=np.uint8)
+    path = os.path.join(tmp, keyword + ".jpg")
+    Image.fromarray(arr).save(path, quality=90)
+    return path
+
+
+def bench_image_clip(tmp, repeat, results):
+    from generate_video import get_image_clip
+    make_test_image(tmp, "bench_image")
+
+    def load_and_render():
+        clip = get_image_clip("bench_image", 3.0, custom_image_dir=tmp)
+        clip.get_frame(0)
+
+    results["get_image_clip/load+frame"] = measure(load_and_render, repeat)
+
+
+def bench_composite(tmp, repeat, results, n_frames=24):
+    from moviepy import ColorClip, ImageClip, CompositeVideoClip
+    from generate_video import get_image_clip, create_panel_image, SCREEN_SIZE
+    make_test_image(tmp, "bench_image")
+
+    duration = 5.0
+    bg = ColorClip(SCREEN_SIZE, color=(0, 0, 50), duration=duration)
+    context_img = get_image_clip("bench_image", duration, custom_image_dir=tmp)
+    overlay = ImageClip(create_panel_image(PHRASES[1], "青山龍星", "white")).with_duration(duration)
+    combined = CompositeVideoClip([bg, context_img, overlay])
+
+    step = duration / n_frames
+
+    def render():
+        for i in range(n_frames):
+            combined.get_frame(i * step)
+
+    stats = measure(render, repeat)
+    stats["fps"] = round(n_frames / (stats["median_ms"] / 1000.0), 2)
+    results["composite_segment/frames"] = stats
+
+
+def legacy_extract_page(html, url):
+    """Full html.parser tree + sequential searches (fetch_news before the targeted parser), for comparison."""
+    import re
+    from bs4 import BeautifulSoup
+    from urllib.parse import urljoin
+    soup = BeautifulSoup(html, 'html.parser')
+    title_tag = soup.find('h1')
+    title = title_tag.get_text(strip=True) if title_tag else None
+    article_body = (
+        soup.select_one('.article_body') or
+        soup.select_one('#uamods-article') or
+        soup.select_one('.sc-dJjYzT') or
+        soup.find('div', {'class': lambda x: x and ('articleBody' in x or 'highLightSearchTarget' in x)})
+    )
+    page_text = None
+    container = article_body or soup.select_one('main') or soup.find('div', {'id': 'main'})
+    if container:
+        page_text = "\n".join([p.get_text(strip=True) for p in container.find_all('p')])
+    next_btn = soup.select_one('li.pagination_item-next a') or soup.select_one('.pagination_item-next a')
+    if not next_btn:
+        next_btn = soup.find('a', attrs={'data-cl-params': re.compile(r'link:next')})
+    if not next_btn:
+        pagination_container = soup.select_one('.pagination') or soup.select_one('ul[class*="pagination"]') or soup.select_one('.article_pager')
+        if pagination_container:
+            for a in pagination_container.find_all('a'):
+                if "次へ" in a.get_text():
+                    next_btn = a
+                    break
+    if not next_btn:
+        for a in soup.find_all('a'):
+            text = a.get_text(strip=True)
+            if "次へ" in text or "次のページ" in text:
+                next_btn = a
+                break
+    next_link = urljoin(url, next_btn.get('href')) if next_btn and next_btn.get('href') else None
+    return title, page_text, next_link
+
+
+def bench_news(repeat, results):
+    import fetch_news
+    url = "https://news.yahoo.co.jp/articles/sample"
+    for path in sorted(glob.glob(os.path.join(NEWS_FIXTURES, "*.html"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "rb") as f:
+            html = f.read()
+        expected = legacy_extract_page(html, url)
+        if fetch_news.extract_page(html, url) != expected:
+            print(f"Warning: extract_page differs from the legacy extractor on {name}")
+        results[f"news_extract/legacy/{name}"] = measure(lambda: legacy_extract_page(html, url), repeat)
+        results[f"news_extract/{name}"] = measure(lambda: fetch_news.extract_page(html, url), repeat)
+
+
+def run(groups, sizes, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for group in groups:
+            print(f"Running {group}...")
+            if group == "parse": bench_parse(tmp, sizes, repeat, results)
+            elif group == "normalize": bench_normalize(sizes, repeat, results)
+            elif group == "kinsoku": bench_kinsoku(sizes, repeat, results)
+            elif group == "panel": bench_panel(repeat, results)
+            elif group == "image_clip": bench_image_clip(tmp, repeat, results)
+            elif group == "composite": bench_composite(tmp, max(1, repeat // 2), results)
+            elif group == "news": bench_news(repeat, results)
+    return results
+
+
+def print_results(results, baseline=None):
+    print()
+    print(f"{'benchmark':<36} {'median ms':>12} {'min ms':>10}" + (f" {'vs base':>9}" if baseline else ""))
+    for name, r in results.items():
+        line = f"{name:<36} {r['median_ms']:>12.3f} {r['min_ms']:>10.3f}"
+        if baseline and name in baseline:
+            base = baseline[name]["median_ms"]
+            line += f" {base / r['median_ms']:>8.2f}x" if r["median_ms"] > 0 else f" {'-':>9}"
+        if "fps" in r:
+            line += f"  ({r['fps']} fps)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for parsing, layout and compositing")
+    parser.add_argument("--sizes", default="50,500,5000", help="Synthetic script sizes (lines)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help=f"Comma separated subset of: {','.join(GROUPS)}")
+    parser.add_argument("--output", help="Result JSON path (default: bench_results/bench_<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous result JSON to compare against (speedup = old / new)")
+    args = parser.parse_args()
+
+    groups = [g.strip() for g in args.only.split(",")] if args.only else GROUPS
+    unknown = [g for g in groups if g not in GROUPS]
+    if unknown:
+        print(f"Unknown benchmark group(s): {unknown}")
+        sys.exit(1)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = run(groups, sizes, args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("bench_%Y%m%d_%H%M%S.json"))
+    out_dir = os.path.dirname(output)
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "results": results
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import fnmatch
+
+# --- Cache Garbage Collection ---
+# Generated artifacts are caches: they can always be rebuilt from the scripts.
+# Each cache has a policy in config["cache"]:
+#
+#   "tts_audio": {"max_mb": 2048, "max_age_days": 0}    (0 = no limit)
+#
+# `main.py gc` first drops entries older than max_age_days, then evicts the least
+# recently used entries until the cache fits in max_mb, and reports what it reclaimed.
+#
+# "Last used" is max(atime, mtime). Most render hosts mount with relatime/noatime,
+# so readers call touch() to record a use explicitly.
+# Files with more than one hardlink are in use elsewhere (project images link into
+# the asset store): deleting them frees nothing, so they are never evicted.
+#
+# Caches:
+#   tts_audio     VOICEVOX WAVs (projects/*/audio, assets/audio)
+#   images        global asset store (<cache_dir>/assets)
+#   outputs       rendered videos, traces, resource samples (projects/*/output); not the
+#                 *.tmp.* intermediates a streaming render keeps for its mux stage
+#   http          fetch_news page cache (<cache_dir>/http)
+#   transcripts   fetched YouTube transcripts (<cache_dir>/transcripts)
+#   overlays      drawn subtitle panels (<cache_dir>/overlays)
+#   fragments     low-resolution segment renders of `main.py watch` (<cache_dir>/fragments)
+#   search_cache  expired image search results (age only, see search_cache.py)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+POLICY = config.get("cache", {})
+CACHE_DIR = os.path.join(current_dir, config["paths"].get("cache_dir", "../cache"))
+AUDIO_DIR = os.path.abspath(os.path.join(current_dir, config["paths"]["audio_dir"]))
+MB = 1024 * 1024
+
+
+def touch(path):
+    """Records a cache hit on path (explicit atime update)."""
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+
+def file_entry(path, last_used=None):
+    st = os.stat(path)
+    used = max(st.st_atime, st.st_mtime, last_used or 0)
+    return {"path": path, "bytes": st.st_size, "last_used": used, "shared": st.st_nlink > 1}
+
+
+def scan(dirs, suffixes, exclude=()):
+    entries = []
+    for d in dirs:
+        if not os.path.isdir(d):
+            continue
+        for name in os.listdir(d):
+            path = os.path.join(d, name)
+            if name.endswith(suffixes) and not any(fnmatch.fnmatch(name, p) for p in exclude) and os.path.isfile(path):
+                try:
+                    entries.append(file_entry(path))
+                except OSError:
+                    pass
+    return entries
+
+
+def project_dirs(projects_root, sub):
+    if not os.path.isdir(projects_root):
+        return []
+    return [os.path.join(projects_root, p, sub) for p in sorted(os.listdir(projects_root))]
+
+
+def subdirs(root):
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, d) for d in sorted(os.listdir(root))]
+
+
+def remove_file(entry):
+    os.remove(entry["path"])
+
+
+def file_cache(name, dirs, suffixes, exclude=()):
+    return {"name": name, "entries": lambda: scan(dirs, suffixes, exclude), "remove": remove_file}
+
+
+def image_cache():
+    import asset_store
+    if not os.path.isdir(asset_store.STORE_DIR):
+        return {"name": "images", "entries": lambda: [], "remove": remove_file}
+    store = asset_store.AssetStore()
+
+    def entries():
+        out = []
+        for e in store.entries():
+            try:
+                entry = file_entry(e["path"], e["last_used"])
+            except OSError:
+                continue
+            entry["sha256"] = e["sha256"]
+            out.append(entry)
+        return out
+
+    return {"name": "images", "entries": entries, "remove": lambda e: store.remove(e["sha256"]), "close": store.close}
+
+
+def caches(projects_root):
+    """All known caches. Later caches (overlays, fragments, ...) register here."""
+    return [
+        file_cache("tts_audio", project_dirs(projects_root, "audio") + [AUDIO_DIR], (".wav",)),
+        image_cache(),
+        # Streaming renders record their intermediates as the render stage's outputs and
+        # remux() reads them again: evicting them would only leave a stale checkpoint
+        file_cache("outputs", project_dirs(projects_root, "output"), (".mp4", ".wav", ".json", ".png"),
+                   exclude=("*.tmp.*",)),
+        file_cache("http", subdirs(os.path.join(CACHE_DIR, "http")), (".http",)),
+        file_cache("transcripts", [os.path.join(CACHE_DIR, "transcripts")], (".json",)),
+        file_cache("overlays", subdirs(os.path.join(CACHE_DIR, "overlays")), (".png",)),
+        file_cache("fragments", [os.path.join(CACHE_DIR, "fragments")], (".mp4",)),
+    ]
+
+
+def collect(cache, policy, now=None, dry_run=False):
+    """Applies one cache's policy. Returns a report row."""
+    now = now or time.time()
+    entries = cache["entries"]()
+    max_bytes = policy.get("max_mb", 0) * MB
+    max_age = policy.get("max_age_days", 0) * 86400
+    total = sum(e["bytes"] for e in entries)
+    row = {"cache": cache["name"], "files": len(entries), "bytes": total, "evicted": 0, "reclaimed": 0,
+           "in_use": sum(e["bytes"] for e in entries if e["shared"]), "max_mb": policy.get("max_mb", 0)}
+
+    # Oldest first: age limit, then LRU down to the size cap
+    remaining = total
+    for e in sorted((e for e in entries if not e["shared"]), key=lambda e: e["last_used"]):
+        too_old = max_age and now - e["last_used"] > max_age
+        too_big = max_bytes and remaining > max_bytes
+        if not (too_old or too_big):
+            continue
+        if not dry_run:
+            try:
+                cache["remove"](e)
+            except OSError as err:
+                print(f"Warning: Could not remove {e['path']}: {err}")
+                continue
+        remaining -= e["bytes"]
+        row["evicted"] += 1
+        row["reclaimed"] += e["bytes"]
+    row["remaining"] = remaining
+    return row
+
+
+def run_gc(projects_root, dry_run=False):
+    """Runs every cache's policy and prints the reclaimed space. Returns the report rows."""
+    rows = []
+    for cache in caches(projects_root):
+        try:
+            rows.append(collect(cache, POLICY.get(cache["name"], {}), dry_run=dry_run))
+        finally:
+            if cache.get("close"):
+                cache["close"]()
+
+    import search_cache
+    if os.path.exists(search_cache.DB_PATH):
+        with search_cache.SearchCache() as sc:
+            expired = sc.stats()["queries"] - sc.stats()["fresh"]
+            if not dry_run:
+                sc.purge_expired()
+        print(f"Search cache: {expired} expired queries {'would be ' if dry_run else ''}removed")
+
+    print(f"\n{'cache':<12} {'files':>6} {'size MB':>9} {'cap MB':>8} {'in use MB':>10} {'evicted':>8} {'reclaimed MB':>13}")
+    for r in rows:
+        cap = r["max_mb"] or "-"
+        print(f"{r['cache']:<12} {r['files']:>6} {r['bytes'] / MB:>9.1f} {cap:>8} {r['in_use'] / MB:>10.1f} "
+              f"{r['evicted']:>8} {r['reclaimed'] / MB:>13.1f}")
+        if r["max_mb"] and r["remaining"] > r["max_mb"] * MB:
+            print(f"  {r['cache']} is still over its cap: the rest is linked from projects")
+    total = sum(r["reclaimed"] for r in rows)
+    print(f"{'Would reclaim' if dry_run else 'Reclaimed'} {total / MB:.1f} MB")
+    return rows
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    root = args[0] if args else os.path.join(os.path.dirname(os.path.dirname(current_dir)), "projects")
+    run_gc(root, dry_run="--dry-run" in sys.argv)
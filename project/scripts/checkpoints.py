@@ -0,0 +1,352 @@
+import os
+import json
+import time
+import hashlib
+import script_compiler
+
+# --- Stage Checkpoints ---
+# `main.py run` and `run-batch` are make-style: every project keeps
+# <project>/stages.json with, per stage, one hash of the stage's inputs and the
+# content hashes of the files it produced:
+#
+#   parse     script text, compiler version             -> script/<name>.segments.json
+#   images    narrator image keywords                    -> images/*
+#   tts       per segment: text, speaker, speed, dictionary -> audio/*.wav
+#   overlays  overlay cache keys                         -> <cache_dir>/overlays/*.png
+#   render    segments, images, WAVs, overlays, video settings, render profile,
+#             renditions, assets, renderer code          -> the videos (stream mode: videos + narration)
+#   mux       rendered videos + narration, BGM, volume   -> the videos (stream mode only)
+#
+# A stage is skipped when its inputs hash matches and its outputs are unchanged
+# on disk. A stage whose upstream is out of date is out of date too. TTS is also
+# incremental per segment: only changed lines go to VOICEVOX again.
+# File hashes are cached by (size, mtime), so checking a finished project does
+# not read file contents. `main.py status` shows every stage's state.
+# Renders with an explicit render profile (main.py --render-profile) have their
+# own video file and their own render/mux records ("render@draft"), so a draft
+# does not make the final render out of date. Without one, every rendition in
+# config["video"]["renditions"] is an output of the same render.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+MANIFEST_NAME = "stages.json"
+STAGES = ["parse", "images", "tts", "overlays", "render", "mux"]
+UPSTREAM = {
+    "parse": [],
+    "images": ["parse"],
+    "tts": ["parse"],
+    "overlays": ["parse"],
+    "render": ["images", "tts", "overlays"],
+    "mux": ["render"],
+}
+RENDER_CODE = [os.path.join(current_dir, name) for name in ("generate_video.py", "panels.py", "clip_pool.py")]
+TTS_CODE = [os.path.join(current_dir, name) for name in ("generate_audio.py", "pronunciation.py")]
+
+
+def resolve_path(path):
+    return os.path.abspath(os.path.join(current_dir, path))
+
+# The render's file inputs, as generate_video resolves them (without importing MoviePy for `status`)
+BG_VIDEO_DIR = resolve_path(config["paths"]["background_video_dir"])
+BGM_FILE = resolve_path(config["paths"]["bgm_path"])
+EYECATCH_FILE = resolve_path(config["paths"].get("eyecatch_path", "../assets/videos/eyecatch.mp4"))
+
+
+def render_profiles():
+    """Names of the render profiles generate_video.render_profile accepts."""
+    video = config["video"]
+    return sorted(set(video.get("profiles", {})) | {video.get("profile", "final")})
+
+
+def output_profile(profile):
+    """`profile`, or None for the default profile: that one writes the project's own video and records."""
+    return None if profile == config["video"].get("profile", "final") else profile
+
+
+def fingerprint(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class StageManifest:
+    """<project>/stages.json: stage records plus a (size, mtime) -> sha256 cache of files."""
+    def __init__(self, project_dir):
+        self.project_dir = project_dir
+        self.path = os.path.join(project_dir, MANIFEST_NAME)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+        self.data.setdefault("stages", {})
+        self.data.setdefault("files", {})
+
+    def rel(self, path):
+        path = os.path.abspath(path)
+        inside = path.startswith(os.path.abspath(self.project_dir) + os.sep)
+        return os.path.relpath(path, self.project_dir) if inside else path
+
+    def file_hash(self, path):
+        """sha256 of a file (None if missing); only re-read when size or mtime changed."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = self.rel(path)
+        cached = self.data["files"].get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        self.data["files"][key] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def hashes(self, paths):
+        """{relative path: sha256} of the paths that exist."""
+        out = {}
+        for path in paths:
+            sha = self.file_hash(path)
+            if sha:
+                out[self.rel(path)] = sha
+        return out
+
+    def get(self, stage):
+        return self.data["stages"].get(stage)
+
+    def record(self, stage, inputs, outputs, seconds=None, **extra):
+        self.data["stages"][stage] = dict(extra, inputs=inputs, outputs=self.hashes(outputs),
+                                          seconds=round(seconds, 2) if seconds is not None else None,
+                                          at=time.time())
+        self.save()
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+class ProjectStages:
+    """
+    Inputs, outputs and state of every stage of one project.
+    `project` is a dict from main.resolve_project (name, script, images, audio, output, video).
+    """
+    def __init__(self, project, stream=None, profile=None):
+        self.project = project
+        if stream is None:
+            stream = config["video"].get("render_mode", "batch") == "stream"
+        self.stream = stream
+        profile = output_profile(profile)
+        self.profile = profile or config["video"].get("profile", "final")
+        self.record_suffix = f"@{profile}" if profile else ""
+        # An explicit profile renders only itself
+        self.renditions = [] if profile else list(config["video"].get("renditions", []))
+        self.manifest = StageManifest(os.path.dirname(project["output"]))
+        self._segments = None
+
+    @property
+    def segments(self):
+        if self._segments is None:
+            self._segments = script_compiler.compile_script(self.project["script"])
+        return self._segments
+
+    # Inputs and outputs, computed from what is on disk now
+
+    def tts_keys(self):
+        """{segment index: hash of everything its WAV depends on}."""
+        audio = config["audio"]
+        speakers = audio["speakers"]
+        dictionary = [self.manifest.file_hash(resolve_path(config["paths"].get("pronunciation_dict", "")))
+                      if config["paths"].get("pronunciation_dict") else None,
+                      audio.get("pronunciation", {}), [self.manifest.file_hash(p) for p in TTS_CODE]]
+        common = fingerprint([audio.get("voicevox_url"), audio["global_speed_scale"], dictionary])
+        keys = {}
+        for i, seg in enumerate(self.segments):
+            if seg.get("type") == "eyecatch":
+                continue
+            speaker = speakers.get(seg["character"], speakers["default"])
+            keys[i] = fingerprint([seg.get("audio_text", seg["text"]), seg["character"], speaker, common])
+        return keys
+
+    def wav_path(self, i):
+        return os.path.join(self.project["audio"], f"{i:04d}_{self.segments[i]['character']}.wav")
+
+    def videos(self):
+        """The finished videos: the project video, plus <video>_<profile>.mp4 per further rendition."""
+        base = os.path.splitext(self.project["video"])[0]
+        return [self.project["video"]] + [f"{base}_{name}.mp4" for name in self.renditions[1:]]
+
+    def intermediates(self):
+        """What a streaming render keeps for a re-mux, named as generate_video.intermediate_paths names them."""
+        base = os.path.splitext(self.project["video"])[0]
+        return [os.path.splitext(v)[0] + ".video.tmp.mp4" for v in self.videos()] + [base + ".narration.tmp.wav"]
+
+    def inputs(self, stage):
+        """Hash of the stage's current inputs."""
+        m = self.manifest
+        if stage == "parse":
+            return fingerprint([m.file_hash(self.project["script"]), script_compiler.COMPILER_VERSION])
+        if stage == "images":
+            return fingerprint(script_compiler.image_keywords(self.segments))
+        if stage == "tts":
+            return fingerprint([config["audio"]["use_voicevox"], sorted(self.tts_keys().items())])
+        if stage == "overlays":
+            return fingerprint(sorted(self.outputs("overlays")))
+        if stage == "render":
+            bg_dir = BG_VIDEO_DIR
+            backgrounds = sorted(os.path.join(bg_dir, f) for f in os.listdir(bg_dir) if f.endswith(".mp4")) \
+                if os.path.isdir(bg_dir) else []
+            assets = [EYECATCH_FILE, resolve_path("../assets/backgrounds/default_news_bg.jpg")] + backgrounds
+            if not self.stream:
+                # The batch renderer mixes the BGM itself
+                assets.append(BGM_FILE)
+            return fingerprint([
+                self.stage_outputs("parse"), self.stage_outputs("images"), self.stage_outputs("tts"),
+                self.inputs("overlays"), config["video"], self.profile, self.renditions,
+                config["audio"]["bgm_volume"], self.stream,
+                m.hashes(assets), m.hashes(RENDER_CODE),
+            ])
+        if stage == "mux":
+            return fingerprint([self.stage_outputs("render"), m.file_hash(BGM_FILE),
+                                config["audio"]["bgm_volume"]])
+        raise ValueError(f"Unknown stage: {stage}")
+
+    def outputs(self, stage):
+        """Paths the stage produces."""
+        if stage == "parse":
+            return [script_compiler.cache_path_for(self.project["script"])]
+        if stage == "images":
+            d = self.project["images"]
+            return sorted(os.path.join(d, f) for f in os.listdir(d)) if os.path.isdir(d) else []
+        if stage == "tts":
+            if not config["audio"]["use_voicevox"]:
+                return []
+            return [self.wav_path(i) for i in sorted(self.tts_keys())]
+        if stage == "overlays":
+            import panels
+            return [panels.overlay_path(*args) for args in map(panels.segment_overlay_args, self.segments) if args]
+        if stage == "render":
+            return self.intermediates() if self.stream else self.videos()
+        if stage == "mux":
+            return self.videos() if self.stream else []
+        raise ValueError(f"Unknown stage: {stage}")
+
+    def stage_outputs(self, stage):
+        return self.manifest.hashes(self.outputs(stage))
+
+    # State
+
+    def record_name(self, stage):
+        """The manifest entry of a stage (render and mux are kept per explicit profile)."""
+        return stage + self.record_suffix if stage in ("render", "mux") else stage
+
+    def applies(self, stage):
+        return stage != "mux" or self.stream
+
+    def state(self, stage, _seen=None):
+        """"ok", "new" (never run), "stale" (inputs changed), "changed" (outputs changed), "upstream" or "-"."""
+        if not self.applies(stage):
+            return "-"
+        record = self.manifest.get(self.record_name(stage))
+        if not record:
+            return "new"
+        if any(self.state(up) not in ("ok", "-") for up in UPSTREAM[stage]):
+            return "upstream"
+        if record["inputs"] != self.inputs(stage):
+            return "stale"
+        if record["outputs"] != self.stage_outputs(stage):
+            return "changed"
+        return "ok"
+
+    def needed(self, stage, force=False):
+        """True if the stage has to run (prints why it is skipped otherwise)."""
+        if not self.applies(stage):
+            return False
+        if force:
+            return True
+        state = self.state(stage)
+        if state == "ok":
+            print(f"[{stage}] up to date, skipping.")
+            return False
+        return True
+
+    def record(self, stage, seconds=None, **extra):
+        self.manifest.record(self.record_name(stage), self.inputs(stage), self.outputs(stage), seconds, **extra)
+
+    # TTS
+
+    def tts_reuse(self):
+        """
+        {segment index: WAV path} of segments whose WAV is still valid.
+        WAVs are named by segment index, so after a line is inserted or removed
+        the WAVs of the lines that moved are copied to their new index instead
+        of being synthesized again.
+        """
+        record = self.manifest.get("tts") or {}
+        old_keys = record.get("keys", {})
+        old_outputs = record.get("outputs", {})
+        keys = self.tts_keys()
+        by_index = {os.path.basename(rel).split("_", 1)[0]: (rel, sha) for rel, sha in old_outputs.items()}
+        valid = {} # tts key -> recorded WAV still on disk unchanged
+        for idx, key in old_keys.items():
+            rel, sha = by_index.get(f"{int(idx):04d}", (None, None))
+            if rel:
+                path = os.path.join(self.manifest.project_dir, rel)
+                if self.manifest.file_hash(path) == sha:
+                    valid[key] = path
+        reuse = {}
+        moved = {}
+        for i, key in keys.items():
+            path = self.wav_path(i)
+            if old_keys.get(str(i)) == key and valid.get(key) == path:
+                reuse[i] = path
+            elif key in valid:
+                moved[i] = valid[key]
+        # Read every source first: a moved WAV may land where another one is read from
+        data = {}
+        for i, src in moved.items():
+            with open(src, 'rb') as f:
+                data[i] = f.read()
+        for i, content in data.items():
+            path = self.wav_path(i)
+            with open(path + ".tmp", 'wb') as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+            reuse[i] = path
+        if moved:
+            print(f"[tts] {len(moved)} unchanged lines moved to a new position, WAVs reused.")
+        return reuse
+
+    def tts_wavs(self):
+        """WAVs of the recorded TTS stage, for a render after TTS was skipped."""
+        return {i: self.wav_path(i) for i in self.tts_keys() if os.path.exists(self.wav_path(i))}
+
+    def record_tts(self, wav_paths, seconds=None):
+        """Records TTS only if every segment got its WAV (otherwise it is retried next time)."""
+        keys = self.tts_keys()
+        if config["audio"]["use_voicevox"] and set(wav_paths) != set(keys):
+            print(f"[tts] {len(keys) - len(wav_paths)} segments without audio, not checkpointed.")
+            return
+        self.record("tts", seconds, keys={str(i): k for i, k in keys.items()})
+
+    def status(self):
+        states = {stage: self.state(stage) for stage in STAGES}
+        if self.manifest.get("parse"):
+            self.manifest.save() # keep the file hashes computed on the way
+        return states
+
+
+def print_status(projects, stream=None, profile=None):
+    """Prints one row per project with every stage's state."""
+    print(f"{'project':<24} " + " ".join(f"{s:>9}" for s in STAGES))
+    for project in projects:
+        states = ProjectStages(project, stream, profile).status()
+        print(f"{project['name']:<24} " + " ".join(f"{states[s]:>9}" for s in STAGES))
+    print("\nok: up to date, new: never run, stale: inputs changed, changed: outputs changed or missing,\n"
+          "upstream: an earlier stage is out of date, -: not used in this render mode")
+
@@ -0,0 +1,123 @@
+import os
+import wave
+import numpy as np
+from collections import OrderedDict
+from moviepy import VideoFileClip, AudioFileClip
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from moviepy.audio.AudioClip import AudioArrayClip
+
+# --- Reader Pool ---
+# Every VideoFileClip / AudioFileClip keeps an ffmpeg subprocess and its pipe
+# buffers alive until closed. ReaderPool hands them out instead:
+#   - one reader per source file (background, eyecatch, BGM are reused, not re-opened)
+#   - at most `max_open` readers at a time; the least recently used idle one is closed
+#   - every reader is closed when the pool exits, on success or error
+#
+# Subclips read frames through their source reader, so a reader whose clips are
+# still in use is pinned (pin=True, one pin per caller) and never evicted until
+# release(). When every open reader is pinned, the pool opens one more rather
+# than closing a reader under a live clip (stats["over_cap"] counts those).
+#
+#   with ReaderPool(max_open=4) as pool:
+#       bg = pool.video(bg_path, pin=True)  # looped for the whole render
+#       ...
+#
+# TTS WAVs are small, so load_wav() decodes them into memory (no ffmpeg at all)
+# instead of keeping one reader per segment open until the final write.
+
+
+class ReaderPool:
+    def __init__(self, max_open=4):
+        self.max_open = max(1, max_open)
+        self._readers = OrderedDict() # (kind, path) -> clip, most recently used last
+        self._pins = {} # (kind, path) -> number of callers still using clips cut from it
+        self.stats = {"opened": 0, "reused": 0, "evicted": 0, "over_cap": 0, "peak_open": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close_all()
+        return False
+
+    def _get(self, kind, path, factory, pin=False):
+        key = (kind, os.path.abspath(path))
+        clip = self._readers.get(key)
+        if clip is not None:
+            self._readers.move_to_end(key)
+            self.stats["reused"] += 1
+        else:
+            self._evict_idle(self.max_open - 1)
+            if len(self._readers) >= self.max_open:
+                self.stats["over_cap"] += 1
+            clip = factory(path)
+            self._readers[key] = clip
+            self.stats["opened"] += 1
+            self.stats["peak_open"] = max(self.stats["peak_open"], len(self._readers))
+        if pin:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        return clip
+
+    def _evict_idle(self, keep):
+        """Closes least recently used unpinned readers until at most `keep` are open."""
+        for key in [k for k in self._readers if not self._pins.get(k)]:
+            if len(self._readers) <= keep:
+                break
+            self._readers.pop(key).close()
+            self.stats["evicted"] += 1
+
+    def release(self, clip):
+        """Drops one pin on `clip`'s reader; an idle reader stays open for reuse until evicted."""
+        for key, reader in self._readers.items():
+            if reader is clip and self._pins.get(key):
+                self._pins[key] -= 1
+                if not self._pins[key]:
+                    del self._pins[key]
+                break
+        self._evict_idle(self.max_open)
+
+    def video(self, path, scale=1.0, pin=False):
+        """A video reader; with `scale`, ffmpeg scales the frames while decoding (render profiles)."""
+        if scale == 1.0:
+            return self._get("video", path, VideoFileClip, pin)
+
+        def scaled(p):
+            width = ffmpeg_parse_infos(p)["video_size"][0]
+            return VideoFileClip(p, target_resolution=(max(2, round(width * scale)), None))
+        return self._get(f"video@{scale:g}", path, scaled, pin)
+
+    def audio(self, path, pin=False):
+        return self._get("audio", path, AudioFileClip, pin)
+
+    def open_count(self):
+        return len(self._readers)
+
+    def close_all(self):
+        self._pins.clear()
+        while self._readers:
+            _, clip = self._readers.popitem(last=False)
+            try:
+                clip.close()
+            except Exception as e:
+                print(f"Warning: Failed to close reader: {e}")
+
+
+def load_wav(path):
+    """
+    Decodes a 16-bit PCM WAV (VOICEVOX output) into an in-memory stereo AudioArrayClip.
+    Falls back to AudioFileClip for other formats (caller must close that one).
+    """
+    try:
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() != 2:
+                raise wave.Error("not 16-bit PCM")
+            rate = w.getframerate()
+            channels = w.getnchannels()
+            raw = w.readframes(w.getnframes())
+    except (wave.Error, EOFError):
+        return AudioFileClip(path)
+
+    samples = np.frombuffer(raw, dtype=np.int16).reshape(-1, channels).astype(np.float32) / 32768.0
+    if channels == 1:
+        samples = np.repeat(samples, 2, axis=1)
+    return AudioArrayClip(samples, fps=rate)
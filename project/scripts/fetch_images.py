@@ -1,22 +1,44 @@
 import os
 import re
 import sys
+import json
 import time
 import requests
-import hashlib
+import random
+import struct
+import threading
+import script_compiler
+import search_cache
+import image_quality
+import asset_store
+import tracing
+import http_client
 from urllib.parse import urlparse
-
-# Try importing duckduckgo_search
-try:
-    from duckduckgo_search import DDGS
-except ImportError:
-    print("Error: duckduckgo_search library not found.")
-    print("Please run: pip3 install duckduckgo-search")
-    sys.exit(1)
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 INPUT_SCRIPT = os.path.join(current_dir, "../../youtube_script_long.md")
 IMAGE_DIR = os.path.join(current_dir, "../assets/images")
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+# Search / Download Settings
+FETCH_CONF = config.get("images", {})
+SEARCH_MIN_INTERVAL = FETCH_CONF.get("search_min_interval", 2.0)
+SEARCH_MAX_INTERVAL = FETCH_CONF.get("search_max_interval", 60.0)
+SEARCH_START_INTERVAL = FETCH_CONF.get("search_start_interval", 5.0)
+DOWNLOAD_WORKERS = FETCH_CONF.get("download_workers", 6)
+PER_HOST_CONNECTIONS = FETCH_CONF.get("per_host_connections", 2)
+MAX_RESULTS = FETCH_CONF.get("max_results", 15)
+RACE_CANDIDATES = max(1, FETCH_CONF.get("race_candidates", 3))
+RACE_GRACE_SEC = FETCH_CONF.get("race_grace_sec", 3.0)
+MAX_DOWNLOAD_BYTES = int(FETCH_CONF.get("max_download_mb", 15) * 1024 * 1024)
+MIN_WIDTH, MIN_HEIGHT = 600, 360
+# JPEG dimensions sit after EXIF/ICC blocks, which can be large
+SNIFF_BYTES = 64 * 1024
+CHUNK_SIZE = 16 * 1024
 
 # Ban list for domains (Japanese media, rights holders)
 BAN_DOMAINS = [
@@ -42,195 +64,494 @@ def is_safe_url(url):
     except:
         return False
 
-def download_image(url, keyword, output_dir=IMAGE_DIR):
-    """Downloads an image and saves it with a hash name."""
+def image_filename(keyword):
+    """Safe Keyword -> file name used by fetch_images and generate_video."""
+    return re.sub(r'[\\/*?:"<>|]', "", keyword).replace(" ", "_") + ".jpg"
+
+class AdaptiveRateLimiter:
+    """
+    Spaces out calls to a rate-limited service (AIMD style).
+    Each failure multiplies the interval by `backoff` (up to max_interval),
+    each success shrinks it by `recovery` (down to min_interval).
+    """
+    def __init__(self, min_interval, max_interval, start_interval=None, backoff=2.0, recovery=0.8, jitter=0.2):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = start_interval if start_interval is not None else min_interval
+        self.backoff = backoff
+        self.recovery = recovery
+        self.jitter = jitter
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until the next call is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next_time - now)
+            # Random jitter so requests don't look machine-timed
+            spacing = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self._next_time = max(now, self._next_time) + spacing
+        if wait > 0:
+            time.sleep(wait)
+
+    def success(self):
+        with self._lock:
+            self.interval = max(self.min_interval, self.interval * self.recovery)
+
+    def failure(self):
+        with self._lock:
+            self.interval = min(self.max_interval, max(self.interval, self.min_interval) * self.backoff)
+            # Push the next call out by the new interval as well
+            self._next_time = max(self._next_time, time.monotonic() + self.interval)
+
+class HostLimiter:
+    """Caps concurrent connections per host."""
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._sems = {}
+        self._lock = threading.Lock()
+
+    def slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = self._sems[host] = threading.BoundedSemaphore(self.per_host)
+        return sem
+
+_search_limiters = {}
+_search_limiters_lock = threading.Lock()
+
+def search_limiter():
+    """
+    The search rate limiter shared by every fetch in this process, so projects
+    fetched concurrently (main.py run-batch) still space out their searches together.
+    """
+    key = (SEARCH_MIN_INTERVAL, SEARCH_MAX_INTERVAL, SEARCH_START_INTERVAL)
+    with _search_limiters_lock:
+        if key not in _search_limiters:
+            _search_limiters[key] = AdaptiveRateLimiter(*key)
+        return _search_limiters[key]
+
+def make_session():
+    """Shared pooled session for all downloads (keep-alive across keywords)."""
+    # Racing covers slow or failing hosts, so one retry is enough here
+    return http_client.make_session("images", pool_connections=DOWNLOAD_WORKERS * 2,
+                                    pool_maxsize=DOWNLOAD_WORKERS, retries=1)
+
+def make_ddgs_search():
+    """Returns search(query, size) backed by DuckDuckGo. The session is refreshed after an error."""
+    # Imported here: only live searches need it (cached keywords, search_stub and
+    # importing this module do not)
     try:
-        # Generate hash for filename
-        url_hash = hashlib.md5(url.encode()).hexdigest()
-        ext = os.path.splitext(url)[1]
-        if not ext or len(ext) > 5: ext = ".jpg"
-        
-        # Safe Keyword
-        safe_keyword = re.sub(r'[\\/*?:"<>|]', "", keyword).replace(" ", "_")
-        filename = f"{safe_keyword}.jpg" 
-        filepath = os.path.join(output_dir, filename)
-        
-        if os.path.exists(filepath):
-            print(f"Image already exists for {keyword}")
-            return filepath
-
-        print(f"Downloading {url} for {keyword}...")
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
-            
-        print(f"Saved to {filepath}")
-        return filepath
+        from duckduckgo_search import DDGS
+    except ImportError:
+        raise RuntimeError("duckduckgo_search library not found. Please run: pip3 install duckduckgo-search")
+    state = {"ddgs": DDGS()}
+
+    def search(query, size):
+        try:
+            return state["ddgs"].images(
+                query,
+                region="jp-jp", # Search in Japan context
+                safesearch="off",
+                size=size, # Prioritize higher quality
+                type_image="photo",
+                layout="Wide",
+                max_results=MAX_RESULTS
+            )
+        except Exception:
+            # SMART REFRESH: Re-init session on error
+            try:
+                state["ddgs"] = DDGS()
+            except Exception:
+                pass
+            raise
+
+    return search
+
+def search_keyword(keyword, search_fn, limiter, max_retries=4):
+    """Searches one keyword through the rate limiter. Returns a (possibly empty) result list."""
+    # Add negative keywords to avoid stock/vectors
+    # Removed -イラスト to increase hit rate, rely on -stock/-watermark
+    safe_query = f"{keyword} -stock -watermark -vector -drawing -logo -text -sign -PRIME -週刊 -透かし -サンプル -Sample"
+
+    for attempt in range(max_retries):
+        limiter.acquire()
+        try:
+            results = search_fn(safe_query, "Large")
+            limiter.success()
+            if results:
+                return results
+            break
+        except Exception as e:
+            limiter.failure()
+            print(f"Search failed for {keyword} (attempt {attempt+1}): {e} -> next search in {limiter.interval:.1f}s")
+
+    # Last ditch effort with fallback size
+    print(f"Warning: Could not get results for {keyword}. Trying fallback size...")
+    limiter.acquire()
+    try:
+        results = search_fn(keyword, "Medium")
+        limiter.success()
+        return results or []
+    except Exception as e:
+        limiter.failure()
+        print(f"Fallback search failed for {keyword}: {e}")
+        return []
+
+def sniff_image_size(head):
+    """
+    Reads (format, width, height) from the first bytes of a JPEG, PNG or WebP file.
+    Returns None if more bytes are needed, ("unknown", 0, 0) if it is not one of those formats.
+    """
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        if len(head) < 24: return None
+        w, h = struct.unpack(">II", head[16:24])
+        return ("png", w, h)
+
+    if head.startswith(b"\xff\xd8"):
+        # Walk the segment markers until a Start Of Frame
+        i = 2
+        while True:
+            while i < len(head) and head[i] == 0xFF and i + 1 < len(head) and head[i + 1] == 0xFF:
+                i += 1 # fill bytes
+            if i + 4 > len(head): return None
+            if head[i] != 0xFF: return ("unknown", 0, 0)
+            marker = head[i + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                i += 2 # markers without a length
+                continue
+            seg_len = struct.unpack(">H", head[i + 2:i + 4])[0]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                if i + 9 > len(head): return None
+                h, w = struct.unpack(">HH", head[i + 5:i + 9])
+                return ("jpeg", w, h)
+            i += 2 + seg_len
+
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        if len(head) < 30: return None
+        chunk = head[12:16]
+        if chunk == b"VP8 ":
+            w, h = struct.unpack("<HH", head[26:30])
+            return ("webp", w & 0x3FFF, h & 0x3FFF)
+        if chunk == b"VP8L":
+            b = head[21:25]
+            w = 1 + (((b[1] & 0x3F) << 8) | b[0])
+            h = 1 + (((b[3] & 0x0F) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6))
+            return ("webp", w, h)
+        if chunk == b"VP8X":
+            w = 1 + int.from_bytes(head[24:27], "little")
+            h = 1 + int.from_bytes(head[27:30], "little")
+            return ("webp", w, h)
+        return ("unknown", 0, 0)
+
+    if len(head) < 12: return None
+    return ("unknown", 0, 0)
+
+def download_image(url, keyword, output_dir=IMAGE_DIR, session=None, host_limits=None):
+    """Streams an image to <Safe Keyword>.jpg. Returns (path, None) or (None, reason)."""
+    filepath = os.path.join(output_dir, image_filename(keyword))
+    if os.path.exists(filepath):
+        print(f"Image already exists for {keyword}")
+        return filepath, None
+
+    print(f"Downloading {url} for {keyword}...")
+    return download_to(url, filepath, session=session, host_limits=host_limits)
+
+def download_to(url, dest_path, session=None, host_limits=None, cancel=None):
+    """
+    Streams url to dest_path. Returns (path, None) or (None, reason).
+    The size is read from the file header, so non-images and images smaller than
+    MIN_WIDTH x MIN_HEIGHT are dropped before the body is fetched. Responses larger
+    than MAX_DOWNLOAD_BYTES are aborted, and so is everything once `cancel` is set.
+    The file only appears once it is complete.
+    """
+    getter = session or requests
+    tmp_path = f"{dest_path}.{threading.get_ident()}.part"
+    try:
+        if host_limits:
+            with host_limits.slot(url):
+                reason = _stream_to_file(getter, url, tmp_path, cancel)
+        else:
+            reason = _stream_to_file(getter, url, tmp_path, cancel)
+        if reason:
+            return None, reason
+        os.replace(tmp_path, dest_path)
+        print(f"Saved to {dest_path}")
+        return dest_path, None
     except Exception as e:
         print(f"Failed to download {url}: {e}")
-        return None
+        return None, "download_failed"
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _stream_to_file(getter, url, tmp_path, cancel=None):
+    """Writes the response body to tmp_path. Returns a rejection reason or None."""
+    if cancel and cancel.is_set():
+        return "cancelled"
+    with getter.get(url, timeout=10, stream=True) as response:
+        response.raise_for_status()
 
-def fetch_images_for_script(script_path=None, image_dir=None):
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > MAX_DOWNLOAD_BYTES:
+            print(f"Image too large ({int(length) // 1024} KB), skipping: {url}")
+            return "too_large"
+
+        head = b""
+        info = None
+        received = 0
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if cancel and cancel.is_set():
+                    return "cancelled"
+                received += len(chunk)
+                if received > MAX_DOWNLOAD_BYTES:
+                    print(f"Image exceeds {MAX_DOWNLOAD_BYTES // 1024} KB, aborting: {url}")
+                    return "too_large"
+                f.write(chunk)
+
+                if info is None and len(head) < SNIFF_BYTES:
+                    head += chunk
+                    info = sniff_image_size(head)
+                    if info:
+                        fmt, w, h = info
+                        if fmt == "unknown":
+                            print(f"Not a JPEG/PNG/WebP image, skipping: {url}")
+                            return "not_image"
+                        if w < MIN_WIDTH or h < MIN_HEIGHT:
+                            print(f"Image too small ({w}x{h}), skipping: {url}")
+                            return "too_small"
+
+        if info is None and not check_image_size(tmp_path):
+            # Header did not fit in SNIFF_BYTES: fall back to PIL on the full file
+            return "too_small"
+    return None
+
+def check_image_size(path):
+    """Returns False if the image is too small for the context image."""
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            w, h = img.size
+        if w < MIN_WIDTH or h < MIN_HEIGHT:
+            print(f"Image too small ({w}x{h}): {path}")
+            return False
+    except Exception as e:
+        print(f"Error checking image size: {e}")
+    return True
+
+def race_candidates(keyword, candidates, filepath, session, host_limits, cache=None):
+    """
+    Downloads candidates concurrently and keeps the best scoring one as filepath.
+    Once the first download succeeds the others get RACE_GRACE_SEC to finish,
+    then they are cancelled. Returns (path, score, url) or (None, None, None).
+    """
+    cancel = threading.Event()
+    paths = [f"{filepath}.cand{rank}" for rank in range(len(candidates))]
+    done = []
+    with ThreadPoolExecutor(max_workers=len(candidates)) as racers:
+        futures = {racers.submit(download_to, res['image'], paths[rank], session, host_limits, cancel): rank
+                   for rank, res in enumerate(candidates)}
+        pending = set(futures)
+        deadline = None
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not finished:
+                cancel.set() # grace period over
+                deadline = None # block until the cancelled downloads return
+                continue
+            for future in finished:
+                rank = futures[future]
+                path, reason = future.result()
+                if path:
+                    done.append(rank)
+                    if deadline is None and not cancel.is_set():
+                        deadline = time.monotonic() + RACE_GRACE_SEC
+                elif reason != "cancelled" and cache:
+                    cache.reject(candidates[rank]['image'], reason)
+
+    best = None
+    for rank in done:
+        try:
+            score, details = image_quality.score_image(paths[rank])
+        except Exception as e:
+            print(f"Could not score {candidates[rank]['image']}: {e}")
+            continue
+        print(f"  candidate #{rank} {details['width']}x{details['height']} score {score:.3f}")
+        if best is None or score > best[1]:
+            best = (rank, score)
+
+    if best:
+        os.replace(paths[best[0]], filepath)
+        print(f"Picked candidate #{best[0]} for {keyword}: {candidates[best[0]]['image']}")
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    return (filepath, best[1], candidates[best[0]]['image']) if best else (None, None, None)
+
+def download_for_keyword(keyword, results, target_dir, session, host_limits, cache=None, store=None):
+    """
+    Races the top RACE_CANDIDATES allowed results (then the next batch, if none of
+    them was usable) and keeps the best scoring image. Returns the path or None.
+    Rejected candidates are recorded in the search cache so no run tries them again.
+    The winner goes into the asset store and the project file becomes a link to it.
+    """
+    filepath = os.path.join(target_dir, image_filename(keyword))
+    if os.path.exists(filepath):
+        print(f"Image already exists for {keyword}")
+        return filepath
+
+    allowed = []
+    for res in results:
+        image_url = res['image']
+        # Check domain
+        if not is_safe_url(image_url):
+            print(f"Skipping banned domain: {image_url}")
+            if cache: cache.reject(image_url, "banned_domain")
+            continue
+        allowed.append(res)
+
+    with tracing.span("image_download", keyword=keyword) as sp:
+        for start in range(0, len(allowed), RACE_CANDIDATES):
+            batch = allowed[start:start + RACE_CANDIDATES]
+            print(f"Downloading {len(batch)} candidates for {keyword}...")
+            path, score, url = race_candidates(keyword, batch, filepath, session, host_limits, cache)
+            if path:
+                sp.set(tried=start + len(batch), score=round(score, 3))
+                if store:
+                    store.link(store.add(path, source_url=url, keyword=keyword), path)
+                return path
+    return None
+
+def update_manifest(target_dir, keywords, store):
+    """Links every project image to the store and rewrites <target_dir>/manifest.json."""
+    manifest = asset_store.load_manifest(target_dir)
+    entries = {}
+    for keyword in keywords:
+        filename = image_filename(keyword)
+        path = os.path.join(target_dir, filename)
+        if not os.path.exists(path):
+            continue
+        known = manifest.get(keyword)
+        stored = known and known.get("file") == filename and store.get(known["sha256"])
+        if stored and asset_store.same_file(path, stored["path"]):
+            entries[keyword] = (filename, known)
+            continue
+        # Image from before the store (or replaced by hand): adopt it
+        try:
+            entry = store.add(path, keyword=keyword)
+            store.link(entry, path)
+            entries[keyword] = (filename, entry)
+        except OSError as e:
+            print(f"Warning: Could not add {path} to the asset store: {e}")
+    if entries:
+        asset_store.write_manifest(target_dir, entries)
+
+def fetch_images_for_script(script_path=None, image_dir=None, search_fn=None, cache_path=None, store_dir=None):
+    """
+    Fetches one image per narrator [IMG] keyword.
+    Keywords another project already resolved are linked from the global asset
+    store without any network access. Keywords with usable candidates in the search cache skip the search. Other
+    searches run one at a time through an adaptive rate limiter; downloads run
+    concurrently (pooled session, per-host connection cap) while the next
+    keyword is being searched. `search_fn(query, size)` defaults to DuckDuckGo.
+    Returns the keywords that still have no image (empty when all are there).
+    """
     target_script = script_path if script_path else INPUT_SCRIPT
     target_dir = image_dir if image_dir else IMAGE_DIR
 
     if not os.path.exists(target_dir):
         os.makedirs(target_dir)
 
-    with open(target_script, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Parse script to find [IMG] tags assigned ONLY to Aoyama Ryusei
-    matches = []
-    
-    lines = content.split('\n')
-    pending_keywords = []
-
-    for line in lines:
-        line = line.strip()
-        if not line: continue
-        
-        # 1. Check for IMG tag
-        img_match = re.match(r'\[IMG:\s*(.*?)\]', line)
-        if img_match:
-            keyword = img_match.group(1).strip()
-            if keyword:
-                pending_keywords.append(keyword)
-            continue
-            
-        # 2. Check for Character Line
-        if ',' in line and not line.startswith('['):
-            try:
-                parts = line.split(',', 1)
-                char_name = parts[0].strip()
-                
-                # Normalize name (simple check)
-                if "青山" in char_name:
-                    # If it's Aoyama, authorize the pending images
-                    matches.extend(pending_keywords)
-                else:
-                    # If it's anyone else, discard the images (Waste prevention)
-                    if pending_keywords:
-                        print(f"Skipping unused images for {char_name}: {pending_keywords}")
-                
-                # Reset pending
-                pending_keywords = []
-            except:
-                pass
+    # Parse script (shared compiled segments, same rules as generate_video).
+    # Only images actually shown for Aoyama Ryusei are fetched (Waste prevention).
+    segments = script_compiler.compile_script(target_script)
+    matches = script_compiler.image_keywords(segments)
+
+    unused = set(s["image_keyword"] for s in segments if s["type"] == "dialogue" and s["image_keyword"]) - set(matches)
+    if unused:
+        print(f"Skipping unused images (not shown for Aoyama): {sorted(unused)}")
 
-    # Unique list while preserving order
-    matches = list(dict.fromkeys(matches))
     print(f"Found {len(matches)} image requests (Aoyama only).")
-    
-    # Session Management
-    ddgs = DDGS()
 
-    try:
-        for keyword in matches:
-            keyword = keyword.strip()
-            if not keyword: continue
-            
-            # Check if image already exists to skip search
-            safe_key_chk = re.sub(r'[\\/*?:"<>|]', "", keyword).replace(" ", "_") + ".jpg"
-            chk_path = os.path.join(target_dir, safe_key_chk)
-            if os.path.exists(chk_path):
+    store = asset_store.AssetStore(store_dir or asset_store.STORE_DIR)
+    keywords = [k.strip() for k in matches if k.strip()]
+
+    # Check if image already exists (in the project or the store) to skip search
+    pending = []
+    for keyword in keywords:
+        with tracing.span("image_fetch", keyword=keyword) as sp:
+            filepath = os.path.join(target_dir, image_filename(keyword))
+            entry = None if os.path.exists(filepath) else store.for_keyword(keyword)
+            if os.path.exists(filepath):
                 print(f"Image already exists for {keyword}, skipping search.")
-                continue
+                sp.set(cache="hit")
+            elif entry:
+                print(f"Linking stored image for {keyword} ({entry['sha256'][:12]})")
+                store.link(entry, filepath)
+                sp.set(cache="hit", source="store")
+            else:
+                sp.set(cache="miss")
+                pending.append(keyword)
 
-            print(f"Searching for: {keyword}")
-            
-            found_image = False
-            # Exponential Backoff Retry Loop
-            max_retries = 4
-            results = []
-            
-            for attempt in range(max_retries):
-                try:
-                    # Add negative keywords to avoid stock/vectors
-                    # Removed -イラスト to increase hit rate, rely on -stock/-watermark
-                    safe_query = f"{keyword} -stock -watermark -vector -drawing -logo -text -sign -PRIME -週刊 -透かし -サンプル -Sample"
-                    
-                    results = ddgs.images(
-                        safe_query,
-                        region="jp-jp", # Search in Japan context
-                        safesearch="off",
-                        size="Large", # Prioritize higher quality
-                        type_image="photo",
-                        layout="Wide",
-                        max_results=15
-                    )
-                    break # Success
-                except Exception as e:
-                    print(f"Search failed (attempt {attempt+1}): {e}")
-                    
-                    # SMART REFRESH: Re-init session on error
-                    print("Refreshing DDGS session due to error...")
-                    try:
-                        ddgs = DDGS()
-                    except:
-                        pass
-                        
-                    # Exponential Backoff: 5 * (2^attempt)
-                    wait_time = 5 * (2 ** attempt)
-                    print(f"Waiting {wait_time}s...")
-                    time.sleep(wait_time)
-            
-            if not results:
-                # Last ditch effort with fallback size, using fresh session
-                print(f"Warning: Could not get results for {keyword} after retries. Refreshing session and trying fallback size...")
-                ddgs = DDGS()
-                try:
-                    results = ddgs.images(
-                        keyword, region="jp-jp", safesearch="off", size="Medium", 
-                        type_image="photo", layout="Wide", max_results=15
-                    )
-                except:
-                    pass
-
-            if not results:
-                print(f"Warning: Really could not find suitable image for {keyword}")
-                continue
-            
-            for res in results:
-                image_url = res['image']
-                
-                # Check domain
-                if not is_safe_url(image_url):
-                    print(f"Skipping banned domain: {image_url}")
+    if not pending:
+        update_manifest(target_dir, keywords, store)
+        store.close()
+        return []
+
+    search = search_fn
+    cache = search_cache.SearchCache(cache_path or search_cache.DB_PATH)
+    limiter = search_limiter()
+    host_limits = HostLimiter(PER_HOST_CONNECTIONS)
+    session = make_session()
+    missing = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+            futures = {}
+            for keyword in pending:
+                with tracing.span("image_search", keyword=keyword) as sp:
+                    results = cache.lookup(keyword)
+                    if results:
+                        print(f"Using cached search results for: {keyword}")
+                        sp.set(cache="hit")
+                    else:
+                        print(f"Searching for: {keyword}")
+                        sp.set(cache="miss")
+                        if search is None:
+                            search = make_ddgs_search()
+                        fresh = search_keyword(keyword, search, limiter)
+                        if fresh:
+                            cache.store(keyword, fresh)
+                            # Drop candidates rejected by earlier runs
+                            results = cache.lookup(keyword)
+                if not results:
+                    print(f"Warning: Really could not find suitable image for {keyword}")
+                    missing.append(keyword)
                     continue
-                
-                # Try downloading
-                # Pass target_dir
-                path = download_image(image_url, keyword, output_dir=target_dir)
-                if path:
-                    # Check Resolution
-                    try:
-                        from PIL import Image
-                        with Image.open(path) as img:
-                            w, h = img.size
-                            if w < 600 or h < 360:
-                                print(f"Image too small ({w}x{h}), deleting: {path}")
-                                os.remove(path)
-                                continue # Try next result
-                    except Exception as e:
-                       print(f"Error checking image size: {e}")
-                       
-                    found_image = True
-                    break # Stop after 1 successful image per keyword
-            
-            if not found_image:
-                print(f"Warning: Could not find suitable image for {keyword}")
-
-            # Random jitter wait to look human (10-20s)
-            import random
-            sleep_time = random.uniform(10, 20)
-            print(f"Waiting {sleep_time:.1f}s to respect rate limits...")
-            time.sleep(sleep_time)
-            
+                futures[pool.submit(download_for_keyword, keyword, results, target_dir, session, host_limits, cache, store)] = keyword
+
+            for future in as_completed(futures):
+                if not future.result():
+                    missing.append(futures[future])
     except Exception as e:
         print(f"Critical Error in fetch loop: {e}")
+    finally:
+        session.close()
+        cache.close()
+        update_manifest(target_dir, keywords, store)
+        store.close()
+
+    # Checked on disk: a failure in the fetch loop can leave keywords unaccounted for
+    missing = [k for k in keywords if not os.path.exists(os.path.join(target_dir, image_filename(k)))]
+    for keyword in missing:
+        print(f"Warning: Could not find suitable image for {keyword}")
+    print(f"Images fetched: {len(pending) - len(missing)}/{len(pending)}")
+    return missing
 
 if __name__ == "__main__":
     if len(sys.argv) > 1:
@@ -1,121 +1,257 @@
-import requests
-from bs4 import BeautifulSoup
+import os
+import re
 import sys
+import json
 import time
-import re
-from urllib.parse import urljoin
+import threading
+import http_client
+import lxml.html
+import soupsieve as sv
+from lxml import etree
+from bs4 import BeautifulSoup, SoupStrainer
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+# Crawl Settings
+NEWS_CONF = config.get("news", {})
+CRAWL_WORKERS = NEWS_CONF.get("workers", 8)
+PER_HOST_CONNECTIONS = NEWS_CONF.get("per_host_connections", 2)
+PER_HOST_INTERVAL = NEWS_CONF.get("per_host_interval", 0.5) # seconds between requests to one host
+MAX_PAGES = NEWS_CONF.get("max_pages", 20)
+
+# Headers to mimic a browser to avoid some basic bot detection
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"
+}
+
+
+class HostPoliteness:
+    """At most `per_host` requests in flight and `interval` seconds between request starts, per host."""
+    def __init__(self, per_host=PER_HOST_CONNECTIONS, interval=PER_HOST_INTERVAL):
+        self.per_host = per_host
+        self.interval = interval
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = {"sem": threading.BoundedSemaphore(self.per_host),
+                                             "lock": threading.Lock(), "next": 0.0}
+        return state
+
+    def request(self, url, send):
+        state = self._host(url)
+        with state["sem"]:
+            with state["lock"]:
+                wait = state["next"] - time.monotonic()
+                state["next"] = max(time.monotonic(), state["next"]) + self.interval
+            if wait > 0:
+                time.sleep(wait)
+            return send()
+
+
+class Crawler:
+    """Fetches many articles at once over one pooled session, through the HTTP cache."""
+    def __init__(self, workers=CRAWL_WORKERS, cache=None, politeness=None):
+        self.workers = workers
+        self.cache = cache or http_client.HttpCache()
+        self.politeness = politeness or HostPoliteness()
+        self.session = http_client.make_session("news", pool_maxsize=workers, headers=HEADERS)
+        self.stats = {"requests": 0, "fresh": 0, "not_modified": 0, "downloaded": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def get(self, url):
+        """Returns the page body (bytes), from the cache when it is still valid."""
+        def send(url, headers):
+            self._count("requests")
+            return self.politeness.request(url, lambda: self.session.get(url, headers=headers, timeout=10))
+
+        body, source = http_client.cached_get(url, self.cache, send=send)
+        self._count(source)
+        return body
+
+    def fetch_article(self, url):
+        """Follows an article's pagination. Returns {"url", "title", "text", "pages"}."""
+        aggregated_text = ""
+        title = None
+        current_url = url
+        seen = set()
+        page_count = 0
+
+        while current_url and current_url not in seen and page_count < MAX_PAGES:
+            seen.add(current_url)
+            page_count += 1
+            try:
+                page_title, page_text, next_link = extract_page(self.get(current_url), current_url)
+            except Exception as e:
+                print(f"Error fetching {current_url}: {e}")
+                break
+            if page_count == 1 and page_title:
+                title = page_title
+            if page_text is None:
+                print(f"Warning: Could not isolate article body on page {page_count} of {url}.")
+            else:
+                aggregated_text += page_text + "\n\n"
+            current_url = next_link
+
+        return {"url": url, "title": title, "text": aggregated_text, "pages": page_count}
+
+    def crawl(self, urls):
+        """Fetches every article concurrently (politeness is enforced per host). Results keep the input order."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(self.fetch_article, urls))
+
+
+# --- Extraction ---
+# Pages are parsed with lxml, and only the regions extraction can use become
+# Tags (title, article body candidates, main column, pager, "next" links);
+# headers, sidebars, scripts etc. are skipped while parsing. Selectors are
+# compiled once and tried in priority order, stopping at the first match.
+# The last resort (any link reading 次へ) is one XPath query on a bare lxml tree.
+
+# Article body, most specific first (the last one is the main-column fallback)
+BODY_SELECTORS = [sv.compile(css) for css in (
+    '.article_body',
+    '#uamods-article',
+    '.sc-dJjYzT', # Dynamic class fallback (often changes)
+    'div[class*="articleBody"], div[class*="highLightSearchTarget"]',
+)]
+MAIN_SELECTORS = [sv.compile('main'), sv.compile('div#main')]
+# Next page link (次へ), most specific first
+NEXT_SELECTORS = [
+    sv.compile('li.pagination_item-next a, .pagination_item-next a'), # Yahoo often uses specific classes
+    sv.compile('a[data-cl-params*="link:next"]'), # Robust against dynamic classes
+]
+PAGER_SELECTORS = [sv.compile('.pagination'), sv.compile('ul[class*="pagination"]'), sv.compile('.article_pager')]
+NEXT_TEXT_XPATH = etree.XPath('(//a[contains(., "次へ") or contains(., "次のページ")])[1]')
+
+BODY_CLASSES = ("article_body", "sc-dJjYzT")
+BODY_CLASS_PARTS = ("articleBody", "highLightSearchTarget", "pagination", "article_pager")
+
+
+class ArticleRegions(SoupStrainer):
+    """Keeps only the tags extract_page can use (and everything inside them)."""
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        if name in ("h1", "main"):
+            return True
+        if not attrs:
+            return False
+        if attrs.get("id") in ("main", "uamods-article"):
+            return True
+        if name == "a":
+            return "link:next" in (attrs.get("data-cl-params") or "")
+        classes = attrs.get("class") or ""
+        if isinstance(classes, list):
+            classes = " ".join(classes)
+        return (any(c in classes.split() for c in BODY_CLASSES)
+                or any(part in classes for part in BODY_CLASS_PARTS))
+
+    def allow_string_creation(self, string):
+        return False
+
+
+ARTICLE_REGIONS = ArticleRegions()
+
+
+def first_match(selectors, soup):
+    for selector in selectors:
+        tag = selector.select_one(soup)
+        if tag is not None:
+            return tag
+    return None
+
+
+def paragraphs_text(container):
+    return "\n".join([p.get_text(strip=True) for p in container.find_all('p')])
+
+
+def extract_page(html, url):
+    """Parses one article page. Returns (title, body_text or None, absolute next page URL or None)."""
+    soup = BeautifulSoup(html, 'lxml', parse_only=ARTICLE_REGIONS)
+
+    # Extract Title (only from first page usually, but safe to grab)
+    title_tag = soup.find('h1')
+    title = title_tag.get_text(strip=True) if title_tag else None
+
+    # Extract Body Text (fallback: <p> in the main column, risky but better than nothing)
+    container = first_match(BODY_SELECTORS, soup) or first_match(MAIN_SELECTORS, soup)
+    page_text = paragraphs_text(container) if container else None
+
+    # Check for "Next Page" (次へ): class/attribute selectors, then link text
+    # inside the pager, then link text anywhere
+    next_btn = first_match(NEXT_SELECTORS, soup)
+    if not next_btn:
+        pager = first_match(PAGER_SELECTORS, soup)
+        if pager:
+            next_btn = next((a for a in pager.find_all('a') if "次へ" in a.get_text()), None)
+    href = next_btn.get('href') if next_btn else None
+    if not next_btn:
+        links = NEXT_TEXT_XPATH(lxml.html.fromstring(html))
+        href = links[0].get('href') if links else None
+
+    # Resolve relative URL
+    next_link = urljoin(url, href) if href else None
+    return title, page_text, next_link
+
 
 def fetch_yahoojp_article(url):
     """
     Fetches the main body text from a Yahoo News article, handling pagination.
     """
-    
-    # Headers to mimic a browser to avoid some basic bot detection
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"
-    }
-
-    aggregated_text = ""
-    current_url = url
-    page_count = 1
-    
-    print(f"Fetching: {current_url}")
-
-    while current_url:
-        try:
-            response = requests.get(current_url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract Title (only from first page usually, but safe to grab)
-            if page_count == 1:
-                title_tag = soup.find('h1')
-                if title_tag:
-                    print(f"Title: {title_tag.get_text(strip=True)}")
-                    print("-" * 40)
-
-            # Extract Body Text
-            # Yahoo News body is often in a specific container.
-            # Strategy: Yahoo JP News structure often uses specific class names or simply <p> tags inside a main wrapper.
-            # Common selectors for Yahoo News Japan article body
-            article_body = (
-                soup.select_one('.article_body') or 
-                soup.select_one('#uamods-article') or 
-                soup.select_one('.sc-dJjYzT') or # Dynamic class fallback (often changes)
-                soup.find('div', {'class': lambda x: x and ('articleBody' in x or 'highLightSearchTarget' in x)})
-            )
-
-            if article_body:
-                # Get all paragraphs
-                paragraphs = article_body.find_all('p')
-                page_text = "\n".join([p.get_text(strip=True) for p in paragraphs])
-                aggregated_text += page_text + "\n\n"
-            else:
-                # Fallback: simple p extraction if main body not found (risky but better than nothing)
-                # But constrained to a likely container if possible
-                main_col = soup.select_one('main') or soup.find('div', {'id': 'main'})
-                if main_col:
-                     paragraphs = main_col.find_all('p')
-                     page_text = "\n".join([p.get_text(strip=True) for p in paragraphs])
-                     aggregated_text += page_text + "\n\n"
-                else:
-                    print(f"Warning: Could not isolate article body on page {page_count}.")
-            
-            # Check for "Next Page" (次へ)
-            next_link = None
-            
-            # 1. Specific class search (Yahoo often uses specific classes)
-            next_btn = soup.select_one('li.pagination_item-next a') or soup.select_one('.pagination_item-next a')
-            
-            # 2. Yahoo specific attribute search (Robust against dynamic classes)
-            if not next_btn:
-                next_btn = soup.find('a', attrs={'data-cl-params': re.compile(r'link:next')})
-
-            # 3. Text search within likely containers
-            if not next_btn:
-                pagination_container = soup.select_one('.pagination') or soup.select_one('ul[class*="pagination"]') or soup.select_one('.article_pager')
-                if pagination_container:
-                     for a in pagination_container.find_all('a'):
-                        if "次へ" in a.get_text():
-                            next_btn = a
-                            break
-
-            # 4. Global text search (Fallback)
-            if not next_btn:
-                 # Search all links for text "次へ" or "次ページ"
-                 for a in soup.find_all('a'):
-                     text = a.get_text(strip=True)
-                     if "次へ" in text or "次のページ" in text:
-                         next_btn = a
-                         break
-            
-            if next_btn:
-                next_link = next_btn.get('href')
-                # Resolve relative URL
-                next_link = urljoin(current_url, next_link)
-                     
-                print(f"Found next page: {next_link}")
-                current_url = next_link
-                page_count += 1
-                time.sleep(1) # Be polite
-            else:
-                print("End of article reached.")
-                current_url = None
+    print(f"Fetching: {url}")
+    with Crawler(workers=1) as crawler:
+        article = crawler.fetch_article(url)
+    if article["title"]:
+        print(f"Title: {article['title']}")
+        print("-" * 40)
+    print(f"End of article reached ({article['pages']} pages).")
+    return article["text"]
+
+
+def fetch_articles(urls):
+    """Fetches many articles concurrently. Returns a list of {"url", "title", "text", "pages"}."""
+    start = time.monotonic()
+    with Crawler() as crawler:
+        articles = crawler.crawl(urls)
+        s = crawler.stats
+    print(f"Fetched {len(articles)} articles ({sum(a['pages'] for a in articles)} pages) in {time.monotonic() - start:.1f}s: "
+          f"{s['downloaded']} downloaded, {s['not_modified']} not modified, {s['fresh']} from cache")
+    return articles
 
-        except Exception as e:
-            print(f"Error fetching {current_url}: {e}")
-            break
-            
-    return aggregated_text
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python3 fetch_news.py <url>")
+        print("Usage: python3 fetch_news.py <url> [<url> ...]")
         sys.exit(1)
-        
-    target_url = sys.argv[1]
-    full_text = fetch_yahoojp_article(target_url)
-    
-    print("\n" + "="*20 + " RESULT " + "="*20 + "\n")
-    print(full_text)
+
+    if len(sys.argv) == 2:
+        full_text = fetch_yahoojp_article(sys.argv[1])
+        print("\n" + "="*20 + " RESULT " + "="*20 + "\n")
+        print(full_text)
+    else:
+        for article in fetch_articles(sys.argv[1:]):
+            print("\n" + "="*20 + f" {article['title'] or article['url']} " + "="*20 + "\n")
+            print(article["text"])
@@ -1,53 +1,226 @@
-
 import sys
 import os
 import re
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+import http_client
+import cache_gc
+from concurrent.futures import ThreadPoolExecutor
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import TextFormatter
 
+# --- Transcript Ingestion ---
+# Fetches YouTube transcripts one at a time or in bulk (a list of URLs, or a file
+# with one URL per line), a bounded number at once. Results are cached on disk
+# by video ID and language, so fetching the same video again costs nothing:
+#
+#   <cache_dir>/transcripts/<video_id>.<language>.json
+#
+# The network layer is a provider: provider(video_id, languages) returns
+# (language_code, text). FixtureProvider serves transcripts from a local folder
+# instead of YouTube, for offline runs and checks. Its results are cached under
+# the temp dir, per fixture folder, never in the production cache:
+#
+#   python3 fetch_transcript.py urls.txt --fixtures fixtures/transcripts --out-dir /tmp/t
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+TRANSCRIPT_CONF = config.get("transcripts", {})
+LANGUAGES = TRANSCRIPT_CONF.get("languages", ['ja', 'en', 'en-US']) # Japanese first, then English
+TRANSCRIPT_WORKERS = TRANSCRIPT_CONF.get("workers", 4)
+TRANSCRIPT_CACHE_DIR = os.path.join(current_dir, config["paths"].get("cache_dir", "../cache"), "transcripts")
+
 def get_video_id(url):
     """Extracts video ID from YouTube URL."""
     # Short URL
     match = re.search(r"youtu\.be\/([a-zA-Z0-9_-]+)", url)
     if match: return match.group(1)
-    
+
     # Standard URL
     match = re.search(r"v=([a-zA-Z0-9_-]+)", url)
     if match: return match.group(1)
-    
+
     return None
 
-def fetch_transcript(url, output_file=None):
+def read_url_list(path):
+    """URLs from a text file, one per line (blank lines and # comments are skipped)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+def expand_sources(sources):
+    """URLs given directly or as files of URLs, in order."""
+    urls = []
+    for source in sources:
+        if get_video_id(source) is None and os.path.isfile(source):
+            urls.extend(read_url_list(source))
+        else:
+            urls.append(source)
+    return urls
+
+def get_transcript(video_id, languages):
+    """Fetches a transcript over the shared pooled session."""
+    if hasattr(YouTubeTranscriptApi, "get_transcript"):
+        # youtube-transcript-api < 1.0 only has the static API
+        return YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
+    api = YouTubeTranscriptApi(http_client=http_client.session("youtube"))
+    return api.fetch(video_id, languages=languages)
+
+def youtube_provider(video_id, languages):
+    """Default provider: YouTube. Returns (language_code, text)."""
+    transcript = get_transcript(video_id, languages)
+    # 1.x returns a FetchedTranscript that knows its language; the old API a plain list
+    language = getattr(transcript, "language_code", None) or languages[0]
+    return language, TextFormatter().format_transcript(transcript)
+
+class FixtureProvider:
+    """Serves <root>/<video_id>.<language>.txt instead of YouTube."""
+    def __init__(self, root):
+        self.root = root
+        # Fixture text must never be served later as a real transcript
+        digest = hashlib.sha256(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+        self.cache_root = os.path.join(tempfile.gettempdir(), "transcript_fixtures", digest)
+
+    def __call__(self, video_id, languages):
+        for language in languages:
+            path = os.path.join(self.root, f"{video_id}.{language}.txt")
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    return language, f.read()
+        raise LookupError(f"No fixture transcript for {video_id} in {', '.join(languages)}")
+
+class TranscriptCache:
+    """One JSON file per video ID and language."""
+    def __init__(self, root=TRANSCRIPT_CACHE_DIR):
+        self.root = root
+        if not os.path.exists(root):
+            os.makedirs(root)
+
+    def path_for(self, video_id, language):
+        return os.path.join(self.root, f"{video_id}.{language}.json")
+
+    def load(self, video_id, languages):
+        """The cached transcript in the most preferred language, or None."""
+        for language in languages:
+            path = self.path_for(video_id, language)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            cache_gc.touch(path)
+            return entry
+        return None
+
+    def save(self, video_id, language, text):
+        entry = {"video_id": video_id, "language": language, "text": text, "fetched_at": time.time()}
+        path = self.path_for(video_id, language)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        return entry
+
+def cache_for(provider):
+    """The cache for a provider's results: its own `cache_root` if it has one, else the production cache."""
+    return TranscriptCache(getattr(provider, "cache_root", TRANSCRIPT_CACHE_DIR))
+
+def fetch_one(url, cache, provider=youtube_provider, languages=LANGUAGES, refresh=False):
+    """Returns {"url", "video_id", "language", "text", "cached", "error"} for one URL."""
+    result = {"url": url, "video_id": get_video_id(url), "language": None, "text": None, "cached": False, "error": None}
+    if not result["video_id"]:
+        result["error"] = "Could not extract video ID from URL."
+        return result
+
+    entry = None if refresh else cache.load(result["video_id"], languages)
+    if entry:
+        result["cached"] = True
+    else:
+        try:
+            language, text = provider(result["video_id"], languages)
+        except Exception as e:
+            # youtube-transcript-api errors span many lines; the first one says what failed
+            result["error"] = (str(e).strip().splitlines() or [type(e).__name__])[0]
+            return result
+        entry = cache.save(result["video_id"], language, text)
+    result["language"] = entry["language"]
+    result["text"] = entry["text"]
+    return result
+
+def fetch_transcripts(urls, provider=None, languages=LANGUAGES, workers=TRANSCRIPT_WORKERS, cache=None, refresh=False):
+    """Fetches many transcripts, at most `workers` at once. Results keep the input order."""
+    provider = provider or youtube_provider
+    cache = cache or cache_for(provider)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda url: fetch_one(url, cache, provider, languages, refresh), urls))
+    ok = [r for r in results if not r["error"]]
+    print(f"Fetched {len(ok)}/{len(results)} transcripts in {time.monotonic() - start:.1f}s "
+          f"({sum(r['cached'] for r in ok)} from cache)")
+    for r in results:
+        if r["error"]:
+            print(f"  Failed: {r['url']}: {r['error']}")
+    return results
+
+def write_transcript(text, output_file):
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    print(f"Transcript saved to {output_file}")
+
+def fetch_transcript(url, output_file=None, provider=None, refresh=False):
     video_id = get_video_id(url)
     if not video_id:
         print("Error: Could not extract video ID from URL.")
         return None
 
     print(f"Fetching transcript for Video ID: {video_id}...")
-    
-    try:
-        # Try Japanese first, then English, then auto-generated
-        transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['ja', 'en', 'en-US'])
-        
-        formatter = TextFormatter()
-        text = formatter.format_transcript(transcript)
-        
-        if output_file:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(text)
-            print(f"Transcript saved to {output_file}")
-            
-        return text
-    except Exception as e:
-        print(f"Error fetching transcript: {e}")
+    provider = provider or youtube_provider
+    result = fetch_one(url, cache_for(provider), provider, refresh=refresh)
+    if result["error"]:
+        print(f"Error fetching transcript: {result['error']}")
         return None
+    if result["cached"]:
+        print(f"Using cached transcript ({result['language']})")
+
+    if output_file:
+        write_transcript(result["text"], output_file)
+    return result["text"]
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python3 fetch_transcript.py <youtube_url> [output_file]")
+    parser = argparse.ArgumentParser(description="Fetch YouTube transcripts (cached)")
+    parser.add_argument("sources", nargs="+", help="YouTube URLs and/or files with one URL per line")
+    parser.add_argument("-o", "--output", help="Output file (single URL)")
+    parser.add_argument("--out-dir", help="Write <video_id>.txt per transcript here (many URLs)")
+    parser.add_argument("--workers", type=int, default=TRANSCRIPT_WORKERS)
+    parser.add_argument("--fixtures", help="Serve transcripts from this folder instead of YouTube")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached transcripts")
+    args = parser.parse_args()
+
+    # Old form: fetch_transcript.py <url> [output_file]
+    sources = args.sources
+    if len(sources) == 2 and get_video_id(sources[0]) and not get_video_id(sources[1]) and not os.path.isfile(sources[1]):
+        sources, args.output = sources[:1], sources[1]
+
+    provider = FixtureProvider(args.fixtures) if args.fixtures else None
+    urls = expand_sources(sources)
+    if len(urls) == 1 and not args.out_dir:
+        if fetch_transcript(urls[0], args.output or "transcript.txt", provider, args.refresh) is None:
+            sys.exit(1)
+        sys.exit(0)
+
+    results = fetch_transcripts(urls, provider=provider, workers=args.workers, refresh=args.refresh)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        for r in results:
+            if not r["error"]:
+                write_transcript(r["text"], os.path.join(args.out_dir, f"{r['video_id']}.txt"))
+    if any(r["error"] for r in results):
         sys.exit(1)
-        
-    url = sys.argv[1]
-    output = sys.argv[2] if len(sys.argv) > 2 else "transcript.txt"
-    
-    fetch_transcript(url, output)
@@ -3,6 +3,9 @@ import json
 import os
 import time
 import re
+import pronunciation
+import tracing
+import http_client
 
 # Load Config
 # Load Config
@@ -20,65 +23,18 @@ AUDIO_DIR = os.path.abspath(os.path.join(current_dir, config["paths"]["audio_dir
 # Character to Speaker ID Mapping
 SPEAKER_MAP = config["audio"]["speakers"]
 
-def normalize_text(text):
+def normalize_text(text, rewrites=None):
     """
     Normalizes text for VOICEVOX pronunciation.
-    Corrects common misreadings, acronyms, and English terms.
+    Corrects common misreadings, acronyms, and English terms using the compiled
+    pronunciation dictionary (see pronunciation.py). If a list is passed as
+    `rewrites`, every applied replacement is appended to it for QA.
     """
-    # 1. Acronyms / English
-    replacements = {
-        r"G7": "ジーセブン",
-        r"APEC": "エイペック",
-        r"Switch": "スイッチ",
-        r"SWITCH": "スイッチ",
-        r"PB": "ピービー",
-        r"GDP": "ジーディーピー",
-        r"FRB": "エフアールビー",
-        r"NASDAQ": "ナスダック",
-        r"Amazon": "アマゾン",
-        r"Apple": "アップル",
-        r"Canon": "キヤノン",
-        r"J15": "ジェイジュウゴ",
-        r"F15": "エフジュウゴ",
-    }
-    
-    # 2. Kanjis / Vocabulary
-    vocab_replacements = {
-        r"美味": "おい", # 美味しい -> おいしい
-        r"本日": "ほんじつ",
-        r"明日": "あす",
-        r"御社": "おんしゃ",
-        r"貴社": "きしゃ",
-        r"早苗": "さなえ",
-        r"高市": "たかいち",
-        r"石破": "いしば",
-        r"総理": "そうり",
-        r"習近平": "しゅうきんぺい",
-    }
-    
-    # 0. Clean Number Spacing & Commas (Crucial for Voicevox Counters)
-    # Fix "12,500" -> "12500"
-    text = re.sub(r'(\d{1,3}),(\d{3})', r'\1\2', text) # Simple 1,000 pattern
-    text = re.sub(r'(\d+),(\d+)', r'\1\2', text)       # Catch all digit,digit
-
-    # Fix "2025 年" -> "2025年" (Remove space between Number and Non-Space)
-    text = re.sub(r'(\d+)\s+([^\d\s])', r'\1\2', text)
-    
-    # 3. Specific patterns
-    # Fix "第2章" -> "だいにしょう" (User QA Request)
-    text = re.sub(r"第([0-9０-９]+)章", r"だい\1しょう", text)
-  
-    processed_text = text
-    
-    # 4. Apply replacements (Acronyms & Vocab FIRST)
-    # ...
-    for pattern, reading in replacements.items():
-        processed_text = re.sub(pattern, reading, processed_text, flags=re.IGNORECASE)
-        
-    for pattern, reading in vocab_replacements.items():
-        processed_text = re.sub(pattern, reading, processed_text)
+    processed_text, applied = pronunciation.normalize(text)
+    if rewrites is not None:
+        rewrites.extend(applied)
 
-    # 5. Number Conversion (REMOVED)
+    # Number Conversion (REMOVED)
     # Voicevox handles numbers natively now that spaces/commas are gone.
         
     return processed_text
@@ -149,7 +105,10 @@ def convert_numbers_to_japanese(text):
 
 def check_voicevox_connection():
     try:
-        response = requests.get(f"{BASE_URL}/version", timeout=1)
+        # Probe once, quickly: no retries
+        probe = http_client.make_session("voicevox", retries=0)
+        with probe:
+            response = probe.get(f"{BASE_URL}/version", timeout=1)
         if response.status_code == 200:
             return True
     except requests.exceptions.ConnectionError:
@@ -173,11 +132,15 @@ def generate_audio_file(text, character_name, index, output_dir=None):
     # 1. Audio Query
     try:
         # Phase 7: Pronunciation Fixes / Text Normalization
-        normalized_text = normalize_text(text)
-        print(f"  [Auto-Correcting] '{text}' -> '{normalized_text}'")
+        rewrites = []
+        normalized_text = normalize_text(text, rewrites)
+        if rewrites:
+            applied = ", ".join(f"{r['from']}->{r['to']}" for r in rewrites)
+            print(f"  [Auto-Correcting] {applied}: '{normalized_text}'")
         
         query_payload = {"text": normalized_text, "speaker": speaker_id}
-        r_query = requests.post(f"{BASE_URL}/audio_query", params=query_payload)
+        with tracing.span("tts.audio_query", segment=index):
+            r_query = http_client.session("voicevox").post(f"{BASE_URL}/audio_query", params=query_payload)
         r_query.raise_for_status()
         query_data = r_query.json()
     except Exception as e:
@@ -189,7 +152,8 @@ def generate_audio_file(text, character_name, index, output_dir=None):
         # Speed adjustment (Phase 7/9: Use Config)
         query_data['speedScale'] = config["audio"]["global_speed_scale"]
         
-        r_synth = requests.post(f"{BASE_URL}/synthesis", params={"speaker": speaker_id}, json=query_data)
+        with tracing.span("tts.synthesis", segment=index):
+            r_synth = http_client.session("voicevox").post(f"{BASE_URL}/synthesis", params={"speaker": speaker_id}, json=query_data)
         r_synth.raise_for_status()
     except Exception as e:
          print(f"Error synthesizing audio: {e}")
@@ -2,11 +2,23 @@ import os
 import re
 import json
 import numpy as np
-import textwrap
 import math
+import wave
+import tempfile
+import subprocess
 from moviepy import *
-from PIL import Image, ImageFont, ImageDraw
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
 import generate_audio
+import script_compiler
+import tracing
+import resource_monitor
+import clip_pool
+import cache_gc
+from script_compiler import normalize_character_name, calculate_duration
+# Panel drawing and the overlay cache live in panels.py (no MoviePy needed there)
+from panels import (CHARACTER_COLORS, create_text_image, apply_kinsoku, create_panel_image, OVERLAY_CACHE_DIR,
+                    overlay_path, segment_overlay_args, panel_overlay, prerender_overlays, DESIGN_SIZE)
 
 # --- Config Loading ---
 # --- Config Loading ---
@@ -27,145 +39,80 @@ IMAGE_DIR = resolve_path(config["paths"]["image_dir"])
 BG_VIDEO_DIR = resolve_path(config["paths"]["background_video_dir"])
 BGM_FILE = resolve_path(config["paths"]["bgm_path"])
 EYECATCH_FILE = resolve_path(config["paths"].get("eyecatch_path", "../assets/videos/eyecatch.mp4"))
-FONT_PATH = resolve_path(config["paths"]["font_path"])
 
 # Video Settings
 SCREEN_SIZE = tuple(config["video"]["resolution"])
 FPS = config["video"]["fps"]
+AUDIO_FPS = 44100
+# Upper bound of concurrently open ffmpeg decoders (background, eyecatch, BGM, ...)
+MAX_OPEN_READERS = config["video"].get("max_open_readers", 4)
 BGM_VOLUME = config["audio"]["bgm_volume"]
 
-# Subtitle Settings
-SUB_CONF = config["video"]["subtitle"]
-
 # Context Image Settings
 IMG_CONF = config["video"]["context_image"]
 
-# Character Colors (Vivid & Distinct)
-CHARACTER_COLORS = {
-    "青山龍星": "white",
-    "ずんだもん": "#39c263",   # Zunda Green
-    "四国めたん": "#ff3399",   # Metan Pink
-    "春日部つむぎ": "#ffcc00", # Tsumugi Yellow
-    "雨晴はう": "#66ccff",     # Hau Blue
-    "冥鳴ひまり": "#9966ff",   # Himari Purple
-    "玄野武宏": "#ff3333",     # Kurono Red
-    "麒ヶ島宗麟": "#ff9933",   # Sorin Orange
-    "default": "#cccccc"       # Default Grey
-}
-
-def normalize_character_name(name):
-    """Normalizes character names to standard full names."""
-    name = name.strip()
-    if "ずんだ" in name: return "ずんだもん"
-    if "めたん" in name: return "四国めたん"
-    if "つむぎ" in name: return "春日部つむぎ"
-    if "青山" in name: return "青山龍星"
-    if "宗麟" in name: return "麒ヶ島宗麟"
-    return name
+# --- Render Profiles ---
+# config["video"]["profiles"] names output settings, e.g.
+#
+#   "draft": {"resolution": [640, 360], "fps": 12, "preset": "ultrafast", "crf": 28}
+#   "final": {"preset": "medium", "crf": 20}      (resolution/fps: config["video"])
+#
+# config["video"]["profile"] is the default. The layout is written for
+# DESIGN_SIZE and scaled to the profile's resolution (panels are scaled
+# drawings, background and eyecatch are scaled by ffmpeg while decoding), so a
+# draft looks like the final, only smaller. Encoder threads follow the CPU count.
+DEFAULT_PROFILE = config["video"].get("profile", "final")
+
+def render_profile(name=None):
+    """{"name", "size", "fps", "preset", "crf"} of a named profile."""
+    name = name or DEFAULT_PROFILE
+    profiles = config["video"].get("profiles", {})
+    if name not in profiles and name != DEFAULT_PROFILE:
+        raise ValueError(f"Unknown render profile '{name}' (known: {', '.join(profiles) or 'none'})")
+    p = profiles.get(name, {})
+    return {"name": name, "size": tuple(p.get("resolution", SCREEN_SIZE)), "fps": p.get("fps", FPS),
+            "preset": p.get("preset", "medium"), "crf": p.get("crf"), "maxrate": p.get("maxrate"),
+            "audio_bitrate": p.get("audio_bitrate")}
+
+def encoder_threads(concurrent=1):
+    """x264 threads for one of `concurrent` simultaneous renders."""
+    return max(1, (os.cpu_count() or 1) // max(1, concurrent))
+
+def encoder_params(profile):
+    """Extra ffmpeg arguments of a profile."""
+    params = ["-crf", str(profile["crf"])] if profile.get("crf") is not None else []
+    if profile.get("maxrate"):
+        params += ["-maxrate", profile["maxrate"], "-bufsize", profile["maxrate"]]
+    return params
+
+def layout_scale(size):
+    return size[0] / DESIGN_SIZE[0]
+
+def scaled(value, size):
+    """A DESIGN_SIZE pixel value at `size` (positions like "center" pass through)."""
+    if isinstance(value, (int, float)):
+        return round(value * layout_scale(size))
+    return value
 
 # --- Helper Functions ---
 
-def calculate_duration(text):
-    """Estimates duration based on text length (fallback)."""
-    base_time = 1.0
-    char_time = 0.2 
-    return base_time + (len(text) * char_time)
-
 def parse_script(filepath):
-    """Parses the markdown script to extract segments."""
-    if not os.path.exists(filepath):
-        print(f"Script file not found: {filepath}")
-        return []
-        
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+    """Parses the markdown script to extract segments (compiled once, cached next to the script)."""
+    return script_compiler.compile_script(filepath)
 
-    match = re.search(r'```(.*?)```', content, re.DOTALL)
-    raw_script = match.group(1).strip() if match else content
-    
-    segments = []
-    current_img_keyword = None
-    
-    lines = raw_script.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line: continue
-        
-        # Check for [EYECATCH]
-        if "[EYECATCH]" in line:
-            segments.append({"type": "eyecatch"})
-            continue
-            
-        # Check for [IMG: keyword] tag
-        img_match = re.match(r'\[IMG:\s*(.*?)\]', line)
-        if img_match:
-            current_img_keyword = img_match.group(1).strip()
-            continue
-            
-        # Handle "Character, Text" format
-        if ',' not in line: continue
-        if line.startswith('['): continue 
-        
-        try:
-            parts = line.split(',', 1)
-            char_name = normalize_character_name(parts[0].strip()) # Normalize here
-            raw_text = parts[1].strip()
-            
-            # --- SAFETY NET: Auto-convert （ ） to { } for readings ---
-            # If the user/LLM accidentally used （furigana）, convert it to {furigana}
-            # Catch "Text（Reading）" pattern
-            raw_text = re.sub(r'（(.*?)）', r'{\1}', raw_text)
-            
-            # Check for Audio Reading specified in {Brackets} 
-            # Logic: 
-            # Display: Remove {Content}.
-            # Audio: Use {Content} effectively. 
-            
-            # 1. Display Text: Remove all {Reading} tags
-            display_text = re.sub(r'\{(.*?)\}', '', raw_text).strip()
-            
-            # 2. Audio Text:
-            # We want to replace "Target{Reading}" with "Reading".
-            # Try to match preceding Kanji/Alphanum to replace it.
-            # Pattern: ([Kanji/Alphanum]+){(Reading)} -> \2
-            # Note: This is a heuristic. 
-            # Case A: 2024{reading} -> reading
-            # Case B: Kanji{reading} -> reading
-            # Case C: English Words {reading} -> reading
-            
-            audio_text = raw_text
-            # Replace English/Numbers+Space+{Reading} -> Reading
-            audio_text = re.sub(r'([a-zA-Z0-9\s\.\,\!]+)\{(.*?)\}', r'\2', audio_text)
-            # Replace Kanji+{Reading} -> Reading (Greedy match on Kanji)
-            audio_text = re.sub(r'([一-龠]+)\{(.*?)\}', r'\2', audio_text)
-            
-            # Clean up any remaining braces that didn't match the prefix patterns (Just unwrap them)
-            # e.g. ひらがな{reading} -> ひらがなreading (Voicevox handles this okay-ish)
-            audio_text = re.sub(r'\{(.*?)\}', r'\1', audio_text)
-            
-            segments.append({
-                "type": "dialogue",
-                "character": char_name,
-                "text": display_text,
-                "audio_text": audio_text, 
-                "duration": calculate_duration(audio_text), 
-                "image_keyword": current_img_keyword
-            })
-        except ValueError:
-            continue
-            
-    return segments
+def get_base_custom_clip(duration, color=(30, 30, 30), size=SCREEN_SIZE):
+    return ColorClip(size=size, color=color, duration=duration)
 
-def get_base_custom_clip(duration, color=(30, 30, 30)):
-    return ColorClip(size=SCREEN_SIZE, color=color, duration=duration)
+def image_path_for(keyword, custom_image_dir=None):
+    """Where fetch_images saves a keyword's image (it may not exist)."""
+    search_dir = custom_image_dir if custom_image_dir else IMAGE_DIR
+    safe_key = re.sub(r'[\\/*?:"<>|]', "", keyword).replace(" ", "_") + ".jpg"
+    return os.path.join(search_dir, safe_key)
 
-def get_image_clip(keyword, duration, custom_image_dir=None):
+def get_image_clip(keyword, duration, custom_image_dir=None, size=SCREEN_SIZE):
     """Searches for an image file matching the keyword hash or name."""
-    search_dir = custom_image_dir if custom_image_dir else IMAGE_DIR
-    
     # 1. Try safe filename
-    safe_key = re.sub(r'[\\/*?:"<>|]', "", keyword).replace(" ", "_") + ".jpg"
-    path = os.path.join(search_dir, safe_key)
+    path = image_path_for(keyword, custom_image_dir)
     
     if os.path.exists(path):
         try:
@@ -174,7 +121,7 @@ def get_image_clip(keyword, duration, custom_image_dir=None):
             
             # Smart Scale/Crop
             img_w, img_h = img_clip.size
-            screen_w, screen_h = SCREEN_SIZE
+            screen_w, screen_h = size
             
             # Scale to cover
             ratio_w = screen_w / img_w
@@ -187,8 +134,8 @@ def get_image_clip(keyword, duration, custom_image_dir=None):
             # Settings
             target_w = int(screen_w * IMG_CONF["width_ratio"])
             target_h = int(screen_h * IMG_CONF["height_ratio"])
-            pos_x = IMG_CONF["position_x"]
-            pos_y = IMG_CONF["position_y"]
+            pos_x = scaled(IMG_CONF["position_x"], size)
+            pos_y = scaled(IMG_CONF["position_y"], size)
             
             # Add Border/Stroke? 
             # Simplified: Just resize and place
@@ -200,300 +147,89 @@ def get_image_clip(keyword, duration, custom_image_dir=None):
             return None
     return None
 
-def create_text_image(text, size=SCREEN_SIZE, color='white'):
-    """Creates a text overlay image for Narrator (Aoyama) with dynamic scaling."""
-    img = Image.new('RGBA', size, (0, 0, 0, 0))
-    
-    # Initial Font Config
-    base_fontsize = SUB_CONF["font_size"]
-    fontsize = base_fontsize
-    min_fontsize = 50
-    
-    # Safe Area
-    max_height = 600
-    
-    # Iterative Sizing
-    while fontsize >= min_fontsize:
-        try:
-            font = ImageFont.truetype(FONT_PATH, fontsize)
-        except:
-            font = ImageFont.load_default()
-
-        # Padding / Width
-        padding_x = 50
-        max_text_width = size[0] - (padding_x * 2)
-        avg_char_width = fontsize * 1.0 
-        chars_per_line = int(max_text_width / avg_char_width)
-        if chars_per_line < 1: chars_per_line = 1
-        
-        # Basic Wrap
-        raw_lines = textwrap.wrap(text, width=chars_per_line)
-        
-        # Kinsoku (Bracket Fix) logic
-        refined_lines = []
-        if raw_lines:
-            refined_lines.append(raw_lines[0])
-            for i in range(1, len(raw_lines)):
-                line = raw_lines[i]
-                prev = refined_lines[-1]
-                if line.startswith("」") or line.startswith("。") or line.startswith("、"):
-                     refined_lines[-1] = prev + line[0]
-                     refined_lines.append(line[1:]) 
-                elif prev.endswith("「"):
-                     refined_lines[-1] = prev[:-1]
-                     refined_lines.append("「" + line)
-                else:
-                     refined_lines.append(line)
-            refined_lines = [l for l in refined_lines if l]
-            lines = refined_lines
-        else:
-            lines = []
-
-        # Calculate Height
-        line_height = fontsize * 1.5
-        total_text_height = len(lines) * line_height
-        
-        if total_text_height <= max_height:
-            break
-            
-        fontsize -= 5
-    
-    # Draw Background Bar ("Zabuton")
-    bottom_margin = SUB_CONF["bottom_margin"]
-    start_y = size[1] - bottom_margin - total_text_height
-    
-    bar_height = total_text_height + 60 
-    bar_y1 = start_y - 30
-    bar_y2 = bar_y1 + bar_height
-    
-    overlay = Image.new('RGBA', size, (0, 0, 0, 0))
-    draw_overlay = ImageDraw.Draw(overlay)
-    
-    bg_col = tuple(SUB_CONF["background_color"])
-    draw_overlay.rectangle([0, bar_y1, size[0], bar_y2], fill=bg_col)
-    img = Image.alpha_composite(img, overlay)
-    draw = ImageDraw.Draw(img)
-
-    # Styling
-    stroke_color = tuple(SUB_CONF["stroke_color"]) if isinstance(SUB_CONF["stroke_color"], list) else SUB_CONF["stroke_color"]
-    stroke_width = SUB_CONF["stroke_width"]
-    
-    current_y = start_y
-    for line in lines:
-        # Centering
-        left, top, right, bottom = draw.textbbox((0, 0), line, font=font)
-        text_w = right - left
-        x = (size[0] - text_w) / 2
-        
-        if stroke_width > 0:
-            draw.text((x, current_y), line, font=font, fill=stroke_color, stroke_width=stroke_width, stroke_fill=stroke_color)
-        
-        draw.text((x, current_y), line, font=font, fill=color)
-        current_y += line_height
-        
-    return np.array(img)
-
-def apply_kinsoku(text, chars_per_line):
-    """Applies Japanese kinsoku shori (line breaking rules) robustly."""
-    # First, use textwrap to get rough lines
-    raw_lines = textwrap.wrap(text, width=chars_per_line)
-    if not raw_lines: return []
-    
-    refined_lines = [raw_lines[0]]
-    
-    # Prohibited at start of line
-    kinsoku_start = "」』）)}].,:;!?。、"
-    # Prohibited at end of line
-    kinsoku_end = "「『（({["
-    
-    for i in range(1, len(raw_lines)):
-        current_line = raw_lines[i]
-        prev_line = refined_lines[-1]
-        
-        # Check 1: Current line starts with prohibited char?
-        # If so, append that char to previous line
-        while current_line and current_line[0] in kinsoku_start:
-             refined_lines[-1] += current_line[0]
-             current_line = current_line[1:]
-        
-        # Check 2: Previous line ends with prohibited char?
-        # If so, move that char to current line (start)
-        # Note: We need to be careful not to infinite loop or empty the prev line too much
-        if refined_lines[-1] and refined_lines[-1][-1] in kinsoku_end:
-             char_to_move = refined_lines[-1][-1]
-             refined_lines[-1] = refined_lines[-1][:-1]
-             current_line = char_to_move + current_line
-             
-        if current_line:
-             refined_lines.append(current_line)
-             
-    return refined_lines
-
-def create_panel_image(text, character_name, char_color_hex, size=SCREEN_SIZE):
-    """Creates a panel style overlay with DYNAMIC font sizing to prevent overflow."""
-    img = Image.new('RGBA', size, (0, 0, 0, 0))
-    # We will draw the panel and text on every iteration or just once? 
-    # Better to calculate font size first, then draw.
-    
-    # 1. Panel Box Settings
-    panel_w = 1700  # Significantly Wider
-    panel_h = 650   # Significantly Taller
-    panel_x = (size[0] - panel_w) // 2
-    panel_y = (size[1] - panel_h) // 2
-    
-    # Border Color
-    try:
-        h = char_color_hex.lstrip('#')
-        border_rgb = tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
-    except:
-        # If color name "white", handle it
-        if char_color_hex.lower() == "white":
-             border_rgb = (255, 255, 255)
-        else:
-             border_rgb = (255, 105, 180) # Default Pink
-
-    # Custom Logic for Aoyama (Dark Panel, White Text, BOTTOM position)
-    if character_name == "青山龍星":
-        panel_bg_color = (30, 30, 30, 230) # Dark semitransparent
-        text_color = "white"
-        
-        # Position at BOTTOM to show images
-        # Similar to original create_text_image logic
-        bottom_margin = 50 # Hardcoded or readable from config if passed
-        panel_y = size[1] - panel_h - bottom_margin
-        
-    else:
-        # Others: Keep Center (Existing behavior)
-        panel_bg_color = (255, 255, 255, 255) # White Opaque
-        text_color = "black"
-        # Center Y
-        panel_y = (size[1] - panel_h) // 2
-
-
-    # 2. Dynamic Font Sizing Loop
-    font_size = 90 # Start slightly larger, reduce down
-    min_font_size = 40
-    
-    found_good_size = False
-    final_lines = []
-    final_font = None
-    
-    while font_size >= min_font_size:
-        try:
-            font = ImageFont.truetype(FONT_PATH, font_size)
-        except:
-            font = ImageFont.load_default()
-            
-        # Calc Chars per line (conservative padding)
-        # Internal width is panel_w - 60px padding
-        safe_width = panel_w - 60
-        avg_char_w = font_size # Rough estimate
-        chars_per_line = int(safe_width / avg_char_w)
-        
-        # Apply Kinsoku (which might extend lines)
-        lines = apply_kinsoku(text, chars_per_line)
-        
-        # Verify Width & Height
-        max_line_w = 0
-        draw_temp = ImageDraw.Draw(img)
-        for line in lines:
-             left, top, right, bottom = draw_temp.textbbox((0, 0), line, font=font)
-             max_line_w = max(max_line_w, right - left)
-             
-        line_h = font_size * 1.5
-        total_text_h = len(lines) * line_h
-        
-        # Check Fit
-        if max_line_w <= safe_width and total_text_h <= (panel_h - 40):
-            found_good_size = True
-            final_lines = lines
-            final_font = font
-            break
-            
-        font_size -= 5
-        
-    if not found_good_size:
-        # Fallback if text is absurdly long
-        print(f"Warning: Text too long for panel: {text[:20]}...")
-        final_lines = lines
-        final_font = font # Use smallest
-        
-    # 3. Draw Final
-    img_final = Image.new('RGBA', size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img_final)
-    
-    # RE-CALCULATE Height/Position for Aoyama (Dynamic Fit)
-    # The loop ensured it FITS in max panel_h (650), but we don't want to USE all 650 if text is short.
-    if character_name == "青山龍星":
-        line_h_final = final_font.size * 1.5
-        total_text_h_final = len(final_lines) * line_h_final
-        # Add padding (top/bottom)
-        dynamic_h = int(total_text_h_final + 80) 
-        panel_h = max(200, dynamic_h) # Minimum 200px
-        
-        # Re-calc Y for bottom alignment
-        bottom_margin = 50
-        panel_y = size[1] - panel_h - bottom_margin
-        
-    # Draw Panel
-    border_width = 15
-    draw.rectangle([panel_x, panel_y, panel_x+panel_w, panel_y+panel_h], fill=panel_bg_color, outline=border_rgb, width=border_width)
-    
-    # Draw Text
-    line_h = final_font.size * 1.5
-    total_text_h = len(final_lines) * line_h
-    start_text_y = panel_y + (panel_h - total_text_h) / 2
-    
-    curr_y = start_text_y
-    for line in final_lines:
-        left, top, right, bottom = draw.textbbox((0, 0), line, font=final_font)
-        w = right - left
-        x = panel_x + (panel_w - w) / 2
-        draw.text((x, curr_y), line, font=final_font, fill=text_color)
-        curr_y += line_h
-        
-    return np.array(img_final)
-
-def generate_video(script_path=None, output_path=None, image_dir=None, audio_dir=None):
+def synthesize_audio(script_path, audio_dir, reuse=None):
+    """
+    TTS for every segment ahead of the render. Returns {segment index: wav path};
+    generate_video(wav_paths=...) then uses these instead of calling VOICEVOX.
+    `reuse` maps segment indexes to still valid WAVs (see checkpoints.py), which are not synthesized again.
+    """
+    wav_paths = {}
+    if not config["audio"]["use_voicevox"]:
+        return wav_paths
+    reuse = reuse or {}
+    for i, seg in enumerate(parse_script(script_path)):
+        if seg.get("type") == "eyecatch":
+            continue
+        if reuse.get(i) and os.path.exists(reuse[i]):
+            cache_gc.touch(reuse[i])
+            wav_paths[i] = reuse[i]
+            continue
+        text_for_audio = seg.get('audio_text', seg['text'])
+        with tracing.span("tts", segment=i):
+            wav_path = generate_audio.generate_audio_file(text_for_audio, seg['character'], i, output_dir=audio_dir)
+        if wav_path:
+            wav_paths[i] = wav_path
+    if reuse:
+        print(f"TTS: {len(reuse)} segments unchanged, {len(wav_paths) - len(reuse)} synthesized.")
+    return wav_paths
+
+def generate_video(script_path=None, output_path=None, image_dir=None, audio_dir=None, monitor=None, stream=None, wav_paths=None,
+                   keep_intermediates=False, profile=None, threads=None, renditions=None):
     # Use args or defaults
     target_script = script_path if script_path else SCRIPT_PATH
     target_output = output_path if output_path else OUTPUT_VIDEO
     target_image_dir = image_dir if image_dir else IMAGE_DIR
     target_audio_dir = audio_dir if audio_dir else config["paths"]["audio_dir"]
 
-    # 1. Parse Script
-    segments = parse_script(target_script)
-    print(f"Script parsed. {len(segments)} segments found.")
-    
-    clips = []
-    
-    # Pre-load Eyecatch
-    eyecatch_clip = None
-    if os.path.exists(EYECATCH_FILE):
-        try:
-             eyecatch_clip = VideoFileClip(EYECATCH_FILE)
-             print("Eyecatch loaded.")
-        except Exception as e:
-             print(f"Eyecatch load failed: {e}")
-
-    # Use Voicevox check
-    use_voicevox = config["audio"]["use_voicevox"]
-    
-    # Background Video Loop (Simple)
+    # "batch" keeps every segment until one final write, "stream" encodes segment by segment
+    if stream is None:
+        stream = config["video"].get("render_mode", "batch") == "stream"
+    render = stream_render_video if stream else render_video
+    if not isinstance(profile, dict):
+        profile = render_profile(profile)
+    threads = threads or encoder_threads()
+    if renditions is None:
+        renditions = DEFAULT_RENDITIONS
+    if renditions:
+        # Several outputs from one composite pass need the frame pipe of the streaming renderer
+        render = stream_render_video
+        renditions = [r if isinstance(r, dict) else render_profile(r) for r in renditions]
+        for r in renditions:
+            print(f"Rendition '{r['name']}': {r['size'][0]}x{r['size'][1]} @ {r['fps']} fps, preset {r['preset']}")
+    else:
+        print(f"Render profile '{profile['name']}': {profile['size'][0]}x{profile['size'][1]} @ {profile['fps']} fps, "
+              f"preset {profile['preset']}, {threads} encoder threads")
+
+    # Resource sampling (time series + budgets), see resource_monitor.py
+    if monitor is None:
+        monitor = config.get("resources", {}).get("monitor", False)
+    args = (render, target_script, target_output, target_image_dir, target_audio_dir, wav_paths, keep_intermediates,
+            profile, threads, renditions)
+    if not monitor:
+        return run_with_readers(*args)
+
+    resource_monitor.start()
+    try:
+        return run_with_readers(*args)
+    except KeyboardInterrupt:
+        # The sampler interrupts the main thread when a budget is exceeded
+        err = resource_monitor.budget_error()
+        if err:
+            raise err from None
+        raise
+    finally:
+        resource_monitor.stop(target_output + ".resources.json")
+
+def background_video_path():
     # Just use 'news_bg.mp4' from BG_VIDEO_DIR or similar if exists, else ColorClip
     bg_path = os.path.join(BG_VIDEO_DIR, "news_bg.mp4")
     if not os.path.exists(bg_path):
          # Search for any mp4
          bgs = [f for f in os.listdir(BG_VIDEO_DIR) if f.endswith(".mp4")]
          if bgs: bg_path = os.path.join(BG_VIDEO_DIR, bgs[0])
-    
-    base_bg_clip = None
-    if os.path.exists(bg_path):
-        base_bg_clip = VideoFileClip(bg_path)
-    
-    # Loop Segments
-    last_valid_aoyama_image = None
-    
+    return bg_path
+
+def default_context_image_path(target_image_dir):
     # Default Fallback Image (Stabilization)
     # Correct path: project/assets/backgrounds/default_news_bg.jpg
     # current_dir is scripts dir. assets is ../assets
@@ -504,159 +240,485 @@ def generate_video(script_path=None, output_path=None, image_dir=None, audio_dir
          fallback_candidates = [f for f in os.listdir(target_image_dir) if f.endswith(".jpg")]
          if fallback_candidates:
              DEFAULT_BG_PATH = os.path.join(target_image_dir, fallback_candidates[0])
+    return DEFAULT_BG_PATH
+
+def load_render_assets(target_image_dir, pool, size=SCREEN_SIZE):
+    """Loads what every segment shares: eyecatch, background loop and the default context image."""
+    size = tuple(size)
+    assets = {"eyecatch": None, "background": None, "context_image": None, "size": size}
 
+    # Pre-load Eyecatch
+    if os.path.exists(EYECATCH_FILE):
+        try:
+             # Pinned: every eyecatch segment plays this reader until the render ends
+             assets["eyecatch"] = pool.video(EYECATCH_FILE, scale=layout_scale(size), pin=True)
+             print("Eyecatch loaded.")
+        except Exception as e:
+             print(f"Eyecatch load failed: {e}")
+
+    # Background Video Loop (Simple)
+    bg_path = background_video_path()
+    if os.path.exists(bg_path):
+        assets["background"] = pool.video(bg_path, scale=layout_scale(size), pin=True)
+    
+    DEFAULT_BG_PATH = default_context_image_path(target_image_dir)
     if os.path.exists(DEFAULT_BG_PATH):
         try:
             print(f"Loading Default Background: {DEFAULT_BG_PATH}")
             # Load and crop/resize to screen
-            last_valid_aoyama_image = ImageClip(DEFAULT_BG_PATH).resized(width=SCREEN_SIZE[0]).with_position("center")
+            default_img = ImageClip(DEFAULT_BG_PATH).resized(width=size[0]).with_position("center")
             # Apply same styling as get_image_clip (resize to target ratio)
-            target_w = int(SCREEN_SIZE[0] * IMG_CONF["width_ratio"])
-            pos_x = IMG_CONF["position_x"]
-            pos_y = IMG_CONF["position_y"]
-            last_valid_aoyama_image = last_valid_aoyama_image.resized(width=target_w).with_position((pos_x, pos_y))
+            target_w = int(size[0] * IMG_CONF["width_ratio"])
+            pos_x = scaled(IMG_CONF["position_x"], size)
+            pos_y = scaled(IMG_CONF["position_y"], size)
+            assets["context_image"] = default_img.resized(width=target_w).with_position((pos_x, pos_y))
         except Exception as e:
             print(f"Warning: Failed to load default BG: {e}")
 
+    return assets
+
+def segment_duration(seg, audio_duration=None):
+    """On-screen length of a dialogue segment: its narration (estimated without one) plus padding."""
+    duration = audio_duration if audio_duration is not None else calculate_duration(seg.get('audio_text', seg['text']))
+    if duration < 1.0: duration = 1.0
+
+    # Audio Padding Fix (Phase 22 - Correct Implementation)
+    # Extend the base duration so ALL visual elements (BG, Image, Text) cover the full time
+    return duration + 0.2
+
+def wav_duration(path):
+    """Length of a WAV from its header (None if unreadable), without decoding it."""
+    try:
+        with wave.open(path, "rb") as w:
+            return w.getnframes() / w.getframerate()
+    except (OSError, wave.Error, EOFError):
+        return None
+
+def segment_starts(segments, wav_paths, eyecatch_duration=None):
+    """
+    [(start, duration)] of every segment in the rendered video, from the WAV
+    headers alone: a preview can seek to any time without rendering up to it.
+    Eyecatch segments last eyecatch_duration (0 when there is no eyecatch).
+    """
+    out = []
+    t = 0.0
     for i, seg in enumerate(segments):
-        # Handle Eyecatch
         if seg.get("type") == "eyecatch":
-            if eyecatch_clip:
-                clips.append(eyecatch_clip)
-                print("Inserted Eyecatch.")
-            continue
-
-        # Audio
-        audio_clip = None
-        duration = 0
-        
-        # Determine Audio Text
-        text_for_audio = seg.get('audio_text', seg['text'])
-        
-        if use_voicevox:
-            wav_path = generate_audio.generate_audio_file(text_for_audio, seg['character'], i, output_dir=target_audio_dir)
-            if wav_path and os.path.exists(wav_path):
-                audio_clip = AudioFileClip(wav_path)
-                duration = audio_clip.duration
-            else:
-                duration = calculate_duration(text_for_audio)
+            duration = eyecatch_duration or 0.0
         else:
-            duration = calculate_duration(text_for_audio)
-            
-        if duration < 1.0: duration = 1.0
+            wav = (wav_paths or {}).get(i) if config["audio"]["use_voicevox"] else None
+            duration = segment_duration(seg, wav_duration(wav) if wav else None)
+        out.append((t, duration))
+        t += duration
+    return out
+
+def build_segment(i, seg, assets, target_image_dir, target_audio_dir):
+    """
+    Builds the composited clip for one segment.
+    Returns (clip, audio_clip); audio_clip belongs to this segment only (close it when done).
+    assets["context_image"] carries the last valid narrator image between calls (Persistence).
+    """
+    # Handle Eyecatch
+    if seg.get("type") == "eyecatch":
+        return assets["eyecatch"], None
+    size = assets.get("size", SCREEN_SIZE)
+
+    # Audio
+    audio_clip = None
+    duration = 0
+    
+    # Determine Audio Text
+    text_for_audio = seg.get('audio_text', seg['text'])
+    
+    if config["audio"]["use_voicevox"]:
+        # Synthesized ahead of time by synthesize_audio() (run-batch), else now
+        wav_path = (assets.get("wavs") or {}).get(i)
+        if not wav_path:
+            with tracing.span("tts", segment=i):
+                wav_path = generate_audio.generate_audio_file(text_for_audio, seg['character'], i, output_dir=target_audio_dir)
+        if wav_path and os.path.exists(wav_path):
+            # Decoded into memory: no ffmpeg reader stays open per segment
+            audio_clip = clip_pool.load_wav(wav_path)
+            duration = audio_clip.duration
+        else:
+            duration = None
+    else:
+        duration = None
+    duration = segment_duration(seg, duration)
+    
+    # Background
+    base_bg_clip = assets["background"]
+    bg_segment = None
+    if base_bg_clip:
+         # Loop if needed
+         if base_bg_clip.duration < duration:
+              # Manual Loop
+              num_loops = math.ceil(duration / base_bg_clip.duration) + 1
+              bg_segment = concatenate_videoclips([base_bg_clip] * num_loops).subclipped(0, duration)
+         else:
+              bg_segment = base_bg_clip.subclipped(0, duration)
+    else:
+         bg_segment = ColorClip(size, color=(0,0,50), duration=duration)
+    
+    bg_segment = bg_segment.with_duration(duration)
 
-        # Audio Padding Fix (Phase 22 - Correct Implementation)
-        # Extend the base duration so ALL visual elements (BG, Image, Text) cover the full time
-        duration += 0.2
+    # Context Image (with Persistence)
+    context_img = None
+    
+    # Logic:
+    # 1. If [IMG: keyword] matches and exists -> New Image.
+    # 2. If [IMG: keyword] matches but MISSING -> Reuse Last Valid Image.
+    # 3. If no tag -> Reuse Last Valid Image (until scene change? No, current design is per-line persistence).
+    
+    target_keyword = seg.get('image_keyword')
+    
+    # 1. Default: Use Last Valid Image (Persistence)
+    if assets["context_image"]:
+        context_img = assets["context_image"].with_duration(duration)
+    
+    # 2. Override if New Image Specified (Aoyama Only)
+    if seg['character'] == "青山龍星":
+        if target_keyword:
+             # Try to get new image
+             with tracing.span("context_image", segment=i):
+                 new_clip = get_image_clip(target_keyword, duration, custom_image_dir=target_image_dir, size=size)
+             if new_clip:
+                 context_img = new_clip
+                 assets["context_image"] = new_clip # Update persistence
+    
+    # Text Overlay
+    # UNIFIED PANEL LOGIC: Now everyone uses Panel Image.
+    with tracing.span("overlay", segment=i) as sp:
+        img_arr, hit = panel_overlay(*segment_overlay_args(seg), size=size)
+        sp.set(cache="hit" if hit else "miss")
         
-        # Background
-        bg_segment = None
-        if base_bg_clip:
-             # Loop if needed
-             if base_bg_clip.duration < duration:
-                  # Manual Loop
-                  num_loops = math.ceil(duration / base_bg_clip.duration) + 1
-                  bg_segment = concatenate_videoclips([base_bg_clip] * num_loops).subclipped(0, duration)
-             else:
-                  bg_segment = base_bg_clip.subclipped(0, duration)
+    txt_clip = ImageClip(img_arr).with_duration(duration)
+    
+    # Composite
+    layers = [bg_segment]
+    if context_img: layers.append(context_img)
+    layers.append(txt_clip)
+    
+    with tracing.span("compose", segment=i):
+        combined = CompositeVideoClip(layers, size=size)
+    if audio_clip:
+         # Audio Padding Fix (Phase 27)
+         # Add 0.1s silence BEFORE and AFTER the audio to prevent clipping at transitions
+         try:
+             # Create a silent audio clip of 0.1s
+             # In MoviePy 1.0, AudioClip(make_frame, duration) or AudioArrayClip
+             # Easiest way: use a small chunk of the BGM muted? or just 0s array.
+             # Actually, simpler: just set the start of the audio 0.1s later in the composite?
+             # No, we want to extend the clip length.
+             
+             # Let's use `CompositeAudioClip` to pad.
+             # padding_silence = AudioClip(lambda t: [0, 0], duration=0.1) # This often fails with numpy shapes
+             # Robust way: Just use `set_start`.
+             # But we need the video clip to be longer. We already did `duration += 0.2`.
+             
+             # So, we just need to ensure the audio plays in the MIDDLE of that duration.
+             # Current duration = audio.duration + 0.2
+             # So if we set audio start to 0.1, it has 0.1 padding on both sides.
+             
+             combined = combined.with_audio(audio_clip.with_start(0.1))
+         except Exception as e:
+             print(f"Warning: Failed to apply audio padding: {e}")
+             combined = combined.with_audio(audio_clip)
+    
+    return combined, audio_clip
+
+def run_with_readers(render, target_script, target_output, target_image_dir, target_audio_dir, wav_paths=None,
+                     keep_intermediates=False, profile=None, threads=None, renditions=None):
+    """Runs a renderer with a bounded reader pool; every reader is closed afterwards, even on error."""
+    profile = profile or render_profile()
+    with clip_pool.ReaderPool(max_open=MAX_OPEN_READERS) as pool:
+        if render is stream_render_video:
+            result = render(target_script, target_output, target_image_dir, target_audio_dir, pool, wav_paths, keep_intermediates,
+                            profile=profile, threads=threads, renditions=renditions)
         else:
-             bg_segment = ColorClip(SCREEN_SIZE, color=(0,0,50), duration=duration)
-        
-        bg_segment = bg_segment.with_duration(duration)
+            result = render(target_script, target_output, target_image_dir, target_audio_dir, pool, wav_paths,
+                            profile=profile, threads=threads)
+        print(f"Readers: {pool.stats['opened']} opened, {pool.stats['reused']} reused, "
+              f"{pool.stats['evicted']} evicted, {pool.stats['over_cap']} over cap, peak {pool.stats['peak_open']} open.")
+        return result
+
+def render_video(target_script, target_output, target_image_dir, target_audio_dir, pool, wav_paths=None,
+                 profile=None, threads=None):
+    profile = profile or render_profile()
+    # 1. Parse Script
+    resource_monitor.set_stage("parse")
+    segments = parse_script(target_script)
+    print(f"Script parsed. {len(segments)} segments found.")
+    
+    clips = []
+    assets = load_render_assets(target_image_dir, pool, profile["size"])
+    assets["wavs"] = wav_paths
 
-        # Context Image (with Persistence)
-        context_img = None
-        
-        # Logic:
-        # 1. If [IMG: keyword] matches and exists -> New Image.
-        # 2. If [IMG: keyword] matches but MISSING -> Reuse Last Valid Image.
-        # 3. If no tag -> Reuse Last Valid Image (until scene change? No, current design is per-line persistence).
-        
-        target_keyword = seg.get('image_keyword')
-        
-        # 1. Default: Use Last Valid Image (Persistence)
-        if last_valid_aoyama_image:
-            context_img = last_valid_aoyama_image.with_duration(duration)
-        
-        # 2. Override if New Image Specified (Aoyama Only)
-        if seg['character'] == "青山龍星":
-            if target_keyword:
-                 # Try to get new image
-                 new_clip = get_image_clip(target_keyword, duration, custom_image_dir=target_image_dir)
-                 if new_clip:
-                     context_img = new_clip
-                     last_valid_aoyama_image = new_clip # Update persistence
-        
-        # Text Overlay
-        char_color = CHARACTER_COLORS.get(seg['character'], CHARACTER_COLORS["default"])
-        # UNIFIED PANEL LOGIC: Now everyone uses Panel Image.
-        img_arr = create_panel_image(seg['text'], seg['character'], char_color)
-            
-        txt_clip = ImageClip(img_arr).with_duration(duration)
-        
-        # Composite
-        layers = [bg_segment]
-        if context_img: layers.append(context_img)
-        layers.append(txt_clip)
-        
-        combined = CompositeVideoClip(layers)
-        if audio_clip:
-             # Audio Padding Fix (Phase 27)
-             # Add 0.1s silence BEFORE and AFTER the audio to prevent clipping at transitions
-             try:
-                 # Create a silent audio clip of 0.1s
-                 # In MoviePy 1.0, AudioClip(make_frame, duration) or AudioArrayClip
-                 # Easiest way: use a small chunk of the BGM muted? or just 0s array.
-                 # Actually, simpler: just set the start of the audio 0.1s later in the composite?
-                 # No, we want to extend the clip length.
-                 
-                 # Let's use `CompositeAudioClip` to pad.
-                 # padding_silence = AudioClip(lambda t: [0, 0], duration=0.1) # This often fails with numpy shapes
-                 # Robust way: Just use `set_start`.
-                 # But we need the video clip to be longer. We already did `duration += 0.2`.
-                 
-                 # So, we just need to ensure the audio plays in the MIDDLE of that duration.
-                 # Current duration = audio.duration + 0.2
-                 # So if we set audio start to 0.1, it has 0.1 padding on both sides.
-                 
-                 combined = combined.with_audio(audio_clip.with_start(0.1))
-             except Exception as e:
-                 print(f"Warning: Failed to apply audio padding: {e}")
-                 combined = combined.with_audio(audio_clip)
-        
-        clips.append(combined)
-        print(f"Segment {i+1}/{len(segments)} done. Dur: {duration:.2f}s")
+    resource_monitor.set_stage("segments")
+    for i, seg in enumerate(segments):
+        resource_monitor.check()
+
+        clip, _ = build_segment(i, seg, assets, target_image_dir, target_audio_dir)
+        if clip is None:
+            continue
+        clips.append(clip)
+        if seg.get("type") == "eyecatch":
+            print("Inserted Eyecatch.")
+        else:
+            print(f"Segment {i+1}/{len(segments)} done. Dur: {clip.duration:.2f}s")
 
+    resource_monitor.set_stage("concatenate")
     print("Concatenating...")
-    final_video = concatenate_videoclips(clips, method="compose")
+    with tracing.span("concatenate"):
+        final_video = concatenate_videoclips(clips, method="compose")
     
     # BGM
     if os.path.exists(BGM_FILE):
+        resource_monitor.set_stage("bgm_mix")
         print(f"Adding BGM: {BGM_FILE}")
-        bgm_clip = AudioFileClip(BGM_FILE)
-        num_loops = math.ceil(final_video.duration / bgm_clip.duration) + 1
-        bgm_looped = concatenate_audioclips([bgm_clip] * num_loops).subclipped(0, final_video.duration)
-        
-        try:
-             bgm_looped = bgm_looped.with_effects([afx.MultiplyVolume(BGM_VOLUME)])
-        except:
-             bgm_looped = bgm_looped.volumex(BGM_VOLUME)
-        
-        final_audio = CompositeAudioClip([final_video.audio, bgm_looped])
-        final_video = final_video.with_audio(final_audio)
+        with tracing.span("bgm_mix"):
+            # Pinned: the looped BGM is only read while the video is written
+            bgm_clip = pool.audio(BGM_FILE, pin=True)
+            num_loops = math.ceil(final_video.duration / bgm_clip.duration) + 1
+            bgm_looped = concatenate_audioclips([bgm_clip] * num_loops).subclipped(0, final_video.duration)
+            
+            try:
+                 bgm_looped = bgm_looped.with_effects([afx.MultiplyVolume(BGM_VOLUME)])
+            except:
+                 bgm_looped = bgm_looped.volumex(BGM_VOLUME)
+            
+            final_audio = CompositeAudioClip([final_video.audio, bgm_looped])
+            final_video = final_video.with_audio(final_audio)
     
     # Ensure directory exists for output
     out_dir = os.path.dirname(target_output)
     if out_dir and not os.path.exists(out_dir):
         os.makedirs(out_dir)
 
+    resource_monitor.set_stage("encode")
+    resource_monitor.check()
     print(f"Writing to {target_output}...")
-    final_video.write_videofile(
-        target_output, 
-        fps=FPS, 
-        codec="libx264", 
-        audio_codec="aac"
-    )
+    # Note: compositing is lazy in MoviePy, so most frame work is accounted to "encode".
+    with tracing.span("encode", duration=round(final_video.duration, 2)):
+        final_video.write_videofile(
+            target_output, 
+            fps=profile["fps"], 
+            codec="libx264", 
+            audio_codec="aac",
+            preset=profile["preset"],
+            threads=threads or encoder_threads(),
+            ffmpeg_params=encoder_params(profile)
+        )
+    print("Video Generation Complete.")
+
+def mux_narration_and_bgm(video_path, narration_path, output_path, audio_bitrate=None):
+    """Muxes the encoded video with the narration WAV, looping and mixing the BGM in ffmpeg."""
+    cmd = [FFMPEG_BINARY, "-y", "-loglevel", "error", "-i", video_path, "-i", narration_path]
+    if os.path.exists(BGM_FILE):
+        print(f"Adding BGM: {BGM_FILE}")
+        cmd += ["-stream_loop", "-1", "-i", BGM_FILE,
+                "-filter_complex", f"[2:a]volume={BGM_VOLUME}[bgm];[1:a][bgm]amix=inputs=2:duration=first:normalize=0[aout]",
+                "-map", "0:v", "-map", "[aout]"]
+    else:
+        cmd += ["-map", "0:v", "-map", "1:a"]
+    cmd += ["-c:v", "copy", "-c:a", "aac"]
+    if audio_bitrate:
+        cmd += ["-b:a", audio_bitrate]
+    cmd += ["-shortest", output_path]
+    subprocess.run(cmd, check=True)
+
+def intermediate_paths(target_output):
+    """(video-only, narration WAV) files the streaming renderer muxes into target_output."""
+    base = os.path.splitext(target_output)[0]
+    return base + ".video.tmp.mp4", base + ".narration.tmp.wav"
+
+# --- Renditions ---
+# config["video"]["renditions"] lists render profiles to write from ONE render,
+# e.g. ["final", "upload", "archive"]: a master, an upload copy and a
+# low-bitrate archive. Every frame is composited once, at the largest
+# rendition's size, and piped into one ffmpeg process that splits it, scales
+# each branch and feeds one x264 encoder per rendition. The narration WAV is
+# shared; each rendition gets its own mux. The first rendition is written to
+# the output path, the others next to it as <output>_<profile>.mp4.
+DEFAULT_RENDITIONS = config["video"].get("renditions", [])
+
+def rendition_outputs(target_output, renditions):
+    """[(profile, output path)] of the renditions, the first one at target_output."""
+    base = os.path.splitext(target_output)[0]
+    profiles = [r if isinstance(r, dict) else render_profile(r) for r in renditions]
+    return [(p, target_output if k == 0 else f"{base}_{p['name']}.mp4") for k, p in enumerate(profiles)]
+
+def stream_intermediates(target_output, renditions=None):
+    """Files a streaming render keeps for a re-mux: the video-only file of every output, then the narration WAV."""
+    outputs = [path for _, path in rendition_outputs(target_output, renditions)] if renditions else [target_output]
+    return [intermediate_paths(path)[0] for path in outputs] + [intermediate_paths(target_output)[1]]
+
+def remux(target_output, renditions=None):
+    """Muxes the kept intermediates of a streaming render again (e.g. after a BGM change)."""
+    narration = intermediate_paths(target_output)[1]
+    if not renditions:
+        mux_narration_and_bgm(intermediate_paths(target_output)[0], narration, target_output)
+        return
+    for profile, path in rendition_outputs(target_output, renditions):
+        mux_narration_and_bgm(intermediate_paths(path)[0], narration, path, profile.get("audio_bitrate"))
+
+class RenditionWriter:
+    """
+    FFMPEG_VideoWriter for several outputs: RGB frames of `size` go into one
+    ffmpeg process, where split/scale (and fps, for a lower frame rate) feed
+    one encoder per (path, profile). The encoders share `threads`.
+    """
+    def __init__(self, outputs, size, fps, threads=None):
+        per_encoder = max(1, (threads or encoder_threads()) // len(outputs))
+        chains = [f"[0:v]split={len(outputs)}" + "".join(f"[s{k}]" for k in range(len(outputs)))]
+        cmd = [FFMPEG_BINARY, "-y", "-loglevel", "error", "-f", "rawvideo", "-vcodec", "rawvideo",
+               "-s", f"{size[0]}x{size[1]}", "-pix_fmt", "rgb24", "-r", f"{fps:.02f}", "-an", "-i", "-"]
+        maps = []
+        for k, (path, profile) in enumerate(outputs):
+            filters = []
+            if tuple(profile["size"]) != tuple(size):
+                filters.append(f"scale={profile['size'][0]}:{profile['size'][1]}:flags=lanczos")
+            if profile["fps"] != fps:
+                filters.append(f"fps={profile['fps']}")
+            filters.append("format=yuv420p")
+            chains.append(f"[s{k}]{','.join(filters)}[v{k}]")
+            maps += ["-map", f"[v{k}]", "-c:v", "libx264", "-preset", profile["preset"], "-threads", str(per_encoder),
+                     *encoder_params(profile), path]
+        cmd += ["-filter_complex", ";".join(chains)] + maps
+        # A file, not a pipe: nobody reads stderr while frames are written
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self.stderr)
+        self.error = None
+
+    def write_frame(self, frame):
+        try:
+            self.proc.stdin.write(frame.tobytes())
+        except OSError as e:
+            # ffmpeg is gone (bad output path, full disk, ...): its stderr says why
+            self.proc.wait()
+            self.error = RuntimeError(f"ffmpeg (renditions) failed while writing frames ({e}):\n{self.stderr_tail()}")
+            raise self.error from e
+
+    def stderr_tail(self, limit=2000):
+        self.stderr.seek(0, os.SEEK_END)
+        self.stderr.seek(max(0, self.stderr.tell() - limit))
+        return self.stderr.read().decode("utf-8", errors="replace").strip()
+
+    def close(self):
+        """Waits for the encoders; raises with ffmpeg's stderr unless write_frame already did."""
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        finally:
+            returncode = self.proc.wait()
+            self.proc = None
+        try:
+            if returncode != 0 and self.error is None:
+                self.error = RuntimeError(f"ffmpeg (renditions) exited with code {returncode}:\n{self.stderr_tail()}")
+                raise self.error
+        finally:
+            self.stderr.close()
+
+def stream_render_video(target_script, target_output, target_image_dir, target_audio_dir, pool, wav_paths=None,
+                        keep_intermediates=False, profile=None, threads=None, renditions=None):
+    """
+    Constant-memory render for arbitrarily long scripts.
+    Each segment is built on demand, its frames are piped straight into ONE ffmpeg
+    encoder, and its audio is appended to a narration WAV on disk. The segment's
+    readers/overlays are released before the next one starts, so peak memory does
+    not grow with script length. BGM is mixed in by ffmpeg while muxing.
+    With keep_intermediates the video-only file and narration WAV stay on disk,
+    so a BGM change only needs remux() again. With renditions the same frames
+    are encoded into every rendition (see RenditionWriter).
+    """
+    resource_monitor.set_stage("parse")
+    segments = parse_script(target_script)
+    print(f"Script parsed. {len(segments)} segments found. (streaming render)")
+    profile = profile or render_profile()
+    size, fps = profile["size"], profile["fps"]
+    outputs = rendition_outputs(target_output, renditions) if renditions else [(profile, target_output)]
+    if renditions:
+        # Composite once at the largest rendition, the encoders scale down from there
+        size = max((p["size"] for p, _ in outputs), key=lambda s: s[0] * s[1])
+        fps = max(p["fps"] for p, _ in outputs)
+
+    out_dir = os.path.dirname(target_output)
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    *video_tmps, narration_tmp = stream_intermediates(target_output, renditions)
+
+    assets = load_render_assets(target_image_dir, pool, size)
+    assets["wavs"] = wav_paths
+
+    if renditions:
+        writer = RenditionWriter([(tmp, p) for tmp, (p, _) in zip(video_tmps, outputs)], size, fps, threads)
+    else:
+        writer = FFMPEG_VideoWriter(video_tmps[0], size, fps, codec="libx264", preset=profile["preset"],
+                                    threads=threads or encoder_threads(), ffmpeg_params=encoder_params(profile))
+    narration = wave.open(narration_tmp, "wb")
+    narration.setnchannels(2)
+    narration.setsampwidth(2)
+    narration.setframerate(AUDIO_FPS)
+
+    total_frames = 0
+    total_samples = 0
+    try:
+        resource_monitor.set_stage("segments")
+        for i, seg in enumerate(segments):
+            resource_monitor.check()
+
+            clip, audio_clip = build_segment(i, seg, assets, target_image_dir, target_audio_dir)
+            if clip is None:
+                continue
+            try:
+                if tuple(clip.size) != size:
+                    clip = CompositeVideoClip([clip.with_position("center")], size=size)
+
+                with tracing.span("encode", segment=i):
+                    for frame in clip.iter_frames(fps=fps, dtype="uint8"):
+                        writer.write_frame(frame)
+                        total_frames += 1
+
+                # Keep narration sample-aligned with the frames actually written (no drift)
+                target_samples = round(total_frames * AUDIO_FPS / fps)
+                pcm = np.zeros((target_samples - total_samples, 2), dtype=np.int16)
+                if clip.audio is not None:
+                    snd = clip.audio.to_soundarray(fps=AUDIO_FPS, quantize=True, nbytes=2)
+                    if snd.ndim == 1 or snd.shape[1] == 1:
+                        snd = np.column_stack([snd.reshape(-1)] * 2)
+                    n = min(len(pcm), len(snd))
+                    pcm[:n] = snd[:n, :2]
+                narration.writeframes(pcm.tobytes())
+                total_samples = target_samples
+            finally:
+                # Release everything this segment owns before building the next one
+                # (shared background/eyecatch readers stay in the pool)
+                if audio_clip:
+                    audio_clip.close()
+                del clip, audio_clip
+
+            if seg.get("type") == "eyecatch":
+                print("Inserted Eyecatch.")
+            else:
+                print(f"Segment {i+1}/{len(segments)} done. ({total_frames / fps:.1f}s so far)")
+    finally:
+        writer.close()
+        narration.close()
+
+    resource_monitor.set_stage("mux")
+    resource_monitor.check()
+    with tracing.span("bgm_mix"):
+        for (p, path), video_tmp in zip(outputs, video_tmps):
+            print(f"Writing to {path}...")
+            mux_narration_and_bgm(video_tmp, narration_tmp, path, p.get("audio_bitrate") if renditions else None)
+
+    if not keep_intermediates:
+        for tmp in video_tmps + [narration_tmp]:
+            if os.path.exists(tmp):
+                os.remove(tmp)
     print("Video Generation Complete.")
 
 if __name__ == "__main__":
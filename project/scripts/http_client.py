@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- Shared HTTP Client ---
+# One place for connection pooling, retries and timeouts of every network-facing
+# script (generate_audio, fetch_images, fetch_news, fetch_transcript):
+#
+#   http_client.session("voicevox").post(url, ...)
+#
+# Sessions are created once per name and reused by all threads, so repeated calls
+# to the same host keep their connection alive instead of paying a new handshake.
+# Settings come from config["http"], optionally overridden per name in
+# config["http"]["profiles"][name].
+#
+# HttpCache + cached_get() add an on-disk response cache that honours
+# Cache-Control max-age, ETag and Last-Modified (used by fetch_news).
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+HTTP_CONF = config.get("http", {})
+DEFAULTS = {
+    "pool_connections": 16, # hosts kept in the pool
+    "pool_maxsize": 8, # connections per host
+    "retries": 3,
+    "backoff": 0.5, # sleeps 0.5s, 1s, 2s between retries
+    "retry_statuses": [429, 500, 502, 503, 504],
+    "connect_timeout": 5,
+    "read_timeout": 30,
+}
+HTTP_CACHE_DIR = os.path.join(current_dir, config["paths"].get("cache_dir", "../cache"), "http")
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def settings(name="default", **overrides):
+    conf = dict(DEFAULTS)
+    conf.update({k: v for k, v in HTTP_CONF.items() if k != "profiles"})
+    conf.update(HTTP_CONF.get("profiles", {}).get(name, {}))
+    conf.update(overrides)
+    return conf
+
+
+class TimeoutSession(requests.Session):
+    """Session with a default (connect, read) timeout."""
+    def __init__(self, timeout):
+        super().__init__()
+        self.default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.default_timeout)
+        return super().request(method, url, **kwargs)
+
+
+def make_session(name="default", **overrides):
+    """Builds a new pooled session with retries (use session() to share one)."""
+    conf = settings(name, **overrides)
+    retry = Retry(
+        total=conf["retries"],
+        backoff_factor=conf["backoff"],
+        status_forcelist=conf["retry_statuses"],
+        allowed_methods=None, # VOICEVOX POSTs are idempotent too
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=conf["pool_connections"], pool_maxsize=conf["pool_maxsize"], max_retries=retry)
+    session = TimeoutSession((conf["connect_timeout"], conf["read_timeout"]))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if conf.get("headers"):
+        session.headers.update(conf["headers"])
+    return session
+
+
+def session(name="default"):
+    """The shared session for `name` (created on first use)."""
+    with _lock:
+        s = _sessions.get(name)
+        if s is None:
+            s = _sessions[name] = make_session(name)
+        return s
+
+
+def close_all():
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache: one file per URL, a JSON header line followed by the body.
+    Fresh entries (Cache-Control max-age) are served without a request; stale ones
+    are revalidated with If-None-Match / If-Modified-Since (a 304 reuses the body).
+    Responses marked Cache-Control: no-store are never written to disk.
+    """
+    def __init__(self, root=HTTP_CACHE_DIR):
+        self.root = root
+        if not os.path.exists(root):
+            os.makedirs(root)
+
+    def path_for(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, key[:2], key + ".http")
+
+    def load(self, url):
+        path = self.path_for(url)
+        try:
+            with open(path, 'rb') as f:
+                header, body = f.read().split(b"\n", 1)
+            meta = json.loads(header)
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def _write(self, url, meta, body):
+        path = self.path_for(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(json.dumps(meta).encode("utf-8") + b"\n" + body)
+        os.replace(tmp, path)
+
+    def remove(self, url):
+        try:
+            os.remove(self.path_for(url))
+        except FileNotFoundError:
+            pass
+
+    def save(self, url, response):
+        cache_control = response.headers.get("Cache-Control", "")
+        if "no-store" in cache_control.lower():
+            # Must not be kept, not even an older copy to revalidate against
+            self.remove(url)
+            return
+        match = re.search(r'max-age=(\d+)', cache_control)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "max_age": int(match.group(1)) if match else 0,
+        }
+        self._write(url, meta, response.content)
+
+    def refresh(self, url, meta, body):
+        """Re-stamps an entry after a 304."""
+        meta["fetched_at"] = time.time()
+        self._write(url, meta, body)
+
+
+def cached_get(url, cache, http=None, send=None):
+    """
+    GET through an HttpCache. Returns (body bytes, "fresh" | "not_modified" | "downloaded").
+    `send(url, headers)` may wrap the request (e.g. per-host politeness); it defaults
+    to http.get on the shared session.
+    """
+    meta, body = cache.load(url)
+    if meta and time.time() - meta["fetched_at"] < meta.get("max_age", 0):
+        return body, "fresh"
+
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    http = http or session()
+    response = send(url, headers) if send else http.get(url, headers=headers)
+    if response.status_code == 304 and body is not None:
+        cache.refresh(url, meta, body)
+        return body, "not_modified"
+    response.raise_for_status()
+    cache_control = response.headers.get("Cache-Control", "")
+    if response.headers.get("ETag") or response.headers.get("Last-Modified") or "max-age" in cache_control \
+            or "no-store" in cache_control.lower(): # save() drops the entry for no-store
+        cache.save(url, response)
+    return response.content, "downloaded"
@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import numpy as np
+from PIL import Image
+
+# --- Image Quality Score ---
+# Scores a downloaded candidate for the context image slot (0..1, higher is better):
+#   resolution  pixels relative to the on-screen box (capped at 1)
+#   aspect      closeness of the aspect ratio to the box (it is scaled to fit, so a
+#               mismatch means letterboxing or a tiny image)
+#   sharpness   variance of the Laplacian on a downscaled grayscale copy
+#   jpeg        quality estimated from the JPEG quantization tables (PNG/WebP count as 1)
+# fetch_images downloads several candidates at once and keeps the best scoring one.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+SCREEN_W, SCREEN_H = config["video"]["resolution"]
+IMG_CONF = config["video"]["context_image"]
+BOX_W = int(SCREEN_W * IMG_CONF["width_ratio"])
+BOX_H = int(SCREEN_H * IMG_CONF["height_ratio"])
+
+WEIGHTS = {"resolution": 0.3, "aspect": 0.3, "sharpness": 0.25, "jpeg": 0.15}
+ANALYSIS_WIDTH = 512 # sharpness is measured at a fixed scale so sizes compare fairly
+SHARPNESS_FULL = 400.0 # Laplacian variance treated as "fully sharp"
+
+# libjpeg's standard luminance table (quality 50)
+STD_LUMA_TABLE = np.array([
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99], dtype=np.float64)
+
+
+def estimate_jpeg_quality(img):
+    """Estimates the libjpeg quality setting (1-100) from the luminance table. None if not a JPEG."""
+    tables = getattr(img, "quantization", None)
+    if not tables or 0 not in tables:
+        return None
+    luma = np.asarray(tables[0], dtype=np.float64)
+    # Tables are scaled by S/100 with S = 5000/q (q < 50) or 200 - 2q (q >= 50)
+    scale = luma.sum() / STD_LUMA_TABLE.sum() * 100.0
+    if scale <= 100.0:
+        quality = (200.0 - scale) / 2.0
+    else:
+        quality = 5000.0 / scale
+    return float(np.clip(quality, 1, 100))
+
+
+def laplacian_variance(gray):
+    """Variance of the 4-neighbour Laplacian of a 2D float array."""
+    lap = (gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1]) - 4.0 * gray[1:-1, 1:-1]
+    return float(lap.var())
+
+
+def score_image(path, box=(BOX_W, BOX_H)):
+    """Returns (score, details) for an image file."""
+    box_w, box_h = box
+    with Image.open(path) as img:
+        w, h = img.size
+        quality = estimate_jpeg_quality(img)
+        img.draft("L", (ANALYSIS_WIDTH, ANALYSIS_WIDTH)) # fast JPEG downscale on decode
+        gray = img.convert("L")
+        if gray.width > ANALYSIS_WIDTH:
+            gray = gray.resize((ANALYSIS_WIDTH, max(3, round(gray.height * ANALYSIS_WIDTH / gray.width))))
+        gray = np.asarray(gray, dtype=np.float64)
+
+    details = {
+        "width": w,
+        "height": h,
+        "resolution": min(1.0, (w * h) / float(box_w * box_h)),
+        "aspect": float(np.exp(-abs(np.log((w / h) / (box_w / box_h))))),
+        "sharpness": min(1.0, laplacian_variance(gray) / SHARPNESS_FULL) if min(gray.shape) >= 3 else 0.0,
+        "jpeg": 1.0 if quality is None else quality / 100.0,
+    }
+    score = sum(WEIGHTS[k] * details[k] for k in WEIGHTS)
+    return score, details
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 image_quality.py <image> [<image> ...]")
+        sys.exit(1)
+    print(f"Context image box: {BOX_W}x{BOX_H}")
+    for p in sys.argv[1:]:
+        s, d = score_image(p)
+        print(f"{s:.3f}  {d['width']}x{d['height']}  res={d['resolution']:.2f} aspect={d['aspect']:.2f} "
+              f"sharp={d['sharpness']:.2f} jpeg={d['jpeg']:.2f}  {p}")
@@ -0,0 +1,130 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+# --- CLI Startup Budget ---
+# main.py imports heavy modules (MoviePy, NumPy, PIL, the search client) only in
+# the actions that need them. This check keeps it that way: every action runs in
+# a fresh interpreter under `python -X importtime` against a scratch projects
+# folder, and the time spent importing (beyond a bare interpreter's own startup)
+# must stay within the action's budget.
+#
+#   python3 import_budget.py            # all actions, exit code 1 if one is over
+#   python3 import_budget.py new status --scale 2
+#
+# `run`, `run-batch`, `watch` and `preview` render, so they are measured as
+# the imports of their stages rather than by running them.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+PROJECT = "budget_check"
+
+# action -> (how to run it, budget in ms)
+ACTIONS = {
+    "new": ({"argv": ["new", PROJECT]}, 60),
+    "delete": ({"argv": ["delete", PROJECT], "stdin": "n\n"}, 60),
+    "status": ({"argv": ["status", PROJECT]}, 250),
+    "status-stream": ({"argv": ["status", PROJECT, "--stream"]}, 250),
+    "gc": ({"argv": ["gc", "--dry-run"]}, 400),
+    "run-batch": ({"modules": ["pipeline", "checkpoints", "fetch_images", "panels"]}, 600),
+    "run": ({"modules": ["checkpoints", "script_compiler", "fetch_images", "generate_video"]}, 2000),
+    "watch": ({"modules": ["preview"]}, 2000),
+    "preview": ({"modules": ["preview"]}, 2000),
+}
+
+WRAPPER = """
+import sys
+sys.path.insert(0, {scripts!r})
+import main
+main.PROJECTS_ROOT = {root!r}
+sys.argv = ["main.py"] + {argv!r}
+main.main()
+"""
+
+
+def top_level_imports(stderr):
+    """{module: cumulative microseconds} of the top-level entries of -X importtime output."""
+    out = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if len(name) - len(name.lstrip()) == 1: # deeper imports are indented further
+            out[name.strip()] = int(cumulative)
+    return out
+
+
+def importtime(code, stdin=None):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=current_dir,
+                            input=stdin, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed:\n{result.stderr[-2000:]}")
+    return top_level_imports(result.stderr)
+
+
+def measure(spec, root, baseline):
+    """(import ms beyond a bare interpreter, {module: ms} of the heaviest imports)."""
+    if "modules" in spec:
+        code = f"import sys\nsys.path.insert(0, {current_dir!r})\nimport main\n" + \
+               "".join(f"import {m}\n" for m in spec["modules"])
+    else:
+        code = WRAPPER.format(scripts=current_dir, root=root, argv=spec["argv"])
+    imports = {m: us for m, us in importtime(code, spec.get("stdin")).items() if m not in baseline}
+    return sum(imports.values()) / 1000, {m: us / 1000 for m, us in imports.items()}
+
+
+def make_project(root):
+    """A one-line project with parse and overlays recorded, so `status` checks it like a real project."""
+    os.makedirs(os.path.join(root, PROJECT, "script"))
+    with open(os.path.join(root, PROJECT, "script", "script.md"), "w", encoding="utf-8") as f:
+        f.write("# Budget\n\n[IMG: Placeholder]\nずんだもん, テストなのだ。\n")
+    code = (f"import sys\nsys.path.insert(0, {current_dir!r})\nimport main, checkpoints\n"
+            f"main.PROJECTS_ROOT = {root!r}\n"
+            f"stages = checkpoints.ProjectStages(main.resolve_project({PROJECT!r}))\n"
+            f"stages.segments\nstages.record('parse')\nstages.record('overlays')\n")
+    subprocess.run([sys.executable, "-c", code], cwd=current_dir, check=True, capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check main.py's per-action import time against budgets")
+    parser.add_argument("actions", nargs="*", help=f"Actions to check (default: all of {', '.join(ACTIONS)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per action, the fastest counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget (slow machines)")
+    args = parser.parse_args()
+    unknown = [a for a in args.actions if a not in ACTIONS]
+    if unknown:
+        parser.error(f"unknown action: {', '.join(unknown)}")
+
+    baseline = set(importtime("pass"))
+    root = tempfile.mkdtemp(prefix="import_budget_")
+    failed = []
+    try:
+        for action in args.actions or list(ACTIONS):
+            spec, budget = ACTIONS[action]
+            budget *= args.scale
+            runs = []
+            for _ in range(max(1, args.repeat)):
+                shutil.rmtree(os.path.join(root, PROJECT), ignore_errors=True)
+                if action.startswith("status") or action == "delete":
+                    make_project(root)
+                runs.append(measure(spec, root, baseline))
+            ms, modules = min(runs, key=lambda r: r[0])
+            ok = ms <= budget
+            heaviest = ", ".join(f"{m} {t:.0f}ms" for m, t in sorted(modules.items(), key=lambda kv: -kv[1])[:3])
+            print(f"{action:<13} {ms:>7.0f}ms  budget {budget:>5.0f}ms  {'OK' if ok else 'OVER'}  ({heaviest})")
+            if not ok:
+                failed.append(action)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if failed:
+        print(f"Over budget: {', '.join(failed)}")
+        sys.exit(1)
+    print("All actions within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ import json
 sys.path.append(os.getcwd())
 
 # Import the module to test
-from generate_video import create_panel_image, create_text_image, apply_kinsoku, SCREEN_SIZE
+from panels import create_panel_image, create_text_image, apply_kinsoku, SCREEN_SIZE
 from PIL import Image
 
 def test_visuals():
@@ -0,0 +1,142 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import generate_audio
+import script_compiler
+import voicevox_stub
+
+# --- TTS Load Test ---
+# Drives generate_audio.generate_audio_file against the offline VOICEVOX stub
+# (voicevox_stub.py) at several concurrency levels and reports throughput,
+# latency percentiles and how many HTTP attempts each finished file needed.
+# No network access and no real VOICEVOX engine required.
+#
+# Usage: python3 loadtest_tts.py [--requests 60] [--concurrency 1,2,4,8]
+#                                [--latency-ms 80] [--jitter-ms 40] [--failure-rate 0.05]
+#                                [--script path/to/script.md] [--json results.json]
+
+SAMPLE_TEXTS = [
+    "視聴者諸君、待たせたな。",
+    "速報です。内閣支持率が59.9%に達しました。",
+    "それって要するに、日本にとって得ってことなのだ？",
+    "一見すると、そう心配するのは当然ですよね。ですが、それこそが突破口なんだ。",
+    "GDPとAPECの話をしよう。",
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def load_texts(script_path):
+    if not script_path:
+        return SAMPLE_TEXTS
+    segs = script_compiler.compile_script(script_path)
+    texts = [(s["audio_text"], s["character"]) for s in segs if s["type"] == "dialogue"]
+    return texts or SAMPLE_TEXTS
+
+
+def run_level(base_url, texts, n_requests, concurrency, out_dir):
+    """Runs n_requests TTS calls with `concurrency` workers. Returns a result dict."""
+    requests.post(f"{base_url}/__reset")
+
+    def one(i):
+        item = texts[i % len(texts)]
+        text, character = item if isinstance(item, tuple) else (item, "青山龍星")
+        start = time.perf_counter()
+        path = generate_audio.generate_audio_file(text, character, i, output_dir=out_dir)
+        return time.perf_counter() - start, path is not None
+
+    # generate_audio is chatty; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(n_requests)))
+        wall = time.perf_counter() - wall_start
+
+    stats = requests.get(f"{base_url}/__stats").json()
+    latencies = [lat for lat, _ in results]
+    ok = sum(1 for _, success in results if success)
+    attempts = stats.get("audio_query", 0) + stats.get("synthesis", 0)
+
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "succeeded": ok,
+        "failed": n_requests - ok,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(ok / wall, 2) if wall > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else 0.0,
+        "http_attempts": attempts,
+        "injected_failures": stats.get("failed", 0),
+        # 2 calls (audio_query + synthesis) per file when nothing is retried
+        "attempts_per_success": round(attempts / ok, 2) if ok else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS load test against the offline VOICEVOX stub")
+    parser.add_argument("--requests", type=int, default=60, help="TTS calls per concurrency level")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma separated worker counts")
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=40)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--script", help="Use dialogue lines from this script.md instead of sample texts")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    server, base_url = voicevox_stub.start_in_thread(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate, seed=args.seed
+    )
+    generate_audio.BASE_URL = base_url
+    print(f"VOICEVOX stub at {base_url} (latency {args.latency_ms}ms +{args.jitter_ms}ms, failure rate {args.failure_rate})")
+
+    texts = load_texts(args.script)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    results = []
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for level in levels:
+                res = run_level(base_url, texts, args.requests, level, tmp)
+                results.append(res)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print()
+    print(f"{'conc':>4} {'ok':>5} {'fail':>5} {'rps':>7} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'att/ok':>7}")
+    for r in results:
+        print(f"{r['concurrency']:>4} {r['succeeded']:>5} {r['failed']:>5} {r['throughput_rps']:>7} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {str(r['attempts_per_success']):>7}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": vars(args),
+                "results": results
+            }, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
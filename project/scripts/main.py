@@ -4,19 +4,15 @@ import argparse
 import subprocess
 import re
 import json
-import generate_video
-import fetch_images
-
-# Load Config
-# Load Config
-current_dir = os.path.dirname(os.path.abspath(__file__))
-CONFIG_PATH = os.path.join(current_dir, "../config.json")
-try:
-    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-        config = json.load(f)
-except FileNotFoundError:
-    print("Config not found.")
-    exit(1)
+import time
+import tracing
+
+# --- Startup ---
+# Only the standard library and tracing are imported here. Each action imports what it needs
+# (generate_video pulls in MoviePy, NumPy and PIL; fetch_images the search
+# client) and those modules read config.json themselves, so `new`, `delete`
+# and `status` start without any of it. import_budget.py checks each action's
+# startup time against a budget.
 
 # Robust Path Finding
 # main.py is in .../8分自動化/project/scripts/main.py
@@ -54,12 +50,35 @@ def create_project(project_name):
     print(f"Project '{project_name}' ready.")
     return dirs
 
-def run_project(project_name):
-    """Runs the full pipeline for a specific project."""
+def create_projects_from_urls(urls, prefix=None, provider=None):
+    """
+    Bulk 'new': fetches every transcript (concurrently, cached) and creates one
+    project per transcript, named <prefix>_<video_id> (or just <video_id>).
+    Returns the created project names.
+    """
+    import fetch_transcript
+    results = fetch_transcript.fetch_transcripts(urls, provider=provider)
+    created = []
+    for r in results:
+        if r["error"]:
+            continue
+        name = f"{prefix}_{r['video_id']}" if prefix else r["video_id"]
+        dirs = create_project(name)
+        fetch_transcript.write_transcript(r["text"], os.path.join(dirs["script"], "source_transcript.txt"))
+        created.append(name)
+    print(f"Created {len(created)} projects from {len(urls)} URLs.")
+    return created
+
+def resolve_project(project_name, render_profile=None):
+    """
+    Paths of an existing project (output/images/audio folders are created):
+    {"name", "script", "images", "audio", "output", "video"}, or None.
+    With a render profile other than the default the video is <name>_video_<profile>.mp4.
+    """
     base_dir = os.path.join(PROJECTS_ROOT, project_name)
     if not os.path.exists(base_dir):
         print(f"Project {project_name} does not exist.")
-        return
+        return None
 
     script_dir = os.path.join(base_dir, "script")
     output_dir = os.path.join(base_dir, "output")
@@ -72,52 +91,242 @@ def run_project(project_name):
     
     script_files = []
     if os.path.exists(script_dir):
-        script_files = [f for f in os.listdir(script_dir) if f.endswith(".md")]
+        script_files = sorted(f for f in os.listdir(script_dir) if f.endswith(".md"))
     
     if not script_files:
-        print("No markdown script found in script folder.")
-        return
+        print(f"No markdown script found in script folder of {project_name}.")
+        return None
     script_path = os.path.join(script_dir, script_files[0]) # Use first found
+
+    if render_profile:
+        import checkpoints
+        render_profile = checkpoints.output_profile(render_profile)
+    video_name = f"{project_name}_video_{render_profile}.mp4" if render_profile else f"{project_name}_video.mp4"
+    return {"name": project_name, "script": script_path, "images": image_dir, "audio": audio_dir,
+            "output": output_dir, "video": os.path.join(output_dir, video_name)}
+
+def run_project(project_name, profile=False, monitor=None, stream=None, force=False, render_profile=None):
+    """
+    Runs the full pipeline for a specific project.
+    Stages whose inputs and outputs are unchanged since the last run are skipped
+    (see checkpoints.py); `force` runs everything again. `render_profile` names
+    the output settings (config.json -> video.profiles, default video.profile).
+    """
+    import checkpoints
+    project = resolve_project(project_name, render_profile)
+    if project is None:
+        return
+    import script_compiler
+    import fetch_images
+    import generate_video
+    script_path = project["script"]
+    output_dir = project["output"]
+    image_dir = project["images"]
+    audio_dir = project["audio"]
     
     print(f"Using Script: {script_path}")
+    stages = checkpoints.ProjectStages(project, stream=stream, profile=render_profile)
     
-    # 2. Image Fetch
-    print("Fetching images...")
+    if profile:
+        tracing.reset()
+        tracing.enable()
+
     try:
-        fetch_images.fetch_images_for_script(script_path=script_path, image_dir=image_dir)
-    except Exception as e:
-        print(f"Image fetch warning: {e}")
-    
-    # 3. Video Generation
-    output_video_path = os.path.join(output_dir, f"{project_name}_video.mp4")
-    
-    # Call generate_video directly
-    generate_video.generate_video(
-        script_path=script_path,
-        output_path=output_video_path,
-        image_dir=image_dir,
-        audio_dir=audio_dir
-    )
+        # 1. Parse
+        if stages.needed("parse", force):
+            start = time.monotonic()
+            with tracing.span("parse"):
+                script_compiler.compile_script(script_path)
+            stages.record("parse", time.monotonic() - start)
+
+        # 2. Image Fetch
+        if stages.needed("images", force):
+            print("Fetching images...")
+            start = time.monotonic()
+            try:
+                with tracing.span("images"):
+                    missing = fetch_images.fetch_images_for_script(script_path=script_path, image_dir=image_dir)
+                if missing:
+                    # Not recorded, so the next run tries these keywords again
+                    print(f"Image fetch warning: no image for {', '.join(missing)}")
+                else:
+                    stages.record("images", time.monotonic() - start)
+            except Exception as e:
+                print(f"Image fetch warning: {e}")
+
+        # 3. TTS (only changed segments)
+        if stages.needed("tts", force):
+            start = time.monotonic()
+            with tracing.span("tts_all"):
+                wav_paths = generate_video.synthesize_audio(script_path, audio_dir, reuse=None if force else stages.tts_reuse())
+            stages.record_tts(wav_paths, time.monotonic() - start)
+        else:
+            wav_paths = stages.tts_wavs()
+
+        # 4. Overlays
+        if stages.needed("overlays", force):
+            start = time.monotonic()
+            with tracing.span("overlays"):
+                generate_video.prerender_overlays(script_path)
+            stages.record("overlays", time.monotonic() - start)
+
+        # 5. Video Generation (the streaming renderer keeps its intermediates for a re-mux)
+        output_video_path = project["video"]
+        if stages.needed("render", force):
+            start = time.monotonic()
+            with tracing.span("generate_video"):
+                generate_video.generate_video(
+                    script_path=script_path,
+                    output_path=output_video_path,
+                    image_dir=image_dir,
+                    audio_dir=audio_dir,
+                    monitor=monitor,
+                    stream=stages.stream,
+                    wav_paths=wav_paths,
+                    keep_intermediates=stages.stream,
+                    profile=stages.profile,
+                    renditions=stages.renditions
+                )
+            stages.record("render", time.monotonic() - start)
+            if stages.stream:
+                stages.record("mux")
+        elif stages.needed("mux", force):
+            # 6. Only the BGM changed: mux again
+            start = time.monotonic()
+            with tracing.span("bgm_mix"):
+                generate_video.remux(output_video_path, stages.renditions)
+            stages.record("mux", time.monotonic() - start)
+        print(f"Video: {output_video_path}")
+    finally:
+        if profile:
+            # Export even if the render failed, that's when it's needed most
+            trace_path = tracing.export_chrome_trace(os.path.join(output_dir, f"{project_name}_trace.json"))
+            tracing.disable()
+            print("\n--- Profile ---")
+            print(tracing.format_summary())
+            print(f"Chrome trace written to {trace_path} (open in chrome://tracing or ui.perfetto.dev)")
+
+def run_batch(project_names, stream=None, force=False, render_profile=None):
+    """Runs many projects with overlapping stages (see pipeline.py). All projects if none are named."""
+    import pipeline
+    projects = [p for p in (resolve_project(name, render_profile) for name in (project_names or list_projects())) if p]
+    if not projects:
+        print("No projects to run.")
+        return []
+    return pipeline.run_batch(projects, stream=stream, force=force, profile=render_profile)
+
+def watch_project(project_name, once=False, render_profile=None):
+    """Keeps a low-resolution preview up to date while the script is edited (see preview.py)."""
+    project = resolve_project(project_name)
+    if project is None:
+        return
+    import preview
+    preview.watch_project(project, once=once, profile=render_profile)
+
+def preview_project(project_name, segment=None, time_range=None, still=False, output=None, render_profile=None):
+    """Renders one segment or a time range as a clip or PNG (see preview.py)."""
+    project = resolve_project(project_name)
+    if project is None:
+        return
+    import preview
+    try:
+        return preview.preview_project(project, segment=segment, time_range=time_range, still=still, output=output,
+                                       profile=render_profile)
+    except ValueError as e:
+        print(f"Error: {e}")
+
+def project_status(project_names, stream=None, render_profile=None):
+    """Prints which stages of each project are up to date (all projects if none are named)."""
+    import checkpoints
+    projects = [p for p in (resolve_project(name, render_profile) for name in (project_names or list_projects())) if p]
+    checkpoints.print_status(projects, stream=stream, profile=render_profile)
+
+def list_projects():
+    if not os.path.isdir(PROJECTS_ROOT):
+        return []
+    return sorted(d for d in os.listdir(PROJECTS_ROOT) if os.path.isdir(os.path.join(PROJECTS_ROOT, d)))
 
 def main():
     parser = argparse.ArgumentParser(description="Automated Video Generation - Project Manager")
-    parser.add_argument("action", choices=["new", "run", "delete"], help="Action: 'new', 'run', or 'delete' project")
-    parser.add_argument("project_name", help="Name of the project")
-    parser.add_argument("--url", help="YouTube URL to source content from (for 'new' action)", default=None)
+    parser.add_argument("action", choices=["new", "run", "run-batch", "watch", "preview", "status", "delete", "gc"],
+                        help="Action: 'new', 'run', or 'delete' project, 'run-batch' to run many projects at once, "
+                             "'watch' to keep a preview up to date while editing, 'preview' to render one segment or range, "
+                             "'status' to show out-of-date stages, 'gc' to trim caches")
+    parser.add_argument("project_name", nargs="*", help="Name of the project ('run-batch', 'status': several, default all)")
+    parser.add_argument("--url", action="append", help="YouTube URL to source content from (for 'new' action, repeatable)", default=None)
+    parser.add_argument("--url-file", help="File with one YouTube URL per line: one project per video (for 'new' action)")
+    parser.add_argument("--fixtures", help="Read transcripts from this folder instead of YouTube (for 'new' action)")
+    parser.add_argument("--profile", action="store_true", help="Record per-stage timing spans (for 'run' action)")
+    parser.add_argument("--stream", action="store_true", default=None, help="Constant-memory streaming render (for 'run' action)")
+    parser.add_argument("--monitor", action="store_true", default=None, help="Sample RSS/fds/ffmpeg processes and enforce resource budgets (for 'run' action)")
+    parser.add_argument("--force", action="store_true", help="Run every stage, even if up to date (for 'run' and 'run-batch')")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed (for 'gc' action)")
+    parser.add_argument("--once", action="store_true", help="Update the preview once and exit (for 'watch' action)")
+    parser.add_argument("--segment", type=int, help="Segment number to render, from 1 (for 'preview' action)")
+    parser.add_argument("--range", dest="time_range", help="Time range to render, e.g. 01:20-01:45 (for 'preview' action)")
+    parser.add_argument("--still", action="store_true", help="Write a PNG frame instead of a clip (for 'preview' action)")
+    parser.add_argument("-o", "--output", help="Output file (for 'preview' action)")
+    parser.add_argument("--render-profile", help="Render profile from config.json video.profiles, e.g. draft or final "
+                                                 "(for 'run', 'run-batch', 'watch', 'preview', 'status')")
 
     args = parser.parse_args()
+    project_names = args.project_name
+    if args.action not in ("run-batch", "status") and len(project_names) > 1:
+        parser.error(f"'{args.action}' takes one project name")
+    args.project_name = project_names[0] if project_names else None
+    bulk = args.action == "new" and (args.url_file or len(args.url or []) > 1)
+    if args.action not in ("gc", "run-batch", "status") and not args.project_name and not bulk:
+        parser.error(f"'{args.action}' needs a project name")
+    if args.action == "preview" and (args.segment is None) == (args.time_range is None):
+        parser.error("'preview' needs either --segment or --range")
+    if args.render_profile:
+        import checkpoints
+        if args.render_profile not in checkpoints.render_profiles():
+            parser.error(f"unknown render profile '{args.render_profile}' "
+                         f"(known: {', '.join(checkpoints.render_profiles())})")
     
     if args.action == "new":
+        provider = None
+        if args.fixtures:
+            import fetch_transcript
+            provider = fetch_transcript.FixtureProvider(args.fixtures)
+        if bulk:
+            import fetch_transcript
+            urls = list(args.url or [])
+            if args.url_file:
+                urls += fetch_transcript.read_url_list(args.url_file)
+            create_projects_from_urls(urls, prefix=args.project_name, provider=provider)
+            return
         dirs = create_project(args.project_name)
         if args.url:
             import fetch_transcript
-            print(f"Fetching transcript from {args.url}...")
+            print(f"Fetching transcript from {args.url[0]}...")
             transcript_path = os.path.join(dirs['script'], "source_transcript.txt")
-            fetch_transcript.fetch_transcript(args.url, transcript_path)
+            fetch_transcript.fetch_transcript(args.url[0], transcript_path, provider)
     elif args.action == "run":
-        run_project(args.project_name)
+        run_project(args.project_name, profile=args.profile, monitor=args.monitor, stream=args.stream, force=args.force,
+                    render_profile=args.render_profile)
+    elif args.action == "run-batch":
+        run_batch(project_names, stream=args.stream, force=args.force, render_profile=args.render_profile)
+    elif args.action == "watch":
+        watch_project(args.project_name, once=args.once, render_profile=args.render_profile)
+    elif args.action == "preview":
+        time_range = None
+        if args.time_range:
+            import preview
+            try:
+                time_range = preview.parse_range(args.time_range)
+            except ValueError as e:
+                parser.error(str(e))
+        preview_project(args.project_name, segment=args.segment, time_range=time_range, still=args.still, output=args.output,
+                        render_profile=args.render_profile)
+    elif args.action == "status":
+        project_status(project_names, stream=args.stream, render_profile=args.render_profile)
     elif args.action == "delete":
         delete_project(args.project_name)
+    elif args.action == "gc":
+        import cache_gc
+        cache_gc.run_gc(PROJECTS_ROOT, dry_run=args.dry_run)
 
 def delete_project(project_name):
     """Deletes the entire project directory."""
@@ -0,0 +1,378 @@
+import os
+import json
+import hashlib
+import inspect
+import textwrap
+import threading
+import numpy as np
+from PIL import Image, ImageFont, ImageDraw
+import script_compiler
+import cache_gc
+
+# --- Subtitle Panels ---
+# Draws the subtitle panels and narrator captions that generate_video lays over
+# each segment, and caches them. Only PIL and NumPy: `main.py status` and the
+# run-batch overlay workers use this module without loading MoviePy.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+def resolve_path(path):
+    return os.path.abspath(os.path.join(current_dir, path))
+
+FONT_PATH = resolve_path(config["paths"]["font_path"])
+SCREEN_SIZE = tuple(config["video"]["resolution"])
+# Every pixel value of the layout (font sizes, margins, positions) is written for this size
+DESIGN_SIZE = (1920, 1080)
+
+# Subtitle Settings
+SUB_CONF = config["video"]["subtitle"]
+
+# Character Colors (Vivid & Distinct)
+CHARACTER_COLORS = {
+    "青山龍星": "white",
+    "ずんだもん": "#39c263",   # Zunda Green
+    "四国めたん": "#ff3399",   # Metan Pink
+    "春日部つむぎ": "#ffcc00", # Tsumugi Yellow
+    "雨晴はう": "#66ccff",     # Hau Blue
+    "冥鳴ひまり": "#9966ff",   # Himari Purple
+    "玄野武宏": "#ff3333",     # Kurono Red
+    "麒ヶ島宗麟": "#ff9933",   # Sorin Orange
+    "default": "#cccccc"       # Default Grey
+}
+
+def create_text_image(text, size=SCREEN_SIZE, color='white'):
+    """Creates a text overlay image for Narrator (Aoyama) with dynamic scaling."""
+    img = Image.new('RGBA', size, (0, 0, 0, 0))
+    
+    # Initial Font Config
+    base_fontsize = SUB_CONF["font_size"]
+    fontsize = base_fontsize
+    min_fontsize = 50
+    
+    # Safe Area
+    max_height = 600
+    
+    # Iterative Sizing
+    while fontsize >= min_fontsize:
+        try:
+            font = ImageFont.truetype(FONT_PATH, fontsize)
+        except:
+            font = ImageFont.load_default()
+
+        # Padding / Width
+        padding_x = 50
+        max_text_width = size[0] - (padding_x * 2)
+        avg_char_width = fontsize * 1.0 
+        chars_per_line = int(max_text_width / avg_char_width)
+        if chars_per_line < 1: chars_per_line = 1
+        
+        # Basic Wrap
+        raw_lines = textwrap.wrap(text, width=chars_per_line)
+        
+        # Kinsoku (Bracket Fix) logic
+        refined_lines = []
+        if raw_lines:
+            refined_lines.append(raw_lines[0])
+            for i in range(1, len(raw_lines)):
+                line = raw_lines[i]
+                prev = refined_lines[-1]
+                if line.startswith("」") or line.startswith("。") or line.startswith("、"):
+                     refined_lines[-1] = prev + line[0]
+                     refined_lines.append(line[1:]) 
+                elif prev.endswith("「"):
+                     refined_lines[-1] = prev[:-1]
+                     refined_lines.append("「" + line)
+                else:
+                     refined_lines.append(line)
+            refined_lines = [l for l in refined_lines if l]
+            lines = refined_lines
+        else:
+            lines = []
+
+        # Calculate Height
+        line_height = fontsize * 1.5
+        total_text_height = len(lines) * line_height
+        
+        if total_text_height <= max_height:
+            break
+            
+        fontsize -= 5
+    
+    # Draw Background Bar ("Zabuton")
+    bottom_margin = SUB_CONF["bottom_margin"]
+    start_y = size[1] - bottom_margin - total_text_height
+    
+    bar_height = total_text_height + 60 
+    bar_y1 = start_y - 30
+    bar_y2 = bar_y1 + bar_height
+    
+    overlay = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw_overlay = ImageDraw.Draw(overlay)
+    
+    bg_col = tuple(SUB_CONF["background_color"])
+    draw_overlay.rectangle([0, bar_y1, size[0], bar_y2], fill=bg_col)
+    img = Image.alpha_composite(img, overlay)
+    draw = ImageDraw.Draw(img)
+
+    # Styling
+    stroke_color = tuple(SUB_CONF["stroke_color"]) if isinstance(SUB_CONF["stroke_color"], list) else SUB_CONF["stroke_color"]
+    stroke_width = SUB_CONF["stroke_width"]
+    
+    current_y = start_y
+    for line in lines:
+        # Centering
+        left, top, right, bottom = draw.textbbox((0, 0), line, font=font)
+        text_w = right - left
+        x = (size[0] - text_w) / 2
+        
+        if stroke_width > 0:
+            draw.text((x, current_y), line, font=font, fill=stroke_color, stroke_width=stroke_width, stroke_fill=stroke_color)
+        
+        draw.text((x, current_y), line, font=font, fill=color)
+        current_y += line_height
+        
+    return np.array(img)
+
+def apply_kinsoku(text, chars_per_line):
+    """Applies Japanese kinsoku shori (line breaking rules) robustly."""
+    # First, use textwrap to get rough lines
+    raw_lines = textwrap.wrap(text, width=chars_per_line)
+    if not raw_lines: return []
+    
+    refined_lines = [raw_lines[0]]
+    
+    # Prohibited at start of line
+    kinsoku_start = "」』）)}].,:;!?。、"
+    # Prohibited at end of line
+    kinsoku_end = "「『（({["
+    
+    for i in range(1, len(raw_lines)):
+        current_line = raw_lines[i]
+        prev_line = refined_lines[-1]
+        
+        # Check 1: Current line starts with prohibited char?
+        # If so, append that char to previous line
+        while current_line and current_line[0] in kinsoku_start:
+             refined_lines[-1] += current_line[0]
+             current_line = current_line[1:]
+        
+        # Check 2: Previous line ends with prohibited char?
+        # If so, move that char to current line (start)
+        # Note: We need to be careful not to infinite loop or empty the prev line too much
+        if refined_lines[-1] and refined_lines[-1][-1] in kinsoku_end:
+             char_to_move = refined_lines[-1][-1]
+             refined_lines[-1] = refined_lines[-1][:-1]
+             current_line = char_to_move + current_line
+             
+        if current_line:
+             refined_lines.append(current_line)
+             
+    return refined_lines
+
+def create_panel_image(text, character_name, char_color_hex, size=SCREEN_SIZE):
+    """Creates a panel style overlay with DYNAMIC font sizing to prevent overflow."""
+    img = Image.new('RGBA', size, (0, 0, 0, 0))
+    # We will draw the panel and text on every iteration or just once? 
+    # Better to calculate font size first, then draw.
+    
+    # 1. Panel Box Settings
+    panel_w = 1700  # Significantly Wider
+    panel_h = 650   # Significantly Taller
+    panel_x = (size[0] - panel_w) // 2
+    panel_y = (size[1] - panel_h) // 2
+    
+    # Border Color
+    try:
+        h = char_color_hex.lstrip('#')
+        border_rgb = tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
+    except:
+        # If color name "white", handle it
+        if char_color_hex.lower() == "white":
+             border_rgb = (255, 255, 255)
+        else:
+             border_rgb = (255, 105, 180) # Default Pink
+
+    # Custom Logic for Aoyama (Dark Panel, White Text, BOTTOM position)
+    if character_name == "青山龍星":
+        panel_bg_color = (30, 30, 30, 230) # Dark semitransparent
+        text_color = "white"
+        
+        # Position at BOTTOM to show images
+        # Similar to original create_text_image logic
+        bottom_margin = 50 # Hardcoded or readable from config if passed
+        panel_y = size[1] - panel_h - bottom_margin
+        
+    else:
+        # Others: Keep Center (Existing behavior)
+        panel_bg_color = (255, 255, 255, 255) # White Opaque
+        text_color = "black"
+        # Center Y
+        panel_y = (size[1] - panel_h) // 2
+
+
+    # 2. Dynamic Font Sizing Loop
+    font_size = 90 # Start slightly larger, reduce down
+    min_font_size = 40
+    
+    found_good_size = False
+    final_lines = []
+    final_font = None
+    
+    while font_size >= min_font_size:
+        try:
+            font = ImageFont.truetype(FONT_PATH, font_size)
+        except:
+            font = ImageFont.load_default()
+            
+        # Calc Chars per line (conservative padding)
+        # Internal width is panel_w - 60px padding
+        safe_width = panel_w - 60
+        avg_char_w = font_size # Rough estimate
+        chars_per_line = int(safe_width / avg_char_w)
+        
+        # Apply Kinsoku (which might extend lines)
+        lines = apply_kinsoku(text, chars_per_line)
+        
+        # Verify Width & Height
+        max_line_w = 0
+        draw_temp = ImageDraw.Draw(img)
+        for line in lines:
+             left, top, right, bottom = draw_temp.textbbox((0, 0), line, font=font)
+             max_line_w = max(max_line_w, right - left)
+             
+        line_h = font_size * 1.5
+        total_text_h = len(lines) * line_h
+        
+        # Check Fit
+        if max_line_w <= safe_width and total_text_h <= (panel_h - 40):
+            found_good_size = True
+            final_lines = lines
+            final_font = font
+            break
+            
+        font_size -= 5
+        
+    if not found_good_size:
+        # Fallback if text is absurdly long
+        print(f"Warning: Text too long for panel: {text[:20]}...")
+        final_lines = lines
+        final_font = font # Use smallest
+        
+    # 3. Draw Final
+    img_final = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img_final)
+    
+    # RE-CALCULATE Height/Position for Aoyama (Dynamic Fit)
+    # The loop ensured it FITS in max panel_h (650), but we don't want to USE all 650 if text is short.
+    if character_name == "青山龍星":
+        line_h_final = final_font.size * 1.5
+        total_text_h_final = len(final_lines) * line_h_final
+        # Add padding (top/bottom)
+        dynamic_h = int(total_text_h_final + 80) 
+        panel_h = max(200, dynamic_h) # Minimum 200px
+        
+        # Re-calc Y for bottom alignment
+        bottom_margin = 50
+        panel_y = size[1] - panel_h - bottom_margin
+        
+    # Draw Panel
+    border_width = 15
+    draw.rectangle([panel_x, panel_y, panel_x+panel_w, panel_y+panel_h], fill=panel_bg_color, outline=border_rgb, width=border_width)
+    
+    # Draw Text
+    line_h = final_font.size * 1.5
+    total_text_h = len(final_lines) * line_h
+    start_text_y = panel_y + (panel_h - total_text_h) / 2
+    
+    curr_y = start_text_y
+    for line in final_lines:
+        left, top, right, bottom = draw.textbbox((0, 0), line, font=final_font)
+        w = right - left
+        x = panel_x + (panel_w - w) / 2
+        draw.text((x, curr_y), line, font=final_font, fill=text_color)
+        curr_y += line_h
+        
+    return np.array(img_final)
+
+# --- Overlay Cache ---
+# A panel overlay depends only on its text, character, color and size, the font
+# and the drawing code, so each one is drawn once and kept as a PNG:
+#
+#   <cache_dir>/overlays/ab/abcdef....png
+#
+# The key includes a hash of the create_panel_image/apply_kinsoku source and the
+# font file, so editing the layout invalidates old overlays. run-batch draws a
+# script's overlays ahead of the render in worker processes (prerender_overlays).
+
+OVERLAY_CACHE_DIR = resolve_path(os.path.join(config["paths"].get("cache_dir", "../cache"), "overlays"))
+_overlay_code_hash = None
+
+def overlay_code_hash():
+    global _overlay_code_hash
+    if _overlay_code_hash is None:
+        source = inspect.getsource(create_panel_image) + inspect.getsource(apply_kinsoku)
+        try:
+            st = os.stat(FONT_PATH)
+            source += f"{FONT_PATH}:{st.st_size}:{st.st_mtime_ns}"
+        except OSError:
+            source += FONT_PATH
+        _overlay_code_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    return _overlay_code_hash
+
+def overlay_path(text, character_name, char_color_hex, size=SCREEN_SIZE):
+    payload = json.dumps([text, character_name, char_color_hex, list(size), overlay_code_hash()], ensure_ascii=False)
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return os.path.join(OVERLAY_CACHE_DIR, key[:2], key + ".png")
+
+def segment_overlay_args(seg):
+    """(text, character, color) of a segment's panel, or None for eyecatch segments."""
+    if seg.get("type") == "eyecatch":
+        return None
+    return seg['text'], seg['character'], CHARACTER_COLORS.get(seg['character'], CHARACTER_COLORS["default"])
+
+def panel_overlay(text, character_name, char_color_hex, size=SCREEN_SIZE):
+    """
+    create_panel_image through the overlay cache. Returns (RGBA array, cache hit).
+    Panels are drawn at DESIGN_SIZE; other sizes (render profiles) are that
+    panel scaled, so text wraps and sits the same at every resolution.
+    """
+    size = tuple(size)
+    path = overlay_path(text, character_name, char_color_hex, size)
+    try:
+        with Image.open(path) as img:
+            arr = np.array(img.convert("RGBA"))
+        cache_gc.touch(path)
+        return arr, True
+    except (OSError, ValueError):
+        pass
+
+    if size != DESIGN_SIZE:
+        design, _ = panel_overlay(text, character_name, char_color_hex, DESIGN_SIZE)
+        arr = np.array(Image.fromarray(design).resize(size, Image.LANCZOS))
+    else:
+        arr = create_panel_image(text, character_name, char_color_hex, size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    # Fast compression: these are re-read far more often than written
+    Image.fromarray(arr).save(tmp, format="PNG", compress_level=1)
+    os.replace(tmp, path)
+    return arr, False
+
+def prerender_overlays(script_path, start=0, stop=None):
+    """Draws the overlays of segments [start, stop) into the cache. Returns (drawn, cached)."""
+    segments = script_compiler.compile_script(script_path)
+    drawn = cached = 0
+    for seg in segments[start:stop]:
+        args = segment_overlay_args(seg)
+        if args is None:
+            continue
+        _, hit = panel_overlay(*args)
+        if hit:
+            cached += 1
+        else:
+            drawn += 1
+    return drawn, cached
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# --- Batch Pipeline Scheduler ---
+# Runs many projects at once (main.py run-batch). Each project is a small
+# dependency graph:
+#
+#   images ─────────────┐
+#   tts ────────────────┼──> render (compose + encode + mux)
+#   overlays (chunks) ──┘
+#
+# Every stage runs in the pool for the resource it waits on:
+#   io    threads    image searches and downloads (network)
+#   tts   threads    VOICEVOX requests (one engine, so only a few at a time)
+#   cpu   processes  overlay drawing and rendering, sized to the machine
+# A stage starts as soon as its dependencies are done and its pool has a free
+# slot, so one project's render overlaps the next one's downloads and TTS, and
+# total time approaches the busiest resource's work instead of the sum of all.
+#
+# As in `main.py run`, a failed image fetch, TTS or overlay stage only warns:
+# the render then does that work itself (they are `after` dependencies, for
+# ordering only). A stage whose `deps` failed fails too, without running. Stages that are up to date
+# (checkpoints.py) are not scheduled at all; `force` runs them anyway.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+BATCH_CONF = config.get("batch", {})
+IO_WORKERS = BATCH_CONF.get("io_workers", 2)
+TTS_WORKERS = BATCH_CONF.get("tts_workers", 2)
+CPU_WORKERS = BATCH_CONF.get("cpu_workers", 0) or os.cpu_count() or 1 # 0 = one per core
+# ffmpeg encodes with several threads of its own, so fewer renders than cores
+MAX_RENDERS = BATCH_CONF.get("max_renders", 0) or max(1, CPU_WORKERS // 2)
+OVERLAY_CHUNK = BATCH_CONF.get("overlay_chunk", 16) # segments per overlay job
+
+
+# Stage functions. They run in worker threads/processes, so they import the
+# heavy modules themselves and only take and return picklable values.
+
+def images_stage(project):
+    import fetch_images
+    return fetch_images.fetch_images_for_script(script_path=project["script"], image_dir=project["images"])
+
+def tts_stage(project, reuse):
+    import generate_video
+    return generate_video.synthesize_audio(project["script"], project["audio"], reuse=reuse)
+
+def overlay_stage(script_path, start, stop):
+    import panels
+    return panels.prerender_overlays(script_path, start, stop)
+
+def render_stage(project, wav_paths, stream, profile, threads, renditions):
+    import generate_video
+    generate_video.generate_video(script_path=project["script"], output_path=project["video"],
+                                  image_dir=project["images"], audio_dir=project["audio"],
+                                  stream=stream, wav_paths=wav_paths, keep_intermediates=stream,
+                                  profile=profile, threads=threads, renditions=renditions)
+    return project["video"]
+
+def mux_stage(project, renditions):
+    import generate_video
+    generate_video.remux(project["video"], renditions)
+    return project["video"]
+
+
+class Stage:
+    def __init__(self, project, name, pool, call, deps=(), after=()):
+        self.project = project
+        self.name = name
+        self.pool = pool
+        self.call = call # () -> (fn, args), evaluated when the stage starts
+        self.deps = list(deps) # must succeed
+        self.after = list(after) # only have to be finished
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.priority = ()
+        self.fresh = None # () -> True if up to date, checked once the deps are done
+        self.on_done = None # (result, seconds) -> None, called in the scheduler thread
+        self.skipped = False
+
+    @property
+    def label(self):
+        return f"{self.project['name']}:{self.name}"
+
+    @property
+    def duration(self):
+        return (self.finished - self.started) if self.finished else 0.0
+
+    def ready(self):
+        return all(d.finished is not None for d in self.deps + self.after)
+
+
+def project_stages(project, order, stream=None, force=False, profile=None, threads=None):
+    """The stage graph of one project, without the stages that are up to date."""
+    import checkpoints
+    ps = checkpoints.ProjectStages(project, stream=stream, profile=profile)
+    print(f"[batch] {project['name']}:")
+    start = time.monotonic()
+    n_segments = len(ps.segments)
+    if ps.needed("parse", force):
+        ps.record("parse", time.monotonic() - start)
+
+    stages = []
+    if ps.needed("images", force):
+        images = Stage(project, "images", "io", lambda: (images_stage, (project,)))
+        def images_done(result, seconds):
+            # Keywords without an image stay out of date, so the next run tries them again
+            if result:
+                print(f"[batch] {project['name']}: no image for {', '.join(result)}")
+            else:
+                ps.record("images", seconds)
+        images.on_done = images_done
+        stages.append(images)
+
+    wav_paths = {}
+    tts = None
+    if ps.needed("tts", force):
+        reuse = None if force else ps.tts_reuse()
+        tts = Stage(project, "tts", "tts", lambda: (tts_stage, (project, reuse)))
+        tts.on_done = lambda result, seconds: ps.record_tts(result, seconds)
+        stages.append(tts)
+    else:
+        wav_paths = ps.tts_wavs()
+
+    if ps.needed("overlays", force):
+        chunks = []
+        for start in range(0, n_segments, OVERLAY_CHUNK):
+            stop = min(start + OVERLAY_CHUNK, n_segments)
+            chunks.append(Stage(project, f"overlays[{start}:{stop}]", "cpu",
+                                lambda start=start, stop=stop: (overlay_stage, (project["script"], start, stop))))
+
+        def overlay_done(result, seconds):
+            if all(c.finished and not c.error for c in chunks):
+                ps.record("overlays", sum(c.duration for c in chunks))
+        for c in chunks:
+            c.on_done = overlay_done
+        stages += chunks
+
+    render = Stage(project, "render", "cpu",
+                   lambda: (render_stage, (project, (tts.result if tts else wav_paths) or None, ps.stream, ps.profile, threads,
+                                           ps.renditions)),
+                   after=list(stages))
+    render.fresh = lambda: not ps.needed("render", force)
+
+    def render_done(result, seconds):
+        ps.record("render", seconds)
+        if ps.stream:
+            ps.record("mux")
+    render.on_done = render_done
+    stages.append(render)
+
+    if ps.stream:
+        # Only runs when the render was up to date but the BGM changed
+        mux = Stage(project, "mux", "io", lambda: (mux_stage, (project, ps.renditions)), deps=[render])
+        mux.fresh = lambda: not ps.needed("mux")
+        mux.on_done = lambda result, seconds: ps.record("mux", seconds)
+        stages.append(mux)
+
+    for s in stages:
+        # Earlier projects first; renders before overlay chunks so finished work leaves the pool
+        s.priority = (order, 0 if s.name in ("render", "mux") else 1)
+    return stages
+
+
+def run_batch(projects, stream=None, force=False, io_workers=IO_WORKERS, tts_workers=TTS_WORKERS,
+              cpu_workers=CPU_WORKERS, max_renders=MAX_RENDERS, profile=None):
+    """
+    Runs every project's stages through the scheduler.
+    `projects` are dicts with name, script, images, audio and video paths;
+    `profile` is the render profile of all of them (generate_video.render_profile).
+    Returns the stages (with timings, results and errors).
+    """
+    # Every pool needs a slot, or its stages could never start
+    io_workers, tts_workers, cpu_workers, max_renders = (max(1, n) for n in (io_workers, tts_workers, cpu_workers, max_renders))
+    # Concurrent renders share the cores between their encoders
+    threads = max(1, cpu_workers // max_renders)
+    stages = []
+    for order, project in enumerate(projects):
+        stages += project_stages(project, order, stream, force, profile, threads)
+
+    capacity = {"io": io_workers, "tts": tts_workers, "cpu": cpu_workers}
+    busy = {pool: 0.0 for pool in capacity}
+    # Workers are spawned, not forked: the parent already runs I/O threads
+    cpu_pool = ProcessPoolExecutor(max_workers=cpu_workers, mp_context=multiprocessing.get_context("spawn"))
+    executors = {
+        "io": ThreadPoolExecutor(max_workers=io_workers),
+        "tts": ThreadPoolExecutor(max_workers=tts_workers),
+        "cpu": cpu_pool,
+    }
+    print(f"Batch: {len(projects)} projects, {len(stages)} stages "
+          f"(io {io_workers}, tts {tts_workers}, cpu {cpu_workers} processes, max {max_renders} renders)")
+
+    pending = sorted(stages, key=lambda s: s.priority)
+    running = {} # future -> stage
+    start = time.monotonic()
+    try:
+        while pending or running:
+            in_use = {pool: 0 for pool in capacity}
+            renders = 0
+            for s in running.values():
+                in_use[s.pool] += 1
+                renders += s.name == "render"
+
+            for s in list(pending):
+                if not s.ready():
+                    continue
+                failed = [d for d in s.deps if d.error]
+                if failed:
+                    pending.remove(s)
+                    s.started = s.finished = time.monotonic()
+                    s.error = RuntimeError(f"not run, {failed[0].label} failed")
+                    print(f"[batch] FAILED {s.label}: {s.error}")
+                    continue
+                if in_use[s.pool] >= capacity[s.pool]:
+                    continue
+                if s.name == "render" and renders >= max_renders:
+                    continue
+                pending.remove(s)
+                if s.fresh and s.fresh():
+                    s.skipped = True
+                    s.started = s.finished = time.monotonic()
+                    continue
+                fn, args = s.call()
+                s.started = time.monotonic()
+                running[executors[s.pool].submit(fn, *args)] = s
+                in_use[s.pool] += 1
+                renders += s.name == "render"
+                print(f"[batch] start  {s.label}")
+
+            if not running:
+                if not pending:
+                    break # the last stages were up to date
+                if any(s.ready() for s in pending):
+                    continue # stages skipped as up to date unblocked their dependents
+                raise RuntimeError(f"Batch stalled: {', '.join(s.label for s in pending)} cannot start")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                s = running.pop(future)
+                s.finished = time.monotonic()
+                busy[s.pool] += s.duration
+                try:
+                    s.result = future.result()
+                    print(f"[batch] done   {s.label} ({s.duration:.1f}s)")
+                    if s.on_done:
+                        s.on_done(s.result, s.duration)
+                except Exception as e:
+                    s.error = e
+                    print(f"[batch] FAILED {s.label} ({s.duration:.1f}s): {e}")
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    print_report(projects, stages, capacity, busy, time.monotonic() - start)
+    return stages
+
+
+def print_report(projects, stages, capacity, busy, wall):
+    print(f"\n{'project':<24} {'images':>8} {'tts':>8} {'overlays':>9} {'render':>8}  result  (-: up to date)")
+    for project in projects:
+        own = [s for s in stages if s.project is project]
+
+        def t(prefix, width):
+            ran = [s for s in own if s.name.startswith(prefix) and not s.skipped]
+            return f"{sum(s.duration for s in ran):>{width - 1}.1f}s" if ran else f"{'-':>{width}}"
+
+        final = [s for s in own if s.name in ("render", "mux")]
+        failed = [s.name for s in own if s.error and s not in final]
+        if any(s.error for s in final):
+            result = "FAILED"
+        elif all(s.skipped for s in final):
+            result = "up to date"
+        else:
+            result = "ok" + (f" (warnings: {', '.join(failed)})" if failed else "")
+        print(f"{project['name']:<24} {t('images', 8)} {t('tts', 8)} {t('overlays', 9)} {t('render', 8)}  {result}")
+
+    sequential = sum(s.duration for s in stages)
+    print(f"\nWall time {wall:.1f}s, stage time {sequential:.1f}s ({sequential / wall if wall else 0:.1f}x overlap)")
+    for pool, slots in capacity.items():
+        print(f"  {pool:<4} busy {busy[pool]:>7.1f}s  utilization {busy[pool] / (slots * wall) * 100 if wall else 0:>5.1f}% of {slots}")
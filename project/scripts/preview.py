@@ -0,0 +1,367 @@
+import os
+import json
+import math
+import time
+import subprocess
+import numpy as np
+from PIL import Image
+from moviepy import (AudioArrayClip, CompositeAudioClip, CompositeVideoClip, afx,
+                     concatenate_audioclips, concatenate_videoclips)
+import checkpoints
+import clip_pool
+import cache_gc
+import generate_video
+
+# --- Preview Renders ---
+# `main.py watch <project>` keeps <project>/output/<project>_preview.mp4 up to
+# date while the script is being edited. Every segment is rendered on its own
+# as a small fragment in the preview render profile (config["preview"]["profile"],
+# "draft" by default), cached by a key of everything it shows and plays (text,
+# character, WAV, context image, background, profile, renderer code):
+#
+#   <cache_dir>/fragments/<key>.mp4
+#
+# A segment's frames do not depend on its position (the background restarts at
+# every segment), so after an edit only the changed segments are rendered and
+# the preview is the fragments joined without re-encoding, plus the BGM.
+# TTS goes through checkpoints.py: only changed lines are synthesized, and a
+# later `main.py run` reuses the WAVs. Images are not searched for; watch uses
+# what is in the images folder (`main.py run` fetches new keywords).
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+def resolve_path(path):
+    return os.path.abspath(os.path.join(current_dir, path))
+
+PREVIEW_CONF = config.get("preview", {})
+PREVIEW_PROFILE = PREVIEW_CONF.get("profile", "draft")
+POLL_SEC = PREVIEW_CONF.get("poll_sec", 0.5)
+FRAGMENT_CACHE_DIR = resolve_path(os.path.join(config["paths"].get("cache_dir", "../cache"), "fragments"))
+PREVIEW_CODE = [os.path.join(current_dir, name) for name in ("generate_video.py", "panels.py", "clip_pool.py", "preview.py")]
+NARRATOR = "青山龍星" # the only character whose [IMG] changes the context image (see build_segment)
+
+
+def preview_path(project):
+    return os.path.join(project["output"], f"{project['name']}_preview.mp4")
+
+def context_images(segments, image_dir):
+    """
+    Per segment, the context image build_segment shows: (keyword, path), with
+    keyword None for the default image, or None. Narrator images persist until
+    the next narrator image, as in a full render.
+    """
+    default = generate_video.default_context_image_path(image_dir)
+    current = (None, default) if os.path.exists(default) else None
+    out = []
+    for seg in segments:
+        if seg.get("type") != "eyecatch" and seg["character"] == NARRATOR and seg.get("image_keyword"):
+            path = generate_video.image_path_for(seg["image_keyword"], image_dir)
+            if os.path.exists(path):
+                current = (seg["image_keyword"], path)
+        out.append(current)
+    return out
+
+def fragment_keys(stages, wav_paths, profile):
+    """{segment index: fragment cache key}."""
+    m = stages.manifest
+    segments = stages.segments
+    common = checkpoints.fingerprint([
+        {**profile, "size": list(profile["size"])}, config["video"], config["audio"]["use_voicevox"],
+        m.file_hash(generate_video.background_video_path()), [m.file_hash(p) for p in PREVIEW_CODE],
+    ])
+    contexts = context_images(segments, stages.project["images"])
+    keys = {}
+    for i, seg in enumerate(segments):
+        if seg.get("type") == "eyecatch":
+            keys[i] = checkpoints.fingerprint(["eyecatch", m.file_hash(generate_video.EYECATCH_FILE), common])
+            continue
+        context = contexts[i]
+        keys[i] = checkpoints.fingerprint([
+            seg["character"], seg["text"], seg.get("audio_text"), m.file_hash(wav_paths.get(i, "")),
+            context and [context[0], m.file_hash(context[1])], common,
+        ])
+    return keys
+
+def fragment_path(key):
+    return os.path.join(FRAGMENT_CACHE_DIR, key + ".mp4")
+
+def silence(duration):
+    return AudioArrayClip(np.zeros((max(1, int(duration * generate_video.AUDIO_FPS)), 2)), fps=generate_video.AUDIO_FPS)
+
+def segment_clip(i, seg, context, assets, project):
+    """
+    build_segment for one segment out of order: the context image it would
+    carry over from earlier segments is set up first. Returns (clip, audio_clip);
+    clip is None for an eyecatch when there is no eyecatch video.
+    """
+    if context is None:
+        assets["context_image"] = None
+    elif context[0] is None:
+        assets["context_image"] = assets["default_context"]
+    else:
+        assets["context_image"] = generate_video.get_image_clip(context[0], 1.0, custom_image_dir=project["images"],
+                                                                size=assets["size"])
+    clip, audio_clip = generate_video.build_segment(i, seg, assets, project["images"], project["audio"])
+    if clip is not None and tuple(clip.size) != assets["size"]:
+        clip = CompositeVideoClip([clip.with_position("center")], size=assets["size"])
+    return clip, audio_clip
+
+def render_fragment(i, seg, context, assets, project, path, profile):
+    """
+    Renders one segment into `path` with the profile's fps and encoder settings
+    (assets are loaded at the profile's size). Returns False if it has no picture.
+    """
+    clip, audio_clip = segment_clip(i, seg, context, assets, project)
+    if clip is None:
+        return False
+    try:
+        fragment = clip
+        if clip.audio is None:
+            # Every fragment needs an audio stream, or the joined preview loses sound after it
+            fragment = clip.with_audio(silence(clip.duration))
+        os.makedirs(FRAGMENT_CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.mp4"
+        fragment.write_videofile(tmp, fps=profile["fps"], codec="libx264", preset=profile["preset"], audio_codec="aac",
+                                 audio_fps=generate_video.AUDIO_FPS, temp_audiofile_path=FRAGMENT_CACHE_DIR,
+                                 pixel_format="yuv420p", threads=generate_video.encoder_threads(),
+                                 ffmpeg_params=generate_video.encoder_params(profile), logger=None)
+        os.replace(tmp, path)
+    finally:
+        if audio_clip is not None:
+            audio_clip.close()
+    return True
+
+def join_fragments(paths, output_path):
+    """Concatenates fragments without re-encoding the video; the BGM is mixed in as in a full render."""
+    list_path = output_path + ".fragments.txt"
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in paths:
+            f.write("file '" + path.replace("'", "'\\''") + "'\n")
+    tmp = os.path.splitext(output_path)[0] + ".tmp.mp4"
+    cmd = [generate_video.FFMPEG_BINARY, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+    if os.path.exists(generate_video.BGM_FILE):
+        cmd += ["-stream_loop", "-1", "-i", generate_video.BGM_FILE,
+                "-filter_complex", f"[1:a]volume={generate_video.BGM_VOLUME}[bgm];[0:a][bgm]amix=inputs=2:duration=first:normalize=0[aout]",
+                "-map", "0:v", "-map", "[aout]"]
+    else:
+        cmd += ["-map", "0:v", "-map", "0:a"]
+    cmd += ["-c:v", "copy", "-c:a", "aac", "-movflags", "+faststart", tmp]
+    try:
+        subprocess.run(cmd, check=True)
+        os.replace(tmp, output_path)
+    finally:
+        os.remove(list_path)
+
+def ensure_tts(stages):
+    """WAVs of every segment, synthesizing only the lines that changed. Returns {segment index: path}."""
+    project = stages.project
+    if stages.state("tts") == "ok":
+        return stages.tts_wavs()
+    wav_paths = generate_video.synthesize_audio(project["script"], project["audio"], reuse=stages.tts_reuse())
+    stages.record_tts(wav_paths)
+    return wav_paths
+
+def update_preview(project, assets, profile):
+    """One watch cycle: TTS and fragments for what changed, then the joined preview. Returns its path."""
+    start = time.monotonic()
+    stages = checkpoints.ProjectStages(project)
+    segments = stages.segments
+    if stages.state("parse") != "ok":
+        stages.record("parse")
+
+    assets["wavs"] = wav_paths = ensure_tts(stages)
+
+    keys = fragment_keys(stages, wav_paths, profile)
+    contexts = context_images(segments, project["images"])
+    paths = []
+    rendered = 0
+    for i, seg in enumerate(segments):
+        path = fragment_path(keys[i])
+        if os.path.exists(path):
+            cache_gc.touch(path)
+        else:
+            print(f"[watch] rendering segment {i + 1}/{len(segments)}")
+            if not render_fragment(i, seg, contexts[i], assets, project, path, profile):
+                continue
+            rendered += 1
+        paths.append(path)
+    stages.manifest.save() # keep the file hashes computed on the way
+
+    if not paths:
+        print("[watch] nothing to preview.")
+        return None
+    output = preview_path(project)
+    join_fragments(paths, output)
+    print(f"[watch] preview updated in {time.monotonic() - start:.1f}s "
+          f"({rendered} of {len(segments)} segments rendered): {output}")
+    return output
+
+def snapshot(project):
+    """What watch reacts to: the script and the images folder (names, sizes, mtimes)."""
+    paths = [project["script"]]
+    if os.path.isdir(project["images"]):
+        paths += sorted(os.path.join(project["images"], f) for f in os.listdir(project["images"]))
+    out = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        out.append((path, st.st_size, st.st_mtime_ns))
+    return out
+
+def watch_project(project, poll=POLL_SEC, once=False, profile=None):
+    """Updates the preview whenever the script or the images change, until Ctrl+C (or once)."""
+    profile = generate_video.render_profile(profile or PREVIEW_PROFILE)
+    print(f"Watching {project['script']} and {project['images']} (Ctrl+C to stop, profile {profile['name']})")
+    with clip_pool.ReaderPool(max_open=generate_video.MAX_OPEN_READERS) as pool:
+        assets = generate_video.load_render_assets(project["images"], pool, size=profile["size"])
+        assets["default_context"] = assets["context_image"]
+        last = None
+        try:
+            while True:
+                current = snapshot(project)
+                if current != last:
+                    # Editors often write a file in several steps: wait until it settles
+                    time.sleep(min(poll, 0.2))
+                    if snapshot(project) != current:
+                        continue
+                    last = current
+                    try:
+                        update_preview(project, assets, profile)
+                    except Exception as e:
+                        print(f"[watch] preview not updated: {e}")
+                    if once:
+                        return
+                time.sleep(poll)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+
+# --- Segment and Range Previews ---
+# `main.py preview <project> --segment N` or `--range 01:20-01:45` renders only
+# those segments in a render profile (the default one unless given), as a short
+# clip or (--still) one PNG frame.
+# Segment start times come from the WAV headers (generate_video.segment_starts),
+# so a range late in the video costs the same as one at the start.
+
+def parse_timecode(text):
+    """Seconds from "80", "01:20", "01:20.5" or "1:01:20"."""
+    seconds = 0.0
+    for part in text.strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def parse_range(text):
+    """(start, end) seconds from "01:20-01:45"."""
+    start, sep, end = text.partition("-")
+    if not sep:
+        raise ValueError(f"Expected START-END, got {text!r}")
+    start, end = parse_timecode(start), parse_timecode(end)
+    if end <= start:
+        raise ValueError(f"Range end must be after its start: {text!r}")
+    return start, end
+
+def format_timecode(seconds):
+    return f"{int(seconds // 60):02d}:{seconds % 60:04.1f}"
+
+def render_range(parts, start, end, pool, output, profile):
+    """Concatenates (clip, from, to) parts, mixes in the BGM from `start` on and writes the clip."""
+    cut = []
+    for clip, a, b in parts:
+        if clip.audio is not None:
+            # The narration is offset by its padding and ends before the picture: cut it as a whole
+            clip = clip.with_audio(CompositeAudioClip([clip.audio]).with_duration(clip.duration))
+        cut.append(clip.subclipped(a, min(b, clip.duration)))
+    video = concatenate_videoclips(cut, method="compose")
+    audio = [video.audio] if video.audio is not None else []
+    if os.path.exists(generate_video.BGM_FILE):
+        # The full render loops the BGM from 0, so the range hears the same part of it
+        bgm_reader = pool.audio(generate_video.BGM_FILE, pin=True)
+        loops = math.ceil(end / bgm_reader.duration) + 1
+        bgm = concatenate_audioclips([bgm_reader] * loops).subclipped(start, start + video.duration)
+        audio.append(bgm.with_effects([afx.MultiplyVolume(generate_video.BGM_VOLUME)]))
+    else:
+        bgm_reader = None
+    if audio:
+        video = video.with_audio(CompositeAudioClip(audio))
+    tmp = os.path.splitext(output)[0] + ".tmp.mp4"
+    try:
+        video.write_videofile(tmp, fps=profile["fps"], codec="libx264", preset=profile["preset"], audio_codec="aac",
+                              temp_audiofile_path=os.path.dirname(output), threads=generate_video.encoder_threads(),
+                              ffmpeg_params=generate_video.encoder_params(profile), logger=None)
+    finally:
+        if bgm_reader is not None:
+            pool.release(bgm_reader)
+    os.replace(tmp, output)
+
+def preview_project(project, segment=None, time_range=None, still=False, output=None, profile=None):
+    """
+    Renders segment `segment` (1-based) or the (start, end) seconds of the full
+    video: a clip, or with `still` a PNG of the segment's middle frame (or the
+    range's first frame). Returns the output path.
+    """
+    started = time.monotonic()
+    profile = generate_video.render_profile(profile)
+    stages = checkpoints.ProjectStages(project)
+    segments = stages.segments
+    wav_paths = ensure_tts(stages)
+
+    with clip_pool.ReaderPool(max_open=generate_video.MAX_OPEN_READERS) as pool:
+        assets = generate_video.load_render_assets(project["images"], pool, size=profile["size"])
+        assets["default_context"] = assets["context_image"]
+        assets["wavs"] = wav_paths
+        eyecatch = assets["eyecatch"].duration if assets["eyecatch"] else None
+        timeline = generate_video.segment_starts(segments, wav_paths, eyecatch)
+        total = sum(duration for _, duration in timeline)
+
+        if segment is not None:
+            if not 1 <= segment <= len(segments):
+                raise ValueError(f"Segment {segment} does not exist (1-{len(segments)})")
+            seg_start, seg_duration = timeline[segment - 1]
+            if not seg_duration:
+                raise ValueError(f"Segment {segment} is an eyecatch without an eyecatch video")
+            start, end = seg_start, seg_start + seg_duration
+            at = start + seg_duration / 2
+            name = f"seg{segment:04d}"
+        else:
+            start, end = time_range
+            if start >= total:
+                raise ValueError(f"{format_timecode(start)} is past the end of the video ({format_timecode(total)})")
+            end = min(end, total)
+            at = start
+            name = f"{format_timecode(start)}-{format_timecode(end)}".replace(":", "")
+        output = output or os.path.join(project["output"], f"{project['name']}_preview_{name}.{'png' if still else 'mp4'}")
+
+        if still:
+            wanted = [i for i, (s, d) in enumerate(timeline) if s <= at < s + d]
+        else:
+            wanted = [i for i, (s, d) in enumerate(timeline) if d and s < end and s + d > start]
+        print(f"Preview {format_timecode(start)}-{format_timecode(end)} of {format_timecode(total)}: "
+              f"segments {', '.join(str(i + 1) for i in wanted)}")
+
+        contexts = context_images(segments, project["images"])
+        audio_clips = []
+        try:
+            parts = []
+            for i in wanted:
+                clip, audio_clip = segment_clip(i, segments[i], contexts[i], assets, project)
+                if audio_clip is not None:
+                    audio_clips.append(audio_clip)
+                seg_start, seg_duration = timeline[i]
+                parts.append((clip, max(start, seg_start) - seg_start, min(end, seg_start + seg_duration) - seg_start))
+            if still:
+                clip = parts[0][0]
+                offset = at - timeline[wanted[0]][0]
+                Image.fromarray(clip.get_frame(min(offset, clip.duration - 1e-3))).save(output)
+            else:
+                render_range(parts, start, end, pool, output, profile)
+        finally:
+            for audio_clip in audio_clips:
+                audio_clip.close()
+
+    print(f"Preview written in {time.monotonic() - started:.1f}s: {output}")
+    return output
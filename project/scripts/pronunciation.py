@@ -0,0 +1,210 @@
+import os
+import re
+import sys
+import json
+
+# --- Pronunciation Dictionary ---
+# All readings used by generate_audio.normalize_text live here.
+# Sources (later ones override earlier ones):
+#   1. DEFAULT_ENTRIES below
+#   2. config["audio"]["pronunciation"]  ({"surface": "reading"})
+#   3. TSV file at config["paths"]["pronunciation_dict"]
+#      Format: surface<TAB>reading[<TAB>cs]   ("cs" = case-sensitive; "#" starts a comment)
+#
+# Everything is compiled ONCE into trie-shaped regexes (one for case-sensitive
+# entries, one case-insensitive for the rest), so a text is normalized in one
+# left-to-right pass with longest-match priority no matter how many thousands
+# of entries the dictionary has.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+# Built-in readings (case-insensitive for Latin letters)
+DEFAULT_ENTRIES = {
+    # 1. Acronyms / English
+    "G7": "ジーセブン",
+    "APEC": "エイペック",
+    "Switch": "スイッチ",
+    "PB": "ピービー",
+    "GDP": "ジーディーピー",
+    "FRB": "エフアールビー",
+    "NASDAQ": "ナスダック",
+    "Amazon": "アマゾン",
+    "Apple": "アップル",
+    "Canon": "キヤノン",
+    "J15": "ジェイジュウゴ",
+    "F15": "エフジュウゴ",
+    # 2. Kanjis / Vocabulary
+    "美味": "おい", # 美味しい -> おいしい
+    "本日": "ほんじつ",
+    "明日": "あす",
+    "御社": "おんしゃ",
+    "貴社": "きしゃ",
+    "早苗": "さなえ",
+    "高市": "たかいち",
+    "石破": "いしば",
+    "総理": "そうり",
+    "習近平": "しゅうきんぺい",
+}
+
+# Pre-cleanup rules (regex based, run before the dictionary pass)
+CLEANUP_RULES = [
+    # Fix "12,500" -> "12500" (Crucial for Voicevox Counters)
+    (re.compile(r'(\d+),(\d+)'), r'\1\2'),
+    # Fix "2025 年" -> "2025年" (Remove space between Number and Non-Space)
+    (re.compile(r'(\d+)\s+([^\d\s])'), r'\1\2'),
+    # Fix "第2章" -> "だいにしょう" (User QA Request)
+    (re.compile(r"第([0-9０-９]+)章"), r"だい\1しょう"),
+]
+
+_compiled = None
+
+
+def load_tsv(path):
+    """Reads a surface<TAB>reading[<TAB>cs] file. Returns {surface: (reading, case_sensitive)}."""
+    entries = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            cols = line.split('\t')
+            if len(cols) < 2 or not cols[0] or not cols[1]:
+                print(f"Warning: Skipping malformed pronunciation entry {path}:{line_no}: {line!r}")
+                continue
+            case_sensitive = len(cols) > 2 and cols[2].strip().lower() == "cs"
+            entries[cols[0]] = (cols[1], case_sensitive)
+    return entries
+
+
+def load_entries():
+    """Merges built-in, config and TSV entries into {surface: (reading, case_sensitive)}."""
+    entries = {k: (v, False) for k, v in DEFAULT_ENTRIES.items()}
+
+    for k, v in config["audio"].get("pronunciation", {}).items():
+        entries[k] = (v, False)
+
+    tsv_path = config["paths"].get("pronunciation_dict")
+    if tsv_path:
+        tsv_path = os.path.abspath(os.path.join(current_dir, tsv_path))
+        if os.path.exists(tsv_path):
+            entries.update(load_tsv(tsv_path))
+
+    return entries
+
+
+def _trie_regex(words):
+    """Builds a prefix-factored regex so matching cost depends on word length, not dictionary size."""
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        terminal = '' in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional -> the longest entry wins, shorter one is the fallback
+        if terminal:
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+def compile_dictionary(entries):
+    """
+    Compiles entries into (patterns, exact_map, folded_map). patterns is
+    (any, exact, folded) or None: `any` finds where an entry starts, `exact`
+    and `folded` give the longest case-sensitive / case-insensitive entry there.
+    """
+    exact = {}
+    folded = {}
+    for surface, (reading, case_sensitive) in entries.items():
+        if case_sensitive:
+            exact[surface] = reading
+        else:
+            folded[surface.lower()] = reading
+
+    if not exact and not folded:
+        return None, exact, folded
+
+    # Separate tries: a case-sensitive entry whose case does not match must not
+    # hide a shorter case-insensitive one ("USA" cs vs. "us")
+    exact_body = _trie_regex(exact) if exact else None
+    folded_body = "(?i:" + _trie_regex(folded) + ")" if folded else None
+    any_pattern = re.compile("|".join(b for b in (exact_body, folded_body) if b))
+    patterns = (any_pattern, exact_body and re.compile(exact_body), folded_body and re.compile(folded_body))
+    return patterns, exact, folded
+
+
+def get_dictionary():
+    global _compiled
+    if _compiled is None:
+        _compiled = compile_dictionary(load_entries())
+    return _compiled
+
+
+def reload():
+    """Drops the compiled dictionary (e.g. after editing the TSV)."""
+    global _compiled
+    _compiled = None
+
+
+def normalize(text):
+    """
+    Returns (normalized_text, rewrites).
+    rewrites is a list of {"pos", "from", "to"} for every applied replacement (for QA).
+    """
+    for pattern, repl in CLEANUP_RULES:
+        text = pattern.sub(repl, text)
+
+    patterns, exact, folded = get_dictionary()
+    if patterns is None:
+        return text, []
+    any_pattern, exact_pattern, folded_pattern = patterns
+
+    rewrites = []
+    out = []
+    pos = 0
+    while True:
+        m = any_pattern.search(text, pos)
+        if m is None:
+            break
+        start = m.start()
+        # Longest entry at this position; on a tie the case-sensitive one wins
+        e = exact_pattern.match(text, start) if exact_pattern else None
+        f = folded_pattern.match(text, start) if folded_pattern else None
+        if e and (not f or e.end() >= f.end()):
+            surface, reading = e.group(0), exact[e.group(0)]
+        else:
+            surface, reading = f.group(0), folded[f.group(0).lower()]
+        if not surface:
+            # Only an empty match here: keep the character and move on
+            out.append(text[pos:start + 1])
+            pos = start + 1
+            continue
+        out.append(text[pos:start])
+        out.append(reading)
+        rewrites.append({"pos": start, "from": surface, "to": reading})
+        pos = start + len(surface)
+    out.append(text[pos:])
+    return "".join(out), rewrites
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 pronunciation.py <text>")
+        sys.exit(1)
+
+    result, applied = normalize(" ".join(sys.argv[1:]))
+    print(result)
+    for r in applied:
+        print(f"  @{r['pos']}: {r['from']} -> {r['to']}")
@@ -0,0 +1,102 @@
+import os
+import sys
+import wave
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+# --- Reader Pool Check ---
+# Renders a tiny project with the reader pool capped at `--max-open` (default 1):
+# an eyecatch video, a looping background and the BGM all need a reader, so with
+# a cap of 1 the pool has to keep the pinned ones open instead of closing a
+# reader under a clip that still reads frames from it.
+# Eyecatch and background are generated with ffmpeg's test sources, narration is
+# silence, so no VOICEVOX, network or project assets are needed.
+#
+#   python3 reader_check.py                  # batch and stream, cap 1, draft profile
+#   python3 reader_check.py --modes stream --max-open 2
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+MODES = ["batch", "stream"]
+
+
+def make_video(path, source, seconds):
+    from moviepy.config import FFMPEG_BINARY
+    subprocess.run([FFMPEG_BINARY, "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"{source}=size=320x180:rate=12",
+                    "-t", str(seconds), "-pix_fmt", "yuv420p", path], check=True)
+
+
+def make_silence(path, seconds, rate=24000):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\0\0" * int(seconds * rate))
+
+
+def make_project(root):
+    """(script, images dir, audio dir, {segment: wav}) of a three-segment project with an eyecatch."""
+    images = os.path.join(root, "images")
+    audio = os.path.join(root, "audio")
+    os.makedirs(images)
+    os.makedirs(audio)
+    script = os.path.join(root, "script.md")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write("```markdown\nずんだもん, 一つ目なのだ。\n[EYECATCH]\nずんだもん, 二つ目なのだ。\n```\n")
+    wavs = {}
+    for i in (0, 2):
+        wavs[i] = os.path.join(audio, f"{i}.wav")
+        make_silence(wavs[i], 1.5)
+    return script, images, audio, wavs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a tiny project with a capped reader pool")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma separated subset of: {','.join(MODES)}")
+    parser.add_argument("--max-open", type=int, default=1, help="Reader pool cap")
+    parser.add_argument("--profile", default="draft", help="Render profile")
+    args = parser.parse_args()
+    modes = [m for m in args.modes.split(",") if m]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"unknown mode: {', '.join(unknown)}")
+
+    import generate_video
+    root = tempfile.mkdtemp(prefix="reader_check_")
+    failed = []
+    try:
+        generate_video.EYECATCH_FILE = os.path.join(root, "eyecatch.mp4")
+        generate_video.BG_VIDEO_DIR = os.path.join(root, "backgrounds")
+        os.makedirs(generate_video.BG_VIDEO_DIR)
+        make_video(generate_video.EYECATCH_FILE, "testsrc", 1)
+        make_video(os.path.join(generate_video.BG_VIDEO_DIR, "news_bg.mp4"), "smptebars", 1)
+        generate_video.MAX_OPEN_READERS = args.max_open
+        script, images, audio, wavs = make_project(root)
+        profile = generate_video.render_profile(args.profile)
+
+        for mode in modes:
+            render = generate_video.stream_render_video if mode == "stream" else generate_video.render_video
+            output = os.path.join(root, f"{mode}.mp4")
+            try:
+                generate_video.run_with_readers(render, script, output, images, audio, wavs, profile=profile)
+                ok = os.path.exists(output) and os.path.getsize(output) > 0
+                error = "" if ok else "no output"
+            except Exception as e:
+                ok, error = False, f"{type(e).__name__}: {e}"
+            print(f"{mode:<7} max_open={args.max_open}  {'OK' if ok else 'FAILED'}  {error}")
+            if not ok:
+                failed.append(mode)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+        sys.exit(1)
+    print("All renders finished.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import _thread
+import threading
+import subprocess
+import tracemalloc
+
+# --- Resource Monitor ---
+# Background sampler for long renders. Every `interval_sec` it records:
+#   - RSS of this process
+#   - open file descriptors
+#   - live ffmpeg child processes (MoviePy readers/writers)
+#   - tracemalloc top allocators (optional)
+# tagged with the current pipeline stage (set_stage). The time series is written
+# next to the output video as "<output>.resources.json".
+#
+# Budgets (config["resources"], 0 = unlimited): max_rss_mb, max_open_fds, max_ffmpeg_procs.
+# When one is exceeded the render is aborted with ResourceBudgetExceeded and a report.
+#
+# Like tracing.py, everything is a no-op while no sampler is running.
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+RES_CONF = config.get("resources", {})
+
+_active = None
+
+
+class ResourceBudgetExceeded(RuntimeError):
+    pass
+
+
+def _rss_mb():
+    if psutil:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        # Peak instead of current RSS (bytes on macOS, KB on Linux)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _open_fds():
+    if psutil:
+        return psutil.Process().num_fds()
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        if os.path.isdir(fd_dir):
+            return len(os.listdir(fd_dir))
+    return -1
+
+
+def _ffmpeg_children():
+    if psutil:
+        count = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                if "ffmpeg" in child.name().lower():
+                    count += 1
+            except psutil.Error:
+                pass
+        return count
+    try:
+        out = subprocess.run(["pgrep", "-l", "-P", str(os.getpid())], capture_output=True, text=True, timeout=2).stdout
+    except (OSError, subprocess.SubprocessError):
+        return -1
+    return sum(1 for line in out.splitlines() if "ffmpeg" in line.lower())
+
+
+class ResourceSampler:
+    def __init__(self, interval=1.0, budgets=None, trace_allocations=True, top_n=5):
+        self.interval = interval
+        self.budgets = {k: v for k, v in (budgets or {}).items() if v}
+        self.trace_allocations = trace_allocations
+        self.top_n = top_n
+        self.stage = "init"
+        self.samples = []
+        self.breach = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_tracemalloc = False
+        self._t0 = time.monotonic()
+
+    def start(self):
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+            self._started_tracemalloc = True
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval * 2 + 1)
+        self.sample() # final point
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if self.breach:
+                # Abort the render from the main thread (raises KeyboardInterrupt there)
+                _thread.interrupt_main()
+                return
+
+    def sample(self):
+        point = {
+            "t": round(time.monotonic() - self._t0, 3),
+            "stage": self.stage,
+            "rss_mb": round(_rss_mb(), 1),
+            "open_fds": _open_fds(),
+            "ffmpeg_procs": _ffmpeg_children(),
+        }
+        if self.trace_allocations and tracemalloc.is_tracing():
+            stats = tracemalloc.take_snapshot().statistics("lineno")[:self.top_n]
+            point["top_allocators"] = [
+                {"where": f"{os.path.basename(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+                 "size_mb": round(s.size / (1024 * 1024), 2), "count": s.count}
+                for s in stats
+            ]
+        self.samples.append(point)
+
+        if not self.breach:
+            for key, limit, label in (("rss_mb", "max_rss_mb", "RSS (MB)"),
+                                      ("open_fds", "max_open_fds", "open file descriptors"),
+                                      ("ffmpeg_procs", "max_ffmpeg_procs", "ffmpeg processes")):
+                if limit in self.budgets and point[key] > self.budgets[limit]:
+                    self.breach = {"metric": label, "value": point[key], "limit": self.budgets[limit],
+                                   "stage": point["stage"], "t": point["t"]}
+                    break
+        return point
+
+    def stage_summary(self):
+        stages = {}
+        for p in self.samples:
+            s = stages.setdefault(p["stage"], {"samples": 0, "peak_rss_mb": 0, "peak_open_fds": 0, "peak_ffmpeg_procs": 0})
+            s["samples"] += 1
+            s["peak_rss_mb"] = max(s["peak_rss_mb"], p["rss_mb"])
+            s["peak_open_fds"] = max(s["peak_open_fds"], p["open_fds"])
+            s["peak_ffmpeg_procs"] = max(s["peak_ffmpeg_procs"], p["ffmpeg_procs"])
+        return stages
+
+    def report(self):
+        lines = []
+        if self.breach:
+            b = self.breach
+            lines.append(f"Resource budget exceeded: {b['metric']} = {b['value']} > {b['limit']} "
+                         f"(stage '{b['stage']}', t={b['t']}s)")
+        lines.append(f"{'stage':<20} {'peak RSS MB':>12} {'peak fds':>9} {'peak ffmpeg':>12}")
+        for name, s in self.stage_summary().items():
+            lines.append(f"{name:<20} {s['peak_rss_mb']:>12} {s['peak_open_fds']:>9} {s['peak_ffmpeg_procs']:>12}")
+        last = self.samples[-1] if self.samples else {}
+        if last.get("top_allocators"):
+            lines.append("Top allocators (last sample):")
+            for a in last["top_allocators"]:
+                lines.append(f"  {a['where']:<40} {a['size_mb']:>8} MB  ({a['count']} blocks)")
+        return "\n".join(lines)
+
+    def write(self, path):
+        out_dir = os.path.dirname(path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "interval_sec": self.interval,
+                "budgets": self.budgets,
+                "breach": self.breach,
+                "stages": self.stage_summary(),
+                "samples": self.samples
+            }, f, ensure_ascii=False, indent=1)
+        return path
+
+
+def start(interval=None, budgets=None, trace_allocations=None):
+    """Starts the process-wide sampler (settings default to config["resources"])."""
+    global _active
+    if _active:
+        return _active
+    _active = ResourceSampler(
+        interval=interval if interval is not None else RES_CONF.get("interval_sec", 1.0),
+        budgets=budgets if budgets is not None else {k: RES_CONF.get(k, 0) for k in ("max_rss_mb", "max_open_fds", "max_ffmpeg_procs")},
+        trace_allocations=trace_allocations if trace_allocations is not None else RES_CONF.get("tracemalloc", True),
+    )
+    _active.start()
+    return _active
+
+
+def is_running():
+    return _active is not None
+
+
+def set_stage(name):
+    if _active:
+        _active.stage = name
+
+
+def check():
+    """Raises ResourceBudgetExceeded if a budget was exceeded (call at safe points)."""
+    if _active and _active.breach:
+        raise ResourceBudgetExceeded(_active.report())
+
+
+def budget_error():
+    """Turns a sampler-triggered KeyboardInterrupt into the real error (None if it was a real Ctrl-C)."""
+    if _active and _active.breach:
+        return ResourceBudgetExceeded(_active.report())
+    return None
+
+
+def stop(output_path=None):
+    """Stops the sampler, writes the time series (if output_path) and prints the report."""
+    global _active
+    if not _active:
+        return None
+    sampler, _active = _active, None
+    sampler.stop()
+    if output_path:
+        path = sampler.write(output_path)
+        print(f"Resource samples written to {path}")
+    print(sampler.report())
+    return sampler
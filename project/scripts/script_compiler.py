@@ -0,0 +1,186 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import tracing
+
+# --- Script Compiler ---
+# Parses script.md ONCE into a flat segment list that every stage shares
+# (fetch_images, generate_audio, generate_video).
+# The result is cached next to the script as "<script>.segments.json" and reused
+# until the script's content hash (or the compiler version) changes.
+
+# Bump this whenever the parsing rules below change, so stale caches are rebuilt.
+COMPILER_VERSION = 1
+
+# Pre-compiled patterns (previously re-built on every line)
+FENCE_RE = re.compile(r'```(.*?)```', re.DOTALL)
+IMG_TAG_RE = re.compile(r'\[IMG:\s*(.*?)\]')
+FULLWIDTH_READING_RE = re.compile(r'（(.*?)）')
+READING_RE = re.compile(r'\{(.*?)\}')
+# Single pass for "Target{Reading}" -> "Reading".
+# Target is English/Numbers (+spaces) or a Kanji run; anything else just gets unwrapped.
+AUDIO_READING_RE = re.compile(r'(?:[a-zA-Z0-9\s\.\,\!]+|[一-龠]+)?\{(.*?)\}')
+
+NARRATOR = "青山龍星"
+
+
+def normalize_character_name(name):
+    """Normalizes character names to standard full names."""
+    name = name.strip()
+    if "ずんだ" in name: return "ずんだもん"
+    if "めたん" in name: return "四国めたん"
+    if "つむぎ" in name: return "春日部つむぎ"
+    if "青山" in name: return "青山龍星"
+    if "宗麟" in name: return "麒ヶ島宗麟"
+    return name
+
+
+def calculate_duration(text):
+    """Estimates duration based on text length (fallback)."""
+    base_time = 1.0
+    char_time = 0.2
+    return base_time + (len(text) * char_time)
+
+
+def split_readings(raw_text):
+    """
+    Splits a dialogue body into (display_text, audio_text).
+    Readings may be written as {reading} or （reading）.
+    Display: readings removed. Audio: "Target{Reading}" replaced by the reading.
+    """
+    # SAFETY NET: If the user/LLM used （furigana）, treat it as {furigana}
+    raw_text = FULLWIDTH_READING_RE.sub(r'{\1}', raw_text)
+
+    display_text = READING_RE.sub('', raw_text).strip()
+    audio_text = AUDIO_READING_RE.sub(r'\1', raw_text)
+    return display_text, audio_text
+
+
+def hash_file(filepath):
+    with open(filepath, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def cache_path_for(script_path):
+    return os.path.splitext(script_path)[0] + ".segments.json"
+
+
+def compile_text(content):
+    """Compiles raw script markdown into a list of segment dicts."""
+    # Only the fenced block is the script (if there is one). Keep track of
+    # where it starts so line numbers refer to the original file.
+    line_offset = 0
+    match = FENCE_RE.search(content)
+    if match:
+        raw_script = match.group(1)
+        line_offset = content.count('\n', 0, match.start(1))
+    else:
+        raw_script = content
+
+    segments = []
+    current_img_keyword = None
+    chapter = 0
+
+    for line_no, line in enumerate(raw_script.split('\n'), start=line_offset + 1):
+        line = line.strip()
+        if not line: continue
+
+        # [EYECATCH] opens a new chapter
+        if "[EYECATCH]" in line:
+            chapter += 1
+            segments.append({"type": "eyecatch", "line": line_no, "chapter": chapter})
+            continue
+
+        # [IMG: keyword] applies to all following lines until the next tag
+        img_match = IMG_TAG_RE.match(line)
+        if img_match:
+            current_img_keyword = img_match.group(1).strip() or None
+            continue
+
+        # "Character, Text" format
+        if ',' not in line: continue
+        if line.startswith('['): continue
+
+        char_part, raw_text = line.split(',', 1)
+        char_name = normalize_character_name(char_part)
+        display_text, audio_text = split_readings(raw_text.strip())
+
+        segments.append({
+            "type": "dialogue",
+            "line": line_no,
+            "chapter": chapter,
+            "character": char_name,
+            "text": display_text,
+            "audio_text": audio_text,
+            "duration": calculate_duration(audio_text),
+            "image_keyword": current_img_keyword
+        })
+
+    return segments
+
+
+def compile_script(script_path, use_cache=True):
+    """
+    Returns the segment list for script_path.
+    Reuses "<script>.segments.json" while the script hash matches, otherwise recompiles and rewrites it.
+    """
+    if not os.path.exists(script_path):
+        print(f"Script file not found: {script_path}")
+        return []
+
+    with tracing.span("script_parse") as sp:
+        with open(script_path, 'rb') as f:
+            raw = f.read()
+        script_hash = hashlib.sha256(raw).hexdigest()
+        cache_path = cache_path_for(script_path)
+
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get("hash") == script_hash and cached.get("version") == COMPILER_VERSION:
+                    sp.set(cache="hit")
+                    return cached["segments"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: Ignoring unreadable segment cache {cache_path}: {e}")
+
+        sp.set(cache="miss")
+        segments = compile_text(raw.decode('utf-8'))
+
+        try:
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": COMPILER_VERSION,
+                    "hash": script_hash,
+                    "source": os.path.basename(script_path),
+                    "segments": segments
+                }, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Warning: Could not write segment cache: {e}")
+
+        return segments
+
+
+def image_keywords(segments, character=NARRATOR):
+    """Unique image keywords (in order) actually displayed for the given character."""
+    keywords = [s["image_keyword"] for s in segments
+                if s["type"] == "dialogue" and s["character"] == character and s["image_keyword"]]
+    return list(dict.fromkeys(keywords))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 script_compiler.py <script.md>")
+        sys.exit(1)
+
+    segs = compile_script(sys.argv[1])
+    for s in segs:
+        if s["type"] == "eyecatch":
+            print(f"L{s['line']:>4} [ch{s['chapter']}] ---- EYECATCH ----")
+        else:
+            print(f"L{s['line']:>4} [ch{s['chapter']}] {s['character']}: {s['text']}  (IMG: {s['image_keyword']})")
+    print(f"{len(segs)} segments. Cache: {cache_path_for(sys.argv[1])}")
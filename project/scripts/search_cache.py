@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+# --- Image Search Cache ---
+# SQLite cache shared by every project: keyword -> ranked candidate list from the
+# image search, plus the candidates already rejected, so re-runs and new projects
+# with common keywords skip the (slow, rate limited) search entirely.
+#
+#   queries     keyword, fetched_at, expires_at
+#   candidates  keyword, rank, url, title, width, height
+#   rejections  url, reason, rejected_at
+#
+# Rejection reasons: "banned_domain", "too_small", "too_large" and "not_image" are permanent,
+# "download_failed" is retried after images.failed_retry_hours.
+# A keyword whose candidates are all rejected counts as a miss (search again).
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(current_dir, "../config.json")
+
+with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+
+CACHE_DIR = os.path.join(current_dir, config["paths"].get("cache_dir", "../cache"))
+DB_PATH = os.path.join(CACHE_DIR, "search_cache.sqlite")
+TTL_SEC = config.get("images", {}).get("search_cache_ttl_days", 30) * 86400
+FAILED_RETRY_SEC = config.get("images", {}).get("failed_retry_hours", 24) * 3600
+
+PERMANENT_REASONS = ("banned_domain", "too_small", "too_large", "not_image")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    keyword TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS candidates (
+    keyword TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    width INTEGER,
+    height INTEGER,
+    PRIMARY KEY (keyword, rank)
+);
+CREATE TABLE IF NOT EXISTS rejections (
+    url TEXT PRIMARY KEY,
+    reason TEXT NOT NULL,
+    rejected_at REAL NOT NULL
+);
+"""
+
+
+def cache_key(keyword):
+    return " ".join(keyword.split()).lower()
+
+
+class SearchCache:
+    def __init__(self, path=DB_PATH, ttl_sec=TTL_SEC, failed_retry_sec=FAILED_RETRY_SEC):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.failed_retry_sec = failed_retry_sec
+        out_dir = os.path.dirname(path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        # Download workers record rejections from their own threads
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL") # several projects may run at once
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def lookup(self, keyword):
+        """
+        Returns the cached candidates (search result dicts, best first) that are not
+        rejected, or None if the keyword was never searched, expired, or has nothing left.
+        """
+        now = time.time()
+        key = cache_key(keyword)
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM queries WHERE keyword = ?", (key,)).fetchone()
+            if not row or row[0] < now:
+                return None
+            rows = self._conn.execute(
+                "SELECT c.url, c.title, c.width, c.height, r.reason, r.rejected_at FROM candidates c "
+                "LEFT JOIN rejections r ON r.url = c.url WHERE c.keyword = ? ORDER BY c.rank",
+                (key,)).fetchall()
+
+        results = []
+        for url, title, width, height, reason, rejected_at in rows:
+            if reason in PERMANENT_REASONS:
+                continue
+            if reason and now - rejected_at < self.failed_retry_sec:
+                continue
+            results.append({"image": url, "title": title, "width": width, "height": height})
+        return results or None
+
+    def store(self, keyword, results):
+        """Replaces the candidate list for keyword with fresh search results."""
+        now = time.time()
+        key = cache_key(keyword)
+        with self._lock:
+            self._conn.execute("DELETE FROM candidates WHERE keyword = ?", (key,))
+            self._conn.executemany(
+                "INSERT INTO candidates (keyword, rank, url, title, width, height) VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, rank, r["image"], r.get("title"), r.get("width"), r.get("height"))
+                 for rank, r in enumerate(results) if r.get("image")])
+            self._conn.execute("INSERT OR REPLACE INTO queries (keyword, fetched_at, expires_at) VALUES (?, ?, ?)",
+                               (key, now, now + self.ttl_sec))
+            self._conn.commit()
+
+    def reject(self, url, reason):
+        """Marks a candidate URL as unusable (for every keyword that lists it)."""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO rejections (url, reason, rejected_at) VALUES (?, ?, ?)",
+                               (url, reason, time.time()))
+            self._conn.commit()
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            queries, fresh = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(expires_at >= ?), 0) FROM queries", (now,)).fetchone()
+            candidates = self._conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+            reasons = dict(self._conn.execute("SELECT reason, COUNT(*) FROM rejections GROUP BY reason").fetchall())
+        return {"queries": queries, "fresh": fresh, "candidates": candidates, "rejections": reasons}
+
+    def purge_expired(self):
+        """Drops expired queries (and their candidates). Returns the number removed."""
+        now = time.time()
+        with self._lock:
+            expired = [r[0] for r in self._conn.execute("SELECT keyword FROM queries WHERE expires_at < ?", (now,))]
+            self._conn.executemany("DELETE FROM candidates WHERE keyword = ?", [(k,) for k in expired])
+            self._conn.executemany("DELETE FROM queries WHERE keyword = ?", [(k,) for k in expired])
+            self._conn.commit()
+        return len(expired)
+
+
+if __name__ == "__main__":
+    with SearchCache() as cache:
+        if len(sys.argv) > 1 and sys.argv[1] == "--purge":
+            print(f"Removed {cache.purge_expired()} expired queries.")
+        s = cache.stats()
+        print(f"{DB_PATH}")
+        print(f"Queries: {s['queries']} ({s['fresh']} fresh), candidates: {s['candidates']}")
+        for reason, count in sorted(s["rejections"].items()):
+            print(f"  rejected ({reason}): {count}")
@@ -0,0 +1,284 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+# --- Image Search Stand-in ---
+# Offline replacement for the DuckDuckGo image search used by fetch_images:
+#   GET /search?q=...&size=Large   -> JSON list of {"image", "title", "width", "height"}
+#   GET /img/<w>x<h>/<name>.jpg    -> a generated JPEG of that size
+# Search is rate limited like the real service: more than `rate` requests per
+# second (token bucket) are answered with HTTP 429.
+#
+# Usage:
+#   python3 search_stub.py --serve [--port 8765] [--rate 1.0]
+#   python3 search_stub.py            # self-check: runs fetch_images' limiter and
+#                                     # download pipeline, search cache and asset store against the stub (no network)
+
+SIZES = [(1280, 720), (400, 300), (1920, 1080), (800, 600), (320, 200)]
+
+
+def make_jpeg(width, height, seed):
+    """Random block texture; block size and JPEG quality vary by seed so candidates score differently."""
+    import numpy as np
+    from PIL import Image
+    rng = random.Random(seed)
+    block = rng.choice([4, 16, 64])
+    cells = np.random.default_rng(rng.randrange(2**32)).integers(0, 256, (max(1, height // block), max(1, width // block), 3))
+    img = Image.fromarray(cells.astype(np.uint8)).resize((width, height), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=rng.choice([40, 70, 90]))
+    return buf.getvalue()
+
+
+class SearchStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _take_token(self):
+        server = self.server
+        with server.lock:
+            now = time.monotonic()
+            server.tokens = min(server.burst, server.tokens + (now - server.last_refill) * server.rate)
+            server.last_refill = now
+            server.stats["search"] += 1
+            if server.tokens < 1:
+                server.stats["rate_limited"] += 1
+                return False
+            server.tokens -= 1
+            return True
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+        if parsed.path == "/search":
+            if not self._take_token():
+                self._send(429, {"detail": "Ratelimit"})
+                return
+            query = params.get("q", "")
+            base = f"http://{self.headers.get('Host')}"
+            seed = int(hashlib.md5(query.encode("utf-8")).hexdigest()[:8], 16)
+            results = []
+            for n in range(int(params.get("max_results", 5))):
+                w, h = SIZES[(seed + n) % len(SIZES)]
+                results.append({"image": f"{base}/img/{w}x{h}/{seed}_{n}.jpg", "title": f"{query} #{n}",
+                                "width": w, "height": h})
+            self._send(200, results)
+
+        elif parsed.path.startswith("/img/"):
+            with self.server.lock:
+                self.server.stats["image"] += 1
+            try:
+                size, name = parsed.path[len("/img/"):].split("/", 1)
+                w, h = (int(v) for v in size.split("x"))
+            except ValueError:
+                self._send(404, {"detail": "Not Found"})
+                return
+            time.sleep(self.server.image_latency)
+            self._send(200, make_jpeg(w, h, name), content_type="image/jpeg")
+
+        elif parsed.path == "/__stats":
+            with self.server.lock:
+                self._send(200, dict(self.server.stats))
+        else:
+            self._send(404, {"detail": "Not Found"})
+
+
+class SearchStubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients drop rejected images mid-body on purpose
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def make_server(host="127.0.0.1", port=8765, rate=1.0, burst=1.0, image_latency=0.05):
+    server = SearchStubServer((host, port), SearchStubHandler)
+    server.daemon_threads = True
+    server.rate = rate
+    server.burst = burst
+    server.tokens = burst
+    server.last_refill = time.monotonic()
+    server.image_latency = image_latency
+    server.lock = threading.Lock()
+    server.stats = {"search": 0, "rate_limited": 0, "image": 0}
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Starts the stub on a free port in a daemon thread. Returns (server, base_url)."""
+    kwargs.setdefault("port", 0)
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def http_search(base_url, max_results=5):
+    """search(query, size) for fetch_images, backed by the stub."""
+    session = requests.Session()
+
+    def search(query, size):
+        r = session.get(f"{base_url}/search", params={"q": query, "size": size, "max_results": max_results}, timeout=5)
+        r.raise_for_status()
+        return r.json()
+
+    return search
+
+
+def self_check(rate=4.0, keywords=12):
+    """Runs fetch_images against the stub and checks the limiter adapts to the server's rate."""
+    import fetch_images
+    import asset_store
+
+    server, base_url = start_in_thread(rate=rate)
+    search = http_search(base_url)
+    ok = True
+
+    # 0. Header sniffing: dimensions from the first bytes of each supported format
+    from PIL import Image
+    for fmt, kwargs in (("JPEG", {"quality": 85}), ("JPEG", {"exif": b"Exif\x00\x00" + bytes(30000)}),
+                        ("PNG", {}), ("WEBP", {}), ("WEBP", {"lossless": True})):
+        buf = io.BytesIO()
+        Image.new("RGB", (1234, 567)).save(buf, format=fmt, **kwargs)
+        info = fetch_images.sniff_image_size(buf.getvalue()[:fetch_images.SNIFF_BYTES])
+        if not info or info[1:] != (1234, 567):
+            print(f"FAIL: sniffed {info} from {fmt} {list(kwargs)}")
+            ok = False
+    if fetch_images.sniff_image_size(b"<!DOCTYPE html><html><head>")[0] != "unknown":
+        print("FAIL: HTML was not rejected by the header check")
+        ok = False
+
+    # 1. Limiter alone: start far too fast, it must back off and settle below the server rate
+    limiter = fetch_images.AdaptiveRateLimiter(min_interval=0.01, max_interval=2.0, start_interval=0.01)
+    start = time.monotonic()
+    for i in range(40):
+        fetch_images.search_keyword(f"keyword {i}", search, limiter, max_retries=6)
+    elapsed = time.monotonic() - start
+    with server.lock:
+        stats = dict(server.stats)
+    served = stats["search"] - stats["rate_limited"]
+    print(f"[limiter] {stats['search']} requests, {stats['rate_limited']} rate limited, "
+          f"{served / elapsed:.2f} served/s (server allows {rate}/s), final interval {limiter.interval:.3f}s")
+    if served / elapsed > rate * 1.5:
+        print("FAIL: served rate exceeds the server limit")
+        ok = False
+    if stats["rate_limited"] > stats["search"] * 0.5:
+        print("FAIL: limiter did not adapt (more than half of the requests were rate limited)")
+        ok = False
+
+    # 2. Whole pipeline offline: script -> search -> concurrent downloads -> size check
+    with tempfile.TemporaryDirectory() as tmp:
+        script = f"{tmp}/script.md"
+        with open(script, "w", encoding="utf-8") as f:
+            for i in range(keywords):
+                f.write(f"[IMG: テスト {i}]\n青山龍星, テスト{i}です。\n")
+        fetch_images.SEARCH_MIN_INTERVAL = 1.0 / rate
+        fetch_images.SEARCH_START_INTERVAL = 1.0 / rate
+        cache_path = f"{tmp}/search_cache.sqlite"
+
+        def run(project, store):
+            with server.lock:
+                before = dict(server.stats)
+            start = time.monotonic()
+            fetch_images.fetch_images_for_script(script_path=script, image_dir=f"{tmp}/{project}", search_fn=search,
+                                                 cache_path=cache_path, store_dir=f"{tmp}/{store}")
+            elapsed = time.monotonic() - start
+            with server.lock:
+                searches = server.stats["search"] - before["search"]
+                downloads = server.stats["image"] - before["image"]
+            fetched = len([f for f in os.listdir(f"{tmp}/{project}") if f.endswith(".jpg")])
+            return fetched, elapsed, searches, downloads
+
+        fetched, elapsed, _, _ = run("images", "store")
+        print(f"[pipeline] {fetched}/{keywords} images in {elapsed:.1f}s")
+        if fetched != keywords:
+            print("FAIL: not every keyword got an image")
+            ok = False
+
+        # 3. Same keywords in a new project with its own store: every search must come from the cache
+        fetched, elapsed, searches, _ = run("images2", "store2")
+        print(f"[cache] {fetched}/{keywords} images in {elapsed:.1f}s with {searches} searches")
+        if fetched != keywords or searches:
+            print("FAIL: cached keywords were searched again")
+            ok = False
+
+        # 4. Same keywords, shared store: no network at all, files are links to the store
+        fetched, elapsed, searches, downloads = run("images3", "store")
+        name = fetch_images.image_filename("テスト 0")
+        linked = os.path.samefile(f"{tmp}/images/{name}", f"{tmp}/images3/{name}")
+        manifest = asset_store.load_manifest(f"{tmp}/images3")
+        print(f"[store] {fetched}/{keywords} images in {elapsed:.1f}s with {searches} searches, "
+              f"{downloads} downloads, hardlinked={linked}, manifest entries={len(manifest)}")
+        if fetched != keywords or searches or downloads or len(manifest) != keywords:
+            print("FAIL: stored keywords were fetched again")
+            ok = False
+
+        # 5. Near-duplicates: a resized re-encode is found by pHash, a different image is not
+        with asset_store.AssetStore(f"{tmp}/store") as store:
+            original = f"{tmp}/images/{name}"
+            with Image.open(original) as img:
+                img.convert("RGB").resize((img.width // 2, img.height // 2)).save(f"{tmp}/dup.jpg", quality=60)
+            before = store.stats()["assets"]
+            entry = store.add(f"{tmp}/dup.jpg")
+            print(f"[phash] resized copy -> {entry['sha256'][:12]} ({before} -> {store.stats()['assets']} assets)")
+            if store.stats()["assets"] != before or not os.path.samefile(entry["path"], original):
+                print("FAIL: near-duplicate was stored again")
+                ok = False
+            other = fetch_images.image_filename("テスト 1")
+            with Image.open(f"{tmp}/images/{other}") as a, Image.open(original) as b:
+                distance = int(asset_store.hamming(asset_store.phash(a), [asset_store.phash(b)])[0])
+            if distance <= store.phash_threshold:
+                print(f"FAIL: different images within pHash threshold (distance {distance})")
+                ok = False
+
+    server.shutdown()
+    server.server_close()
+    print("OK" if ok else "FAILED")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline image search stand-in")
+    parser.add_argument("--serve", action="store_true", help="Run the server instead of the self-check")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=4.0, help="Allowed searches per second")
+    args = parser.parse_args()
+
+    if args.serve:
+        server = make_server(args.host, args.port, rate=args.rate)
+        print(f"Search stub listening on http://{args.host}:{server.server_address[1]} (rate {args.rate}/s)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    else:
+        sys.exit(0 if self_check(rate=args.rate) else 1)
+
+
+if __name__ == "__main__":
+    main()
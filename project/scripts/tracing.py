@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import threading
+
+# --- Pipeline Tracing ---
+# Lightweight timing spans for the render pipeline.
+#
+#   with tracing.span("tts", segment=i) as sp:
+#       ...
+#       sp.set(cache="hit")
+#
+# Disabled by default: span() then returns a shared no-op object, so
+# instrumentation costs one function call and a flag check.
+# Enabled by `main.py run --profile`, which exports a Chrome trace-event JSON
+# (open in chrome://tracing or https://ui.perfetto.dev) and prints a summary table.
+
+_enabled = False
+_events = []
+_origin_ns = time.perf_counter_ns()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "args", "start_ns")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start_ns = 0
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        # list.append is atomic, safe from worker threads
+        _events.append((self.name, self.start_ns, end_ns, threading.get_ident(), self.args))
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+def enable():
+    global _enabled, _origin_ns
+    _enabled = True
+    _origin_ns = time.perf_counter_ns()
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    _events.clear()
+
+
+def span(name, **args):
+    """Returns a context manager timing `name`. Extra keyword args are recorded (segment, cache, ...)."""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, args)
+
+
+def export_chrome_trace(path):
+    """Writes all recorded spans as Chrome trace-event JSON ("X" complete events)."""
+    pid = os.getpid()
+    trace_events = []
+    for name, start_ns, end_ns, tid, args in _events:
+        trace_events.append({
+            "name": name,
+            "cat": name.split(".")[0],
+            "ph": "X",
+            "ts": (start_ns - _origin_ns) / 1000.0,
+            "dur": (end_ns - start_ns) / 1000.0,
+            "pid": pid,
+            "tid": tid,
+            "args": args
+        })
+
+    out_dir = os.path.dirname(path)
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return path
+
+
+def summary():
+    """Aggregates spans by name: count, total/mean/max ms and cache hits/misses."""
+    rows = {}
+    for name, start_ns, end_ns, tid, args in _events:
+        r = rows.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "hits": 0, "misses": 0})
+        dur = (end_ns - start_ns) / 1e6
+        r["count"] += 1
+        r["total_ms"] += dur
+        r["max_ms"] = max(r["max_ms"], dur)
+        cache = args.get("cache")
+        if cache == "hit": r["hits"] += 1
+        elif cache == "miss": r["misses"] += 1
+    for r in rows.values():
+        r["mean_ms"] = r["total_ms"] / r["count"]
+    return rows
+
+
+def format_summary():
+    rows = summary()
+    if not rows:
+        return "No spans recorded."
+    lines = [f"{'stage':<24} {'count':>6} {'total s':>9} {'mean ms':>10} {'max ms':>10} {'cache hit/miss':>15}"]
+    for name, r in sorted(rows.items(), key=lambda kv: -kv[1]["total_ms"]):
+        cache = f"{r['hits']}/{r['misses']}" if (r["hits"] or r["misses"]) else "-"
+        lines.append(f"{name:<24} {r['count']:>6} {r['total_ms'] / 1000:>9.2f} {r['mean_ms']:>10.1f} {r['max_ms']:>10.1f} {cache:>15}")
+    return "\n".join(lines)
@@ -0,0 +1,202 @@
+import io
+import sys
+import json
+import math
+import time
+import wave
+import random
+import struct
+import zipfile
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# --- VOICEVOX Stand-in Server ---
+# Minimal offline replacement for the VOICEVOX engine, for benchmarks and CI.
+# Implements /version, /audio_query, /synthesis and /multi_synthesis.
+# WAVs are deterministic: same text + speaker + speedScale -> same bytes,
+# and their length grows with the text like real speech.
+# Latency and failure rate are configurable to exercise client retry logic.
+#
+# Usage: python3 voicevox_stub.py [--port 50021] [--latency-ms 150] [--jitter-ms 50] [--failure-rate 0.05]
+# Extra endpoints: GET /__stats (request counters), POST /__reset
+
+STUB_VERSION = "0.0.0-stub"
+SAMPLE_RATE = 24000
+SECONDS_PER_CHAR = 0.12
+
+
+def speech_duration(query):
+    """Duration (s) of the synthesized WAV for an audio_query payload."""
+    speed = query.get("speedScale", 1.0) or 1.0
+    chars = len(query.get("kana", ""))
+    return (0.1 + chars * SECONDS_PER_CHAR) / speed + query.get("prePhonemeLength", 0.1) + query.get("postPhonemeLength", 0.1)
+
+
+def render_wav(query, speaker):
+    """Renders a quiet sine tone (pitch per speaker) as 16-bit mono WAV bytes."""
+    rate = query.get("outputSamplingRate", SAMPLE_RATE)
+    n_frames = int(speech_duration(query) * rate)
+    freq = 180.0 + (int(speaker) % 16) * 20.0
+    step = 2 * math.pi * freq / rate
+    samples = struct.pack(f"<{n_frames}h", *(int(3000 * math.sin(step * i)) for i in range(n_frames)))
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples)
+    return buf.getvalue()
+
+
+def make_audio_query(text, speaker):
+    return {
+        "accent_phrases": [],
+        "speedScale": 1.0,
+        "pitchScale": 0.0,
+        "intonationScale": 1.0,
+        "volumeScale": 1.0,
+        "prePhonemeLength": 0.1,
+        "postPhonemeLength": 0.1,
+        "outputSamplingRate": SAMPLE_RATE,
+        "outputStereo": False,
+        "kana": text,
+        "speaker": int(speaker)
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body=b"", content_type="application/json"):
+        if isinstance(body, (dict, list, str)):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw) if raw else None
+
+    def _simulate(self, endpoint):
+        """Applies configured latency, counts the request and decides whether to fail it."""
+        server = self.server
+        with server.lock:
+            server.stats[endpoint] = server.stats.get(endpoint, 0) + 1
+            delay = server.latency + server.rng.uniform(0, server.jitter)
+            fail = server.rng.random() < server.failure_rate
+            if fail:
+                server.stats["failed"] = server.stats.get("failed", 0) + 1
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            self._send(503, {"detail": "stub: injected failure"})
+        return not fail
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/version":
+            if self._simulate("version"):
+                self._send(200, STUB_VERSION)
+        elif path == "/__stats":
+            with self.server.lock:
+                self._send(200, dict(self.server.stats))
+        else:
+            self._send(404, {"detail": "Not Found"})
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        speaker = params.get("speaker", "0")
+
+        if parsed.path == "/__reset":
+            with self.server.lock:
+                self.server.stats.clear()
+            self._send(200, {})
+            return
+
+        if parsed.path == "/audio_query":
+            self._read_json() # drain (unused) body for keep-alive
+            if "text" not in params:
+                self._send(422, {"detail": "text is required"})
+            elif self._simulate("audio_query"):
+                self._send(200, make_audio_query(params["text"], speaker))
+
+        elif parsed.path == "/synthesis":
+            query = self._read_json()
+            if not isinstance(query, dict):
+                self._send(422, {"detail": "audio_query body is required"})
+            elif self._simulate("synthesis"):
+                self._send(200, render_wav(query, speaker), content_type="audio/wav")
+
+        elif parsed.path == "/multi_synthesis":
+            queries = self._read_json()
+            if not isinstance(queries, list):
+                self._send(422, {"detail": "list of audio_query is required"})
+            elif self._simulate("multi_synthesis"):
+                buf = io.BytesIO()
+                with zipfile.ZipFile(buf, "w") as zf:
+                    for i, q in enumerate(queries, start=1):
+                        zf.writestr(f"{i:03d}.wav", render_wav(q, speaker))
+                self._send(200, buf.getvalue(), content_type="application/zip")
+        else:
+            self._send(404, {"detail": "Not Found"})
+
+
+def make_server(host="127.0.0.1", port=50021, latency_ms=0, jitter_ms=0, failure_rate=0.0, seed=0, verbose=False):
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000.0
+    server.jitter = jitter_ms / 1000.0
+    server.failure_rate = failure_rate
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.stats = {}
+    server.verbose = verbose
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Starts a stub server on a free port in a daemon thread. Returns (server, base_url)."""
+    kwargs.setdefault("port", 0)
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline VOICEVOX stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=50021)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Fixed delay added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Extra random delay (0..jitter)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms, args.jitter_ms, args.failure_rate, args.seed, args.verbose)
+    print(f"VOICEVOX stub listening on http://{args.host}:{server.server_address[1]} "
+          f"(latency {args.latency_ms}ms +{args.jitter_ms}ms, failure rate {args.failure_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()